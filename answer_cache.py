@@ -0,0 +1,124 @@
+# answer_cache.py - Semantic cache of /generate answers.
+# A new question is answered from the cache when its embedding is within a cosine threshold of a
+# question already answered with the same model against the same version of the collection.
+# Versions are counted per process: with several server workers, a write handled by one worker
+# does not invalidate the answers cached by the others.
+
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    response: str
+    source_documents: List[Dict[str, Any]]
+    latency: float
+    created: float
+
+
+class _Scope:
+    """Answers for one (collection, version, model, limit, retrieval), with their unit-length question vectors."""
+
+    def __init__(self):
+        self.answers: List[CachedAnswer] = []
+        self.vectors: List[np.ndarray] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def matrix(self) -> np.ndarray:
+        if self._matrix is None or len(self._matrix) != len(self.vectors):
+            self._matrix = np.vstack(self.vectors)
+        return self._matrix
+
+    def add(self, vector: np.ndarray, answer: CachedAnswer, max_entries: int):
+        self.vectors.append(vector)
+        self.answers.append(answer)
+        if len(self.answers) > max_entries:
+            del self.vectors[0], self.answers[0]
+            self._matrix = None
+
+
+class SemanticAnswerCache:
+    """Caches generated answers and serves them for paraphrased questions.
+
+    Args:
+      threshold: Minimum cosine similarity between question embeddings for a cache hit.
+      max_entries: Answers kept per collection/model; the oldest are dropped first.
+
+    `lookup` returns the collection version it saw, and `store` drops the answer when the collection
+    has been written to since, so an answer generated from older contents is never cached as current.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.versions: Dict[str, int] = defaultdict(int)
+        self._scopes: Dict[Tuple, _Scope] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+
+    def _key(self, collection_name: str, version: int, model: str, limit: int, retrieval: str) -> Tuple:
+        return collection_name, version, model, limit, retrieval
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(self, collection_name: str, model: str, limit: int, question_vector,
+               retrieval: str = "dense") -> Tuple[Optional[CachedAnswer], int]:
+        """The cached answer for a similar question, or None, with the collection version it was looked up at."""
+        vector = self._normalize(question_vector)
+        with self._lock:
+            version = self.versions[collection_name]
+            scope = self._scopes.get(self._key(collection_name, version, model, limit, retrieval))
+            if scope is not None and scope.answers:
+                similarities = scope.matrix() @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    answer = scope.answers[best]
+                    self.hits += 1
+                    self.latency_saved += answer.latency
+                    return answer, version
+            self.misses += 1
+            return None, version
+
+    def store(self, collection_name: str, model: str, limit: int, question: str, question_vector,
+              response: str, source_documents: List[Dict[str, Any]], latency: float, version: int,
+              retrieval: str = "dense") -> bool:
+        """Caches an answer generated at `version`, the version `lookup` returned; False if it was dropped."""
+        answer = CachedAnswer(question, response, source_documents, latency, time.time())
+        with self._lock:
+            if self.versions[collection_name] != version:
+                # The collection changed while the answer was generated
+                return False
+            scope = self._scopes.setdefault(self._key(collection_name, version, model, limit, retrieval), _Scope())
+            scope.add(self._normalize(question_vector), answer, self.max_entries)
+            return True
+
+    def invalidate(self, collection_name: str):
+        """Bumps the collection version, dropping every answer generated against earlier contents."""
+        with self._lock:
+            self.versions[collection_name] += 1
+            for key in [key for key in self._scopes if key[0] == collection_name]:
+                del self._scopes[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "threshold": self.threshold,
+                "entries": sum(len(scope.answers) for scope in self._scopes.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "latency_saved_seconds": round(self.latency_saved, 3),
+            }
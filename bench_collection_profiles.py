@@ -0,0 +1,118 @@
+# bench_collection_profiles.py - Compares Qdrant storage profiles on memory footprint, latency and recall@k.
+# Uses synthetic clustered vectors. By default it runs against embedded in-memory Qdrant, which accepts
+# every setting but always searches exhaustively; pass --url to measure a real Qdrant server
+# (e.g. the docker image from web_scrape_app_qdrant.py) where HNSW and quantization take effect.
+#
+#   python bench_collection_profiles.py --points 20000 --dim 384
+#   python bench_collection_profiles.py --url http://localhost:6333 --json profiles.json
+
+import argparse
+import json
+import time
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+from collection_profiles import build_collection_config, build_search_params, estimate_memory_bytes
+
+PROFILES = {
+    "baseline": {},
+    "hnsw_m32": {"hnsw_m": 32, "hnsw_ef_construct": 200},
+    "scalar": {"quantization": "scalar"},
+    "scalar_on_disk": {"quantization": "scalar", "on_disk_vectors": True, "on_disk_payload": True},
+    "product_x16": {"quantization": "product", "product_compression": "x16"},
+    "binary_on_disk": {"quantization": "binary", "on_disk_vectors": True, "on_disk_payload": True},
+}
+
+# Query-time settings tried for every profile; quantized profiles rescore with the original vectors
+SEARCH_SETTINGS = {
+    "ef64": {"hnsw_ef": 64},
+    "ef128_rescore": {"hnsw_ef": 128, "rescore": True, "oversampling": 2.0},
+}
+
+
+def synthetic_vectors(count, dim, clusters=50, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(0, clusters, size=count)] + 0.3 * rng.normal(size=(count, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 3)
+
+
+def bench_profile(client, name, profile, vectors, queries, k):
+    collection = f"bench_{name}"
+    if client.collection_exists(collection):
+        client.delete_collection(collection)
+    client.create_collection(collection_name=collection, **build_collection_config(size=vectors.shape[1], **profile))
+    start = time.perf_counter()
+    client.upload_points(
+        collection_name=collection,
+        points=(models.PointStruct(id=i, vector=v.tolist(), payload={"n": i}) for i, v in enumerate(vectors)),
+        batch_size=256,
+        wait=True
+    )
+    upload_seconds = time.perf_counter() - start
+
+    truth = [
+        {p.id for p in client.query_points(collection, query=q.tolist(), limit=k,
+                                           search_params=models.SearchParams(exact=True)).points}
+        for q in queries
+    ]
+    results = {}
+    for setting_name, setting in SEARCH_SETTINGS.items():
+        params = build_search_params(**setting)
+        latencies, recalls = [], []
+        for q, expected in zip(queries, truth):
+            start = time.perf_counter()
+            points = client.query_points(collection, query=q.tolist(), limit=k, search_params=params).points
+            latencies.append(time.perf_counter() - start)
+            recalls.append(len(expected & {p.id for p in points}) / k)
+        results[setting_name] = {
+            "p50_ms": percentile_ms(latencies, 50),
+            "p95_ms": percentile_ms(latencies, 95),
+            f"recall@{k}": round(float(np.mean(recalls)), 4),
+        }
+    client.delete_collection(collection)
+
+    memory = estimate_memory_bytes(
+        len(vectors), vectors.shape[1], hnsw_m=profile.get("hnsw_m", 16), quantization=profile.get("quantization"),
+        product_compression=profile.get("product_compression", "x16"),
+        on_disk_vectors=bool(profile.get("on_disk_vectors"))
+    )
+    return {"profile": profile, "upload_seconds": round(upload_seconds, 3),
+            "estimated_ram_mb": round(memory["total_ram"] / 2 ** 20, 2), "search": results}
+
+
+def main(args):
+    client = QdrantClient(url=args.url) if args.url else QdrantClient(":memory:")
+    if not args.url:
+        print("Embedded in-memory Qdrant ignores HNSW and quantization; latency and recall will not differ.\n")
+    vectors = synthetic_vectors(args.points, args.dim)
+    queries = synthetic_vectors(args.queries, args.dim, seed=1)
+
+    report = {}
+    for name, profile in PROFILES.items():
+        report[name] = bench_profile(client, name, profile, vectors, queries, args.k)
+        for setting_name, result in report[name]["search"].items():
+            print(f"{name:16s} {setting_name:14s} ram~{report[name]['estimated_ram_mb']:9.2f} MB  "
+                  f"p50 {result['p50_ms']:8.3f} ms  p95 {result['p95_ms']:8.3f} ms  "
+                  f"recall@{args.k} {result[f'recall@{args.k}']:.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"points": args.points, "dim": args.dim, "k": args.k, "url": args.url, "profiles": report},
+                      f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Qdrant collection profile benchmark")
+    parser.add_argument("--url", help="Qdrant server URL; embedded in-memory Qdrant when omitted")
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    main(parser.parse_args())
@@ -0,0 +1,252 @@
+# bench_components.py - Offline benchmark suite for the ingestion and retrieval components.
+# Measures splitter throughput (inline and on a process pool), embedding batch throughput, upsert
+# rate, search latency at several k and /generate prompt assembly against embedded in-memory Qdrant,
+# a deterministic fake embedder and the bundled sotu_address_obama.txt. The synthetic corpus repeats
+# the sample's chunks and scales to 1M points (about 2 GB of RAM at --dim 384; embedded Qdrant upserts
+# about a thousand points/sec, so allow 15+ minutes). Results go to JSON so runs can be compared across commits.
+#
+#   python bench_components.py --json bench.json
+#   python bench_components.py --corpus-sizes 10000,100000,1000000 --json bench.json --compare baseline.json
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import numpy as np
+from langchain.text_splitter import CharacterTextSplitter
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from qdrant_client import AsyncQdrantClient, QdrantClient, models
+
+import qdrant_api
+from ingest_pipeline import batched
+from parallel_splitting import ParallelSplitter
+from query_cache import QueryEmbeddingCache
+from text_chunking import iter_file_chunks
+
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sotu_address_obama.txt")
+# The sample has a few lines longer than chunk_size; the splitter warns about each of them on every run
+def quiet_splitter_warnings():
+    logging.getLogger("langchain_text_splitters").setLevel(logging.ERROR)
+
+
+quiet_splitter_warnings()
+
+QUESTIONS = ["What about schools?", "How will the economy recover?", "What is the plan for health care?",
+             "What did he say about energy?", "How are banks held accountable?"]
+
+
+def percentiles_ms(samples):
+    return {f"p{q}_ms": round(float(np.percentile(samples, q)) * 1000, 3) for q in (50, 95, 99)}
+
+
+def bench_splitters(text, repeat, workers=None):
+    # Both splitters produce the same chunks; text_chunking reads the file in blocks instead of whole
+    corpus = "\n".join([text] * repeat)
+    megabytes = len(corpus.encode("utf-8")) / 2 ** 20
+    results = {}
+
+    start = time.perf_counter()
+    chunks = CharacterTextSplitter(separator="\n", chunk_size=600, chunk_overlap=100).split_text(corpus)
+    seconds = time.perf_counter() - start
+    results["character_text_splitter"] = {"chunks": len(chunks), "seconds": round(seconds, 4),
+                                          "chunks_per_sec": round(len(chunks) / seconds, 1),
+                                          "mb_per_sec": round(megabytes / seconds, 2)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "corpus.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(corpus)
+        start = time.perf_counter()
+        count = sum(1 for _ in iter_file_chunks(path, chunk_size=600, chunk_overlap=100, separator="\n"))
+        seconds = time.perf_counter() - start
+    results["iter_file_chunks"] = {"chunks": count, "seconds": round(seconds, 4),
+                                   "chunks_per_sec": round(count / seconds, 1),
+                                   "mb_per_sec": round(megabytes / seconds, 2)}
+
+    # Bulk ingestion: one document per copy, fanned out to worker processes
+    documents = [Document(page_content=text, metadata={"source": f"copy{i}.txt"}) for i in range(repeat)]
+    splitter = CharacterTextSplitter(separator="\n", chunk_size=600, chunk_overlap=100)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=quiet_splitter_warnings) as executor:
+        parallel = ParallelSplitter(splitter, max_workers=workers, executor=executor)
+        # Start the pool before timing; workers pay their import cost once per process
+        parallel.split_documents(documents[:workers])
+        start = time.perf_counter()
+        count = sum(1 for _ in parallel.iter_chunks(documents))
+        seconds = time.perf_counter() - start
+    results["parallel_splitter"] = {"workers": workers, "chunks": count, "seconds": round(seconds, 4),
+                                    "chunks_per_sec": round(count / seconds, 1),
+                                    "mb_per_sec": round(megabytes / seconds, 2)}
+    return results
+
+
+def bench_embeddings(texts, batch_sizes, dim):
+    # The fake embedder has no network cost, so this is the per-batch overhead of our own code path
+    embedder = DeterministicFakeEmbedding(size=dim)
+    results = {}
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        for batch in batched(texts, batch_size):
+            embedder.embed_documents(batch)
+        seconds = time.perf_counter() - start
+        results[f"batch_{batch_size}"] = {"vectors_per_sec": round(len(texts) / seconds, 1),
+                                          "seconds": round(seconds, 4)}
+    return results
+
+
+def synthetic_points(base_chunks, count, dim, batch_size, seed=0):
+    # Vectors come from a seeded generator rather than the embedder so 1M points stay quick to build
+    rng = np.random.default_rng(seed)
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        vectors = rng.normal(size=(size, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        yield [
+            models.PointStruct(id=start + i + 1, vector=vector.tolist(), payload={
+                "text": base_chunks[(start + i) % len(base_chunks)],
+                "source": f"synthetic_{(start + i) // 10000}.txt",
+            })
+            for i, vector in enumerate(vectors)
+        ]
+
+
+def bench_corpus(client, base_chunks, size, dim, ks, queries, batch_size):
+    collection = f"bench_{size}"
+    if client.collection_exists(collection):
+        client.delete_collection(collection)
+    client.create_collection(collection, vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE))
+
+    start = time.perf_counter()
+    for points in synthetic_points(base_chunks, size, dim, batch_size):
+        client.upsert(collection, points=points, wait=True)
+    upsert_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(1)
+    query_vectors = rng.normal(size=(queries, dim)).astype(np.float32)
+    search = {}
+    for k in ks:
+        latencies = []
+        for vector in query_vectors:
+            start = time.perf_counter()
+            client.query_points(collection, query=vector.tolist(), limit=k, with_payload=True)
+            latencies.append(time.perf_counter() - start)
+        search[f"k{k}"] = {**percentiles_ms(latencies), "qps": round(len(latencies) / sum(latencies), 1)}
+    client.delete_collection(collection)
+    return {"upsert_points_per_sec": round(size / upsert_seconds, 1), "upsert_seconds": round(upsert_seconds, 3),
+            "search": search}
+
+
+async def bench_prompt_assembly(base_chunks, ks, repeats):
+    # Times qdrant_api.build_generation_prompt, i.e. query embedding, search and prompt formatting,
+    # against the sample document with the query cache disabled
+    qdrant_api.vdb_client = AsyncQdrantClient(":memory:")
+    qdrant_api.embeddings = DeterministicFakeEmbedding(size=1536)
+    qdrant_api.query_cache = QueryEmbeddingCache(max_size=0)
+    await qdrant_api.vdb_client.create_collection(
+        "bench_prompt", vectors_config=models.VectorParams(size=1536, distance=models.Distance.COSINE)
+    )
+    await qdrant_api.vdb_client.upsert("bench_prompt", points=[
+        models.PointStruct(id=idx + 1, vector=vector, payload=qdrant_api.format_chunk(idx, text, SAMPLE_FILE))
+        for idx, (text, vector) in enumerate(zip(base_chunks, qdrant_api.embeddings.embed_documents(base_chunks)))
+    ])
+
+    results = {}
+    for k in ks:
+        latencies, prompt_chars = [], []
+        for i in range(repeats):
+            request = qdrant_api.GenerateRequest(question=QUESTIONS[i % len(QUESTIONS)],
+                                                 collection_name="bench_prompt", limit=k)
+            start = time.perf_counter()
+            prompt, _, _ = await qdrant_api.build_generation_prompt(request)
+            latencies.append(time.perf_counter() - start)
+            prompt_chars.append(len(prompt))
+        results[f"k{k}"] = {**percentiles_ms(latencies), "prompt_chars": int(np.mean(prompt_chars))}
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(report, prefix=""):
+    values = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            values.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[f"{prefix}{key}"] = value
+    return values
+
+
+def compare(previous, current):
+    # Prints every metric that moved by more than 10%; for *_ms and *seconds lower is better
+    before, after = flatten(previous["results"]), flatten(current["results"])
+    print(f"\nCompared with {previous.get('commit') or 'previous run'}:")
+    for key in sorted(before.keys() & after.keys()):
+        if before[key] and abs(after[key] / before[key] - 1) > 0.1:
+            print(f"  {key:60s} {before[key]:>12} -> {after[key]:>12} ({(after[key] / before[key] - 1) * 100:+.0f}%)")
+
+
+def main(args):
+    with open(SAMPLE_FILE, encoding="utf-8") as f:
+        text = f.read()
+    base_chunks = CharacterTextSplitter(separator="\n", chunk_size=600, chunk_overlap=100).split_text(text)
+    ks = [int(k) for k in args.k.split(",")]
+
+    results = {"splitter": bench_splitters(text, args.splitter_repeat, args.split_workers)}
+    print(f"splitter: {json.dumps(results['splitter'])}")
+
+    embed_texts = [f"{base_chunks[i % len(base_chunks)]} ({i})" for i in range(args.embed_chunks)]
+    results["embedding"] = bench_embeddings(embed_texts, [int(b) for b in args.batch_sizes.split(",")], args.dim)
+    print(f"embedding: {json.dumps(results['embedding'])}")
+
+    client = QdrantClient(":memory:")
+    results["corpus"] = {}
+    for size in [int(s) for s in args.corpus_sizes.split(",")]:
+        results["corpus"][str(size)] = bench_corpus(client, base_chunks, size, args.dim, ks, args.queries,
+                                                    args.upsert_batch)
+        print(f"corpus {size}: {json.dumps(results['corpus'][str(size)])}")
+
+    results["prompt_assembly"] = asyncio.run(bench_prompt_assembly(base_chunks, ks, args.queries))
+    print(f"prompt assembly: {json.dumps(results['prompt_assembly'])}")
+
+    report = {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "python": platform.python_version(), "args": vars(args), "results": results}
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline ingestion and retrieval component benchmarks")
+    parser.add_argument("--corpus-sizes", default="1000,10000", help="Comma separated synthetic corpus sizes, up to 1000000")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", default="1,5,10,50", help="Comma separated search limits")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--batch-sizes", default="16,64,256", help="Comma separated embedding batch sizes")
+    parser.add_argument("--embed-chunks", type=int, default=5000)
+    parser.add_argument("--upsert-batch", type=int, default=1024)
+    parser.add_argument("--splitter-repeat", type=int, default=20, help="Copies of the sample file to split")
+    parser.add_argument("--split-workers", type=int, help="Processes for the parallel splitter; one per core by default")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Earlier JSON results to report changes against")
+    main(parser.parse_args())
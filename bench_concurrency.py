@@ -0,0 +1,88 @@
+# bench_concurrency.py - Measures how concurrent /search requests scale on a single qdrant_api worker.
+# Runs fully offline: an in-memory Qdrant collection and a fake embedder that simulates the
+# network latency of a remote embedding API.
+#
+#   python bench_concurrency.py --requests 20 --latency 0.2
+
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import httpx
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from qdrant_client import AsyncQdrantClient, models
+
+import qdrant_api
+from query_cache import QueryEmbeddingCache
+
+
+class RemoteLatencyEmbeddings(DeterministicFakeEmbedding):
+    """Deterministic fake embedder that waits `latency` seconds per call like a remote API would."""
+
+    latency: float = 0.2
+
+    async def aembed_query(self, text):
+        await asyncio.sleep(self.latency)
+        return self.embed_query(text)
+
+    async def aembed_documents(self, texts):
+        await asyncio.sleep(self.latency)
+        return self.embed_documents(texts)
+
+
+async def run_searches(client, count, concurrent):
+    payloads = [{"query": f"question {i}", "collection_name": "bench", "limit": 5} for i in range(count)]
+    start = time.perf_counter()
+    if concurrent:
+        responses = await asyncio.gather(*(client.post("/search", json=p) for p in payloads))
+    else:
+        responses = [await client.post("/search", json=p) for p in payloads]
+    elapsed = time.perf_counter() - start
+    assert all(r.status_code == 200 for r in responses), [r.text for r in responses if r.status_code != 200]
+    return elapsed
+
+
+async def setup_bench_api(points, latency):
+    # Points qdrant_api at an in-memory "bench" collection and a fake embedder with `latency`
+    qdrant_api.vdb_client = AsyncQdrantClient(":memory:")
+    qdrant_api.embeddings = RemoteLatencyEmbeddings(size=1536, latency=latency)
+    qdrant_api.query_cache = QueryEmbeddingCache(max_size=0)
+    await qdrant_api.vdb_client.create_collection(
+        collection_name="bench",
+        vectors_config=models.VectorParams(size=1536, distance=models.Distance.COSINE)
+    )
+    await qdrant_api.vdb_client.upsert(
+        collection_name="bench",
+        points=[
+            models.PointStruct(id=i + 1, vector=qdrant_api.embeddings.embed_query(f"doc {i}"),
+                               payload={"text": f"doc {i}", "source": "bench"})
+            for i in range(points)
+        ]
+    )
+
+
+async def main(args):
+    await setup_bench_api(args.points, args.latency)
+
+    transport = httpx.ASGITransport(app=qdrant_api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        single = await run_searches(client, 1, concurrent=False)
+        sequential = await run_searches(client, args.requests, concurrent=False)
+        concurrent = await run_searches(client, args.requests, concurrent=True)
+
+    print(f"embedding latency:        {args.latency * 1000:.0f} ms")
+    print(f"1 request:                {single * 1000:.0f} ms")
+    print(f"{args.requests} sequential requests: {sequential * 1000:.0f} ms")
+    print(f"{args.requests} concurrent requests: {concurrent * 1000:.0f} ms "
+          f"({concurrent / single:.1f}x a single request, {sequential / concurrent:.1f}x faster than sequential)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent /search benchmark")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--points", type=int, default=500)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,116 @@
+# bench_embeddings.py - Embedding throughput of the providers in embedding_providers.py.
+# Measures bulk document embedding (texts/s) and concurrent single queries (queries/s, p50 latency)
+# for a simulated remote API and, when sentence-transformers is installed, the local CPU backend in
+# fp32, dynamically quantized int8 and ONNX form. Providers that cannot load are reported and skipped.
+#
+#   python bench_embeddings.py --texts 2000 --queries 200
+#   python bench_embeddings.py --providers remote,local,local-int8 --json embeddings.json
+
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+from langchain.text_splitter import CharacterTextSplitter
+
+from bench_components import SAMPLE_FILE
+from bench_concurrency import RemoteLatencyEmbeddings
+from embedding_providers import create_embeddings, embedding_dimension
+
+PROVIDERS = {
+    "local": {"backend": "torch"},
+    "local-int8": {"backend": "torch", "quantize": True},
+    "local-onnx": {"backend": "onnx"},
+}
+
+
+def sample_texts(count):
+    with open(SAMPLE_FILE, encoding="utf-8") as f:
+        chunks = CharacterTextSplitter(separator="\n", chunk_size=600, chunk_overlap=100).split_text(f.read())
+    # Suffixes keep repeated chunks distinct in case the provider caches
+    return [f"{chunks[i % len(chunks)]} ({i})" for i in range(count)]
+
+
+def build(name, args):
+    if name == "remote":
+        # One round trip per call, however many texts it carries, like a hosted embedding API
+        return RemoteLatencyEmbeddings(size=1536, latency=args.remote_latency)
+    return create_embeddings("local", args.model, batch_size=args.batch_size, num_threads=args.threads,
+                             **PROVIDERS[name])
+
+
+async def document_throughput(embeddings, texts, batch):
+    # The async path, so the simulated remote pays its round trip per call
+    start = time.perf_counter()
+    for batch_start in range(0, len(texts), batch):
+        await embeddings.aembed_documents(texts[batch_start:batch_start + batch])
+    return len(texts) / (time.perf_counter() - start)
+
+
+async def query_throughput(embeddings, queries, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(text):
+        async with semaphore:
+            start = time.perf_counter()
+            await embeddings.aembed_query(text)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(text) for text in queries))
+    return len(queries) / (time.perf_counter() - start), float(np.percentile(latencies, 50))
+
+
+def run_provider(name, texts, queries, args):
+    embeddings = build(name, args)
+    start = time.perf_counter()
+    dimension = embedding_dimension(embeddings)
+    load_seconds = time.perf_counter() - start
+
+    docs_per_second = asyncio.run(document_throughput(embeddings, texts, args.doc_batch))
+    queries_per_second, query_p50 = asyncio.run(query_throughput(embeddings, queries, args.concurrency))
+
+    result = {
+        "dimension": dimension,
+        "load_s": round(load_seconds, 2),
+        "documents_per_s": round(docs_per_second, 1),
+        "queries_per_s": round(queries_per_second, 1),
+        "query_p50_ms": round(query_p50 * 1000, 2),
+    }
+    print(f"{name:12s} dim {dimension:5d}  load {result['load_s']:6.2f} s  "
+          f"docs {result['documents_per_s']:9.1f}/s  queries {result['queries_per_s']:8.1f}/s  "
+          f"p50 {result['query_p50_ms']:8.2f} ms")
+    return result
+
+
+def main(args):
+    texts = sample_texts(args.texts)
+    queries = [f"question {i} about {text[:40]}" for i, text in enumerate(sample_texts(args.queries))]
+    report = {}
+    for name in args.providers.split(","):
+        try:
+            report[name] = run_provider(name, texts, queries, args)
+        except ImportError as e:
+            print(f"{name:12s} skipped: {e}")
+            report[name] = {"skipped": str(e)}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding provider throughput benchmark")
+    parser.add_argument("--providers", default="remote,local,local-int8,local-onnx",
+                        help=f"Comma separated, from remote,{','.join(PROVIDERS)}")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="sentence-transformers model for local runs")
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--doc-batch", type=int, default=256, help="Texts per embed_documents call")
+    parser.add_argument("--batch-size", type=int, default=64, help="Texts per local forward pass")
+    parser.add_argument("--threads", type=int, help="Torch threads; defaults to one per core")
+    parser.add_argument("--concurrency", type=int, default=32, help="Queries in flight at once")
+    parser.add_argument("--remote-latency", type=float, default=0.15, help="Simulated API round trip in seconds")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    main(parser.parse_args())
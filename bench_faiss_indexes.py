@@ -0,0 +1,125 @@
+# bench_faiss_indexes.py - Recall against latency for the index types of faiss_service.IndexWriter.
+# Builds each index type on the same synthetic clustered vectors, appends a further batch through
+# the incremental path, then sweeps the query knobs (nprobe for IVF, efSearch for HNSW) and reports
+# recall@k against exact search with per-query p50/p95 latency. Latency is measured through
+# FaissService, so it includes reading the returned documents from the docstore.
+#
+#   python bench_faiss_indexes.py --vectors 100000 --dimension 128
+#   python bench_faiss_indexes.py --types hnsw,ivf --ef-search 32,128 --nprobe 4,32 --json indexes.json
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+from faiss_service import FaissService, IndexWriter, build_index
+
+
+def clustered_vectors(centers, count, rng):
+    # Real embeddings are far from uniform; cluster structure is what IVF and HNSW exploit
+    points = centers[rng.integers(0, len(centers), size=count)]
+    return points + 0.3 * rng.normal(size=(count, centers.shape[1])).astype("float32")
+
+
+def exact_neighbours(vectors, queries, k):
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    return index.search(queries, k)[1]
+
+
+def knob_values(index_type, args):
+    if index_type in ("ivf", "ivfpq"):
+        return "nprobe", [int(value) for value in args.nprobe.split(",")]
+    if index_type == "hnsw":
+        return "ef_search", [int(value) for value in args.ef_search.split(",")]
+    return None, [None]
+
+
+def run_type(index_type, root, vectors, queries, truth, args):
+    directory = os.path.join(root, index_type)
+    base = len(vectors) - args.add
+    documents = [Document(page_content="") for _ in range(len(vectors))]
+    ids = [str(i) for i in range(len(vectors))]
+
+    start = time.perf_counter()
+    build_index(directory, documents[:base], vectors[:base], ids[:base], index_type=index_type,
+                hnsw_m=args.hnsw_m, nlist=args.nlist, pq_m=args.pq_m, pq_bits=args.pq_bits)
+    build_seconds = time.perf_counter() - start
+    # The incremental path: no retraining, the new rows are appended to the saved index
+    start = time.perf_counter()
+    writer = IndexWriter(directory)
+    writer.add(documents[base:], vectors[base:], ids[base:])
+    manifest = writer.commit()
+    add_seconds = time.perf_counter() - start
+
+    service = FaissService(directory)
+    knob, values = knob_values(index_type, args)
+    results = []
+    for value in values:
+        options = {knob: value} if knob else {}
+        latencies, hits = [], 0
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            found = service.similarity_search_by_vector(query, k=args.k, **options)
+            latencies.append(time.perf_counter() - start)
+            hits += len({int(document.id) for document in found} & set(expected.tolist()))
+        result = {
+            "index_type": index_type,
+            "knob": knob,
+            "value": value,
+            "recall": round(hits / truth.size, 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+            "build_s": round(build_seconds, 2),
+            "add_s": round(add_seconds, 3),
+            "index_mb": round(os.path.getsize(os.path.join(directory, manifest["index"])) / 2 ** 20, 1),
+        }
+        results.append(result)
+        setting = f"{knob}={value}" if knob else "exact scan"
+        print(f"{index_type:6s} {setting:14s} recall@{args.k} {result['recall']:.3f}  "
+              f"p50 {result['p50_ms']:7.3f} ms  p95 {result['p95_ms']:7.3f} ms  "
+              f"build {result['build_s']:7.2f} s  add {args.add} {result['add_s']:6.3f} s  "
+              f"{result['index_mb']:7.1f} MB")
+    service.close()
+    return results
+
+
+def main(args):
+    rng = np.random.default_rng(args.seed)
+    centers = rng.normal(size=(args.clusters, args.dimension)).astype("float32")
+    vectors = clustered_vectors(centers, args.vectors, rng)
+    # Queries come from the same clusters but are not in the index
+    queries = clustered_vectors(centers, args.queries, rng)
+    truth = exact_neighbours(vectors, queries, args.k)
+    report = []
+    with tempfile.TemporaryDirectory() as root:
+        for index_type in args.types.split(","):
+            report.extend(run_type(index_type, root, vectors, queries, truth, args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FAISS index type recall/latency benchmark")
+    parser.add_argument("--types", default="flat,hnsw,pq,ivf,ivfpq")
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--add", type=int, default=1000, help="Vectors appended after the build")
+    parser.add_argument("--dimension", type=int, default=128)
+    parser.add_argument("--clusters", type=int, default=200, help="Clusters in the synthetic data")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nprobe", default="1,4,16,64", help="Comma separated nprobe values for IVF types")
+    parser.add_argument("--ef-search", default="16,32,64,128", help="Comma separated efSearch values for HNSW")
+    parser.add_argument("--nlist", type=int, help="IVF clusters; defaults to about 4 * sqrt(vectors)")
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--pq-m", type=int, help="PQ sub-vectors; defaults to one per 8 dimensions")
+    parser.add_argument("--pq-bits", type=int, default=8, help="Bits per PQ code; training takes longer with more")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    main(parser.parse_args())
@@ -0,0 +1,113 @@
+# bench_faiss_service.py - Load time and memory of a FAISS index: LangChain pickle vs faiss_service.
+# For each corpus size one directory is written with FAISS.save_local and one with faiss_service, then a
+# fresh process opens each and runs a query. RSS is split into private (anonymous) memory, which every
+# serving process pays for itself, and file-backed pages, which processes mapping the same index share.
+#
+#   python bench_faiss_service.py --sizes 10000,100000 --dimension 384
+#   python bench_faiss_service.py --json faiss_load.json
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from bench_embeddings import sample_texts
+
+
+def memory_kb():
+    fields = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("RssAnon", "RssFile"):
+                fields[name] = int(value.split()[0])
+    return fields
+
+
+def child(mode, directory, dimension):
+    """Runs in a fresh interpreter: opens the index, runs one query and prints the measurements."""
+    if mode == "pickle":
+        from langchain_community.vectorstores import FAISS
+    else:
+        from faiss_service import FaissService
+    before = memory_kb()
+    start = time.perf_counter()
+    if mode == "pickle":
+        store = FAISS.load_local(directory, DeterministicFakeEmbedding(size=dimension),
+                                 allow_dangerous_deserialization=True)
+    else:
+        store = FaissService(directory)
+    load_seconds = time.perf_counter() - start
+    loaded = memory_kb()
+    query = np.random.default_rng(1).random(dimension, dtype="float32").tolist()
+    start = time.perf_counter()
+    store.similarity_search_by_vector(query, k=10)
+    query_seconds = time.perf_counter() - start
+    queried = memory_kb()
+    print(json.dumps({
+        "load_ms": round(load_seconds * 1000, 2),
+        "first_query_ms": round(query_seconds * 1000, 2),
+        "private_mb_after_load": round((loaded.get("RssAnon", 0) - before.get("RssAnon", 0)) / 1024, 1),
+        "private_mb_after_query": round((queried.get("RssAnon", 0) - before.get("RssAnon", 0)) / 1024, 1),
+        "shared_mb_after_query": round((queried.get("RssFile", 0) - before.get("RssFile", 0)) / 1024, 1),
+    }))
+
+
+def write_indexes(root, size, dimension):
+    from langchain_community.vectorstores import FAISS
+
+    from faiss_service import build_index
+
+    texts = sample_texts(size)
+    vectors = np.random.default_rng(0).random((size, dimension), dtype="float32")
+    ids = [f"chunk-{i}" for i in range(size)]
+    metadatas = [{"source": f"https://example.org/page{i % 500}"} for i in range(size)]
+    pickle_dir, service_dir = os.path.join(root, f"pickle-{size}"), os.path.join(root, f"service-{size}")
+    FAISS.from_embeddings(list(zip(texts, vectors.tolist())), DeterministicFakeEmbedding(size=dimension),
+                          metadatas=metadatas, ids=ids).save_local(pickle_dir)
+    build_index(service_dir, [Document(page_content=text, metadata=metadata) for text, metadata in zip(texts, metadatas)],
+                vectors, ids)
+    return {"pickle": pickle_dir, "service": service_dir}
+
+
+def measure(mode, directory, dimension):
+    output = subprocess.run([sys.executable, __file__, "--child", mode, directory, "--dimension", str(dimension)],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(args):
+    report = {}
+    with tempfile.TemporaryDirectory() as root:
+        for size in [int(size) for size in args.sizes.split(",")]:
+            directories = write_indexes(root, size, args.dimension)
+            for mode, directory in directories.items():
+                result = measure(mode, directory, args.dimension)
+                report[f"{mode}-{size}"] = result
+                print(f"{mode:8s} {size:8d} chunks  load {result['load_ms']:9.2f} ms  "
+                      f"first query {result['first_query_ms']:8.2f} ms  "
+                      f"private {result['private_mb_after_load']:7.1f} / {result['private_mb_after_query']:7.1f} MB  "
+                      f"shared {result['shared_mb_after_query']:7.1f} MB")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FAISS index load time and memory benchmark")
+    parser.add_argument("--sizes", default="10000,50000,200000", help="Comma separated chunk counts")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "DIRECTORY"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child[0], args.child[1], args.dimension)
+    else:
+        main(args)
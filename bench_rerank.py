@@ -0,0 +1,131 @@
+# bench_rerank.py - End-to-end /generate latency with and without cross-encoder reranking.
+# Compares sending many chunks to the LLM, sending the top few by vector score, and retrieving wide
+# then reranking down to a few. Runs offline against an in-memory Qdrant holding the sample speech.
+# The fake LLM's latency grows with prompt tokens, like the prefill time of a hosted model. The
+# reranker is the real cross-encoder with --model (needs sentence-transformers), otherwise a stand-in
+# that costs --pair-ms per scored pair.
+#
+#   python bench_rerank.py --questions 20 --wide 20 --narrow 5
+#   python bench_rerank.py --model cross-encoder/ms-marco-MiniLM-L-6-v2 --json rerank.json
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+import numpy as np
+from langchain.text_splitter import CharacterTextSplitter
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import FakeListChatModel
+from qdrant_client import AsyncQdrantClient, models
+
+# bench_components sets a placeholder OpenAI key before qdrant_api is imported
+from bench_components import QUESTIONS, SAMPLE_FILE
+import qdrant_api
+from context_packing import count_tokens
+from llm_registry import LLMRegistry
+from query_cache import QueryEmbeddingCache
+from rerank import CrossEncoderScorer, Reranker
+
+
+class PromptLatencyChatModel(FakeListChatModel):
+    """Fake chat model whose latency is a fixed cost plus a cost per 1k prompt tokens."""
+
+    base_latency: float = 0.3
+    seconds_per_1k_tokens: float = 0.1
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt_tokens = sum(count_tokens(message.content) for message in messages)
+        await asyncio.sleep(self.base_latency + self.seconds_per_1k_tokens * prompt_tokens / 1000)
+        return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+def simulated_scorer(pair_seconds):
+    # Word overlap stands in for relevance; the sleep stands in for cross-encoder inference
+    def score(pairs):
+        time.sleep(pair_seconds * len(pairs))
+        return [len(set(query.lower().split()) & set(text.lower().split())) for query, text in pairs]
+    return score
+
+
+async def setup(args):
+    qdrant_api.vdb_client = AsyncQdrantClient(":memory:")
+    qdrant_api.embeddings = DeterministicFakeEmbedding(size=1536)
+    qdrant_api.query_cache = QueryEmbeddingCache(max_size=0)
+    qdrant_api.llm_registry = LLMRegistry(factory=lambda **kwargs: PromptLatencyChatModel(
+        responses=["Benchmark answer"], base_latency=args.llm_base, seconds_per_1k_tokens=args.llm_per_1k
+    ))
+    scorer = CrossEncoderScorer(args.model) if args.model else simulated_scorer(args.pair_ms / 1000)
+    qdrant_api.reranker = Reranker(scorer, model_name=args.model or "simulated", batch_size=args.batch_size,
+                                   max_latency=args.max_latency, cache_size=0)
+    if args.model:
+        qdrant_api.reranker.warm_up()
+
+    with open(SAMPLE_FILE, encoding="utf-8") as f:
+        chunks = CharacterTextSplitter(separator="\n", chunk_size=600, chunk_overlap=100).split_text(f.read())
+    await qdrant_api.vdb_client.create_collection(
+        "bench", vectors_config=models.VectorParams(size=1536, distance=models.Distance.COSINE)
+    )
+    await qdrant_api.vdb_client.upsert("bench", points=[
+        models.PointStruct(id=idx + 1, vector=vector, payload=qdrant_api.format_chunk(idx, text, SAMPLE_FILE))
+        for idx, (text, vector) in enumerate(zip(chunks, qdrant_api.embeddings.embed_documents(chunks)))
+    ])
+
+
+async def run_config(client, name, body, questions):
+    latencies, prompt_tokens, rerank_seconds, fallbacks = [], [], [], 0
+    for question in questions:
+        start = time.perf_counter()
+        response = await client.post("/generate", json={**body, "question": question, "collection_name": "bench",
+                                                        "use_answer_cache": False})
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+        stats = response.json()["context_stats"]
+        prompt_tokens.append(stats["context_tokens"])
+        if "rerank" in stats:
+            rerank_seconds.append(stats["rerank"]["seconds"])
+            fallbacks += stats["rerank"]["fallback"]
+    result = {
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 1),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 1),
+        "context_tokens": int(np.mean(prompt_tokens)),
+    }
+    if rerank_seconds:
+        result["rerank_p50_ms"] = round(float(np.percentile(rerank_seconds, 50)) * 1000, 1)
+        result["rerank_fallbacks"] = fallbacks
+    print(f"{name:28s} p50 {result['p50_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms  "
+          f"context {result['context_tokens']:6d} tokens"
+          + (f"  rerank p50 {result['rerank_p50_ms']:.1f} ms" if rerank_seconds else ""))
+    return result
+
+
+async def main(args):
+    await setup(args)
+    questions = [QUESTIONS[i % len(QUESTIONS)] + f" ({i})" for i in range(args.questions)]
+    configs = {
+        f"top {args.wide} by vector": {"limit": args.wide, "mmr": False},
+        f"top {args.narrow} by vector": {"limit": args.narrow, "mmr": False},
+        f"rerank {args.wide} -> {args.narrow}": {"limit": args.narrow, "fetch_k": args.wide, "rerank": True},
+    }
+    transport = httpx.ASGITransport(app=qdrant_api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        report = {name: await run_config(client, name, body, questions) for name, body in configs.items()}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rerank latency trade-off benchmark")
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--wide", type=int, default=20, help="Chunks retrieved before reranking")
+    parser.add_argument("--narrow", type=int, default=5, help="Chunks sent to the LLM after reranking")
+    parser.add_argument("--model", help="Cross-encoder model; a simulated scorer is used when omitted")
+    parser.add_argument("--pair-ms", type=float, default=1.5, help="Simulated cost per scored pair")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--max-latency", type=float, default=0.5)
+    parser.add_argument("--llm-base", type=float, default=0.3, help="Fake LLM latency in seconds")
+    parser.add_argument("--llm-per-1k", type=float, default=0.1, help="Fake LLM seconds per 1k prompt tokens")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    asyncio.run(main(parser.parse_args()))
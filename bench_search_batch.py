@@ -0,0 +1,48 @@
+# bench_search_batch.py - Compares query throughput of N sequential /search calls with one /search_batch call.
+# Runs fully offline against an in-memory Qdrant and a fake embedder with simulated API latency.
+#
+#   python bench_search_batch.py --queries 50 --latency 0.1
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+# bench_concurrency sets a placeholder OpenAI key before qdrant_api is imported
+from bench_concurrency import setup_bench_api
+import qdrant_api
+
+
+async def main(args):
+    await setup_bench_api(args.points, args.latency)
+    queries = [f"evaluation question {i}" for i in range(args.queries)]
+
+    transport = httpx.ASGITransport(app=qdrant_api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        for query in queries:
+            response = await client.post("/search", json={"query": query, "collection_name": "bench", "limit": args.limit})
+            assert response.status_code == 200, response.text
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = await client.post(
+            "/search_batch", json={"queries": queries, "collection_name": "bench", "limit": args.limit}
+        )
+        assert response.status_code == 200, response.text
+        batched = time.perf_counter() - start
+
+    print(f"{args.queries} queries, limit {args.limit}, embedding latency {args.latency * 1000:.0f} ms")
+    print(f"sequential /search: {sequential * 1000:8.0f} ms  {args.queries / sequential:8.1f} queries/sec")
+    print(f"/search_batch:      {batched * 1000:8.0f} ms  {args.queries / batched:8.1f} queries/sec "
+          f"({sequential / batched:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch search throughput benchmark")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--points", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
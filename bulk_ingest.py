@@ -0,0 +1,253 @@
+# bulk_ingest.py - Ingests a whole document set: a directory, a glob pattern or a tar/zip archive.
+# Files are walked lazily, split on the ParallelSplitter's worker processes and fed as one stream
+# through a single IngestionPipeline. A manifest records each file's fingerprint, so a re-run skips
+# files that have not changed since they were last ingested into the collection.
+
+import asyncio
+import fnmatch
+import glob
+import io
+import os
+import sqlite3
+import tarfile
+import time
+import zipfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional
+
+from langchain_core.documents import Document
+
+from ingest_pipeline import IngestionPipeline, IngestionStats
+from parallel_splitting import Chunk, ParallelSplitter
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+# Separates an archive path from the member path in a chunk's `source`
+ARCHIVE_MEMBER_SEPARATOR = "::"
+
+INGESTED = "ingested"
+UNCHANGED = "unchanged"
+FAILED = "failed"
+
+
+@dataclass
+class SourceFile:
+    # Path of the file, or archive path and member joined by ARCHIVE_MEMBER_SEPARATOR
+    name: str
+    size: int
+    # Changes whenever the content may have changed: size and mtime, or size and CRC for zip members
+    fingerprint: str
+    read: Callable[[], bytes]
+
+
+def _read_file(path: str) -> Callable[[], bytes]:
+    def read() -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+    return read
+
+
+def _file_source(path: str) -> SourceFile:
+    stat = os.stat(path)
+    return SourceFile(path, stat.st_size, f"{stat.st_size}:{stat.st_mtime_ns}", _read_file(path))
+
+
+def _iter_zip(path: str, pattern: str) -> Iterator[SourceFile]:
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not fnmatch.fnmatch(info.filename, pattern):
+                continue
+            yield SourceFile(f"{path}{ARCHIVE_MEMBER_SEPARATOR}{info.filename}", info.file_size,
+                             f"{info.file_size}:{info.CRC}", lambda info=info: archive.read(info))
+
+
+def _iter_tar(path: str, pattern: str) -> Iterator[SourceFile]:
+    # Members are read before the iteration moves on, so compressed archives are read in one pass
+    with tarfile.open(path, "r:*") as archive:
+        for member in archive:
+            if not member.isfile() or not fnmatch.fnmatch(member.name, pattern):
+                continue
+            yield SourceFile(f"{path}{ARCHIVE_MEMBER_SEPARATOR}{member.name}", member.size,
+                             f"{member.size}:{member.mtime}",
+                             lambda member=member: archive.extractfile(member).read())
+
+
+def iter_sources(path: str, pattern: str = "*") -> Iterator[SourceFile]:
+    """Lazily yields the files under `path`.
+
+    `path` may be a file, a directory (walked recursively in sorted order), a tar or zip archive, or
+    a glob pattern such as "docs/**/*.md". Inside directories and archives only files whose relative
+    path matches the fnmatch `pattern` are returned.
+    """
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full_path = os.path.join(root, name)
+                if fnmatch.fnmatch(os.path.relpath(full_path, path), pattern):
+                    yield _file_source(full_path)
+    elif os.path.isfile(path) and path.lower().endswith(".zip"):
+        yield from _iter_zip(path, pattern)
+    elif os.path.isfile(path) and path.lower().endswith(ARCHIVE_SUFFIXES):
+        yield from _iter_tar(path, pattern)
+    elif os.path.isfile(path):
+        yield _file_source(path)
+    else:
+        matches = glob.iglob(path, recursive=True)
+        yielded = False
+        for match in matches:
+            if os.path.isfile(match):
+                yielded = True
+                yield _file_source(match)
+        if not yielded and not glob.has_magic(path):
+            raise FileNotFoundError(f"No such file, directory or archive: {path}")
+
+
+class IngestManifest:
+    """SQLite record of the files ingested into each collection, by fingerprint and chunk count."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ingested_files ("
+                "collection TEXT NOT NULL, source TEXT NOT NULL, fingerprint TEXT NOT NULL, "
+                "chunks INTEGER NOT NULL, ingested_at REAL NOT NULL, PRIMARY KEY (collection, source))"
+            )
+
+    def get(self, collection: str, source: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT fingerprint, chunks FROM ingested_files WHERE collection = ? AND source = ?",
+                (collection, source)
+            ).fetchone()
+        return {"fingerprint": row[0], "chunks": row[1]} if row else None
+
+    def record(self, collection: str, files: Iterable["FileReport"]):
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO ingested_files VALUES (?, ?, ?, ?, ?)",
+                [(collection, report.source, report.fingerprint, report.chunks, now) for report in files]
+            )
+
+    def clear(self, collection: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM ingested_files WHERE collection = ?", (collection,))
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+@dataclass
+class FileReport:
+    source: str
+    fingerprint: str
+    status: str = INGESTED
+    bytes: int = 0
+    chunks: int = 0
+    # Chunk count of the previous ingestion, when the file was ingested before
+    previous_chunks: Optional[int] = None
+    error: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        result = {"source": self.source, "status": self.status, "bytes": self.bytes, "chunks": self.chunks}
+        if self.error is not None:
+            result["error"] = self.error
+        return result
+
+
+async def iterate_in_thread(iterator: Iterator[Any], batch_size: int) -> AsyncIterator[Any]:
+    """Yields the items of a blocking iterator, advancing it `batch_size` items at a time in a worker thread."""
+    # File reads and waits on the split workers block, so they happen off the event loop
+    while items := await asyncio.to_thread(lambda: list(islice(iterator, batch_size))):
+        for item in items:
+            yield item
+
+
+class BulkIngestion:
+    """Ingests many files into one collection through a shared splitter and pipeline.
+
+    Args:
+      pipeline: Embeds and upserts the chunks of every file; its `id_field` should be "chunk_id".
+      splitter: Splits the files on its worker processes.
+      manifest: Where ingested files are recorded; unchanged files are skipped on later runs.
+      format_chunk: Turns a `Chunk` into the point payload.
+      encoding: Text encoding of the files.
+      force: Ingest every file, even those the manifest lists as unchanged.
+    """
+
+    def __init__(self, pipeline: IngestionPipeline, splitter: ParallelSplitter, manifest: IngestManifest,
+                 format_chunk: Callable[[Chunk], Dict[str, Any]], encoding: str = "utf-8", force: bool = False):
+        self.pipeline = pipeline
+        self.splitter = splitter
+        self.manifest = manifest
+        self.format_chunk = format_chunk
+        self.encoding = encoding
+        self.force = force
+        self.files: List[FileReport] = []
+        self._by_source: Dict[str, FileReport] = {}
+
+    def _documents(self, sources: Iterable[SourceFile]) -> Iterator[Document]:
+        collection = self.pipeline.collection_name
+        for source in sources:
+            report = FileReport(source.name, source.fingerprint, bytes=source.size)
+            self.files.append(report)
+            previous = self.manifest.get(collection, source.name)
+            if previous is not None:
+                report.previous_chunks = previous["chunks"]
+                if not self.force and previous["fingerprint"] == source.fingerprint:
+                    report.status = UNCHANGED
+                    report.chunks = previous["chunks"]
+                    continue
+            try:
+                # Universal newlines, as TextLoader reads files for /upload_file, so CRLF files chunk alike
+                text = io.TextIOWrapper(io.BytesIO(source.read()), encoding=self.encoding, newline=None).read()
+            except (OSError, UnicodeDecodeError, tarfile.TarError, zipfile.BadZipFile) as e:
+                report.status = FAILED
+                report.error = str(e)
+                continue
+            self._by_source[source.name] = report
+            yield Document(page_content=text, metadata={"source": source.name})
+
+    def _chunks(self, sources: Iterable[SourceFile]) -> Iterator[Dict[str, Any]]:
+        for chunk in self.splitter.iter_chunks(self._documents(sources)):
+            self._by_source[chunk.source].chunks += 1
+            yield self.format_chunk(chunk)
+
+    async def run(self, sources: Iterable[SourceFile], stats: Optional[IngestionStats] = None) -> IngestionStats:
+        """Ingests every source and records the ingested files in the manifest.
+
+        Files are recorded once the whole run succeeds; after a failure a re-run reads them again,
+        but chunks already in the embedding store are not embedded again.
+        """
+        chunks = iterate_in_thread(self._chunks(iter(sources)), self.pipeline.batch_size)
+        stats = await self.pipeline.run(chunks, stats=stats)
+        ingested = [report for report in self.files if report.status == INGESTED]
+        await asyncio.to_thread(self.manifest.record, self.pipeline.collection_name, ingested)
+        return stats
+
+    def shrunk_files(self) -> List[FileReport]:
+        """Re-ingested files that now have fewer chunks, whose trailing points are left over."""
+        return [report for report in self.files
+                if report.status == INGESTED and (report.previous_chunks or 0) > report.chunks]
+
+    def summary(self, stats: IngestionStats) -> Dict[str, Any]:
+        ingested = [report for report in self.files if report.status == INGESTED]
+        megabytes = sum(report.bytes for report in ingested) / 2 ** 20
+        return {
+            "files_seen": len(self.files),
+            "files_ingested": len(ingested),
+            "files_unchanged": sum(report.status == UNCHANGED for report in self.files),
+            "files_failed": sum(report.status == FAILED for report in self.files),
+            "chunks": stats.chunks,
+            "mb_per_sec": round(megabytes / stats.seconds, 3) if stats.seconds > 0 else 0.0,
+        }
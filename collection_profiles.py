@@ -0,0 +1,106 @@
+# collection_profiles.py - Builds Qdrant storage and search settings for memory/latency/recall trade-offs.
+# Used by qdrant_api's /create_collection and /search endpoints and by bench_collection_profiles.py.
+
+from typing import Any, Dict, List, Optional, Union
+
+from qdrant_client import models
+
+from sparse_encoder import SPARSE_VECTOR_NAME
+
+QUANTIZATION_TYPES = ("scalar", "product", "binary")
+
+# Payload fields indexed as keywords when a collection is created, so filters on them stay fast
+DEFAULT_KEYWORD_INDEXES = ["source"]
+
+FilterValue = Union[str, int, bool, List[Union[str, int]]]
+
+
+def build_quantization_config(quantization: Optional[str], always_ram: bool = True,
+                              product_compression: str = "x16"):
+    """Returns the Qdrant quantization config for `quantization` ("scalar", "product", "binary" or None)."""
+    if quantization is None:
+        return None
+    if quantization == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, always_ram=always_ram)
+        )
+    if quantization == "product":
+        return models.ProductQuantization(
+            product=models.ProductQuantizationConfig(
+                compression=models.CompressionRatio(product_compression), always_ram=always_ram
+            )
+        )
+    if quantization == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=always_ram))
+    raise ValueError(f"Unknown quantization {quantization!r}, expected one of {QUANTIZATION_TYPES}")
+
+
+def build_collection_config(size: int, hnsw_m: Optional[int] = None, hnsw_ef_construct: Optional[int] = None,
+                            quantization: Optional[str] = None, quantization_always_ram: bool = True,
+                            product_compression: str = "x16", on_disk_vectors: Optional[bool] = None,
+                            on_disk_payload: Optional[bool] = None, hybrid: bool = False) -> Dict[str, Any]:
+    """Keyword arguments for `create_collection`; settings left as None keep the Qdrant defaults.
+
+    `hybrid` adds a named sparse vector for BM25 keyword scores next to the unnamed dense vector.
+    """
+    config: Dict[str, Any] = {
+        "vectors_config": models.VectorParams(size=size, distance=models.Distance.COSINE, on_disk=on_disk_vectors),
+    }
+    if hnsw_m is not None or hnsw_ef_construct is not None:
+        config["hnsw_config"] = models.HnswConfigDiff(m=hnsw_m, ef_construct=hnsw_ef_construct)
+    quantization_config = build_quantization_config(quantization, quantization_always_ram, product_compression)
+    if quantization_config is not None:
+        config["quantization_config"] = quantization_config
+    if on_disk_payload is not None:
+        config["on_disk_payload"] = on_disk_payload
+    if hybrid:
+        config["sparse_vectors_config"] = {
+            SPARSE_VECTOR_NAME: models.SparseVectorParams(index=models.SparseIndexParams(on_disk=on_disk_vectors))
+        }
+    return config
+
+
+def build_search_params(hnsw_ef: Optional[int] = None, exact: bool = False, rescore: Optional[bool] = None,
+                        oversampling: Optional[float] = None) -> Optional[models.SearchParams]:
+    if hnsw_ef is None and not exact and rescore is None and oversampling is None:
+        return None
+    quantization = None
+    if rescore is not None or oversampling is not None:
+        quantization = models.QuantizationSearchParams(rescore=rescore, oversampling=oversampling)
+    return models.SearchParams(hnsw_ef=hnsw_ef, exact=exact, quantization=quantization)
+
+
+def build_payload_filter(filters: Optional[Dict[str, FilterValue]]) -> Optional[models.Filter]:
+    """Turns {field: value} pairs into a Qdrant filter where every field must match.
+
+    A list value matches any of its elements.
+    """
+    if not filters:
+        return None
+    conditions = []
+    for key, value in filters.items():
+        match = models.MatchAny(any=value) if isinstance(value, list) else models.MatchValue(value=value)
+        conditions.append(models.FieldCondition(key=key, match=match))
+    return models.Filter(must=conditions)
+
+
+def estimate_memory_bytes(points: int, size: int, hnsw_m: int = 16, quantization: Optional[str] = None,
+                          product_compression: str = "x16", on_disk_vectors: bool = False) -> Dict[str, int]:
+    """Estimates the RAM a collection needs, following Qdrant's capacity planning guidance.
+
+    Original float32 vectors stay in RAM unless `on_disk_vectors`; quantized copies are always counted
+    as RAM resident. The HNSW graph keeps about 2 * m links of 4 bytes per point on layer 0, and
+    the total adds Qdrant's rule-of-thumb 50% overhead for metadata and optimizer segments.
+    """
+    original = points * size * 4
+    quantized = 0
+    if quantization == "scalar":
+        quantized = points * size
+    elif quantization == "binary":
+        quantized = points * ((size + 7) // 8)
+    elif quantization == "product":
+        quantized = original // int(product_compression.lstrip("x"))
+    graph = points * hnsw_m * 2 * 4
+    ram = (0 if on_disk_vectors else original) + quantized + graph
+    return {"vectors_ram": 0 if on_disk_vectors else original, "quantized_ram": quantized,
+            "hnsw_graph_ram": graph, "total_ram": int(ram * 1.5), "vectors_disk": original if on_disk_vectors else 0}
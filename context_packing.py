@@ -0,0 +1,173 @@
+# context_packing.py - Builds the LLM context from retrieved chunks within a token budget.
+# Candidates are ranked with maximal marginal relevance (MMR) over their vectors, text repeated
+# between overlapping neighbouring chunks is dropped, and chunks are packed until the model's
+# context budget is spent. Used by qdrant_api's /generate endpoints and web_scrape_app_faiss.py.
+
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Tokens of retrieved context allowed per model; the rest of the window is left for the prompt and answer
+CONTEXT_TOKEN_BUDGETS = {
+    "llama3-70b-8192": 4000,
+    "gemma2-9b-it": 4000,
+    "qwen/qwen3-32b": 8000,
+    "gemini-2.0-flash": 8000,
+}
+DEFAULT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "4000"))
+
+# Overlaps shorter than this are treated as coincidence rather than repeated text
+MIN_OVERLAP_CHARS = 20
+
+
+def context_token_budget(model: str) -> int:
+    return CONTEXT_TOKEN_BUDGETS.get(model, DEFAULT_CONTEXT_TOKEN_BUDGET)
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    # tiktoken downloads its vocabulary on first use; without network access fall back to an estimate
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Token count under cl100k_base, or about four characters per token when it is unavailable."""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def mmr_select(query_vector, vectors, k: int, lambda_mult: float = 0.7) -> List[int]:
+    """Indices of up to `k` vectors picked by maximal marginal relevance, in pick order.
+
+    `lambda_mult` weighs relevance to the query against dissimilarity to the vectors already picked;
+    1.0 is plain similarity ranking.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if len(vectors) == 0 or k <= 0:
+        return []
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_vector, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+    relevance = vectors @ query
+    # Highest similarity of every candidate to anything picked so far, updated one row at a time
+    redundancy = np.full(len(vectors), -np.inf, dtype=np.float32)
+    available = np.ones(len(vectors), dtype=bool)
+    picked = []
+    for _ in range(min(k, len(vectors))):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * (redundancy if picked else 0.0)
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, vectors @ vectors[best])
+    return picked
+
+
+def overlap_length(previous: str, text: str, max_overlap: int = 2000) -> int:
+    """Length of the longest prefix of `text` that `previous` ends with, ignoring short coincidences."""
+    if len(text) < MIN_OVERLAP_CHARS:
+        return 0
+    head = text[:MIN_OVERLAP_CHARS]
+    # The earliest place `previous` repeats the start of `text` and runs to its end is the longest overlap
+    start = previous.find(head, max(len(previous) - min(len(text), max_overlap), 0))
+    while start != -1:
+        if text.startswith(previous[start:]):
+            return len(previous) - start
+        start = previous.find(head, start + 1)
+    return 0
+
+
+def _position(chunk: Dict[str, Any], rank: int) -> int:
+    # Point ids may be UUIDs, so only an integer position orders neighbouring chunks
+    position = chunk.get("position")
+    return position if isinstance(position, int) else rank
+
+
+@dataclass
+class PackedContext:
+    context: str
+    chunks: List[Dict[str, Any]]
+    stats: Dict[str, Any] = field(default_factory=dict)
+
+
+def pack_context(chunks: Sequence[Dict[str, Any]], token_budget: int, query_vector=None,
+                 vectors: Optional[Sequence[Sequence[float]]] = None, limit: Optional[int] = None,
+                 lambda_mult: float = 0.7, token_counter: Callable[[str], int] = count_tokens) -> PackedContext:
+    """Selects, de-duplicates and orders retrieved chunks into a context string.
+
+    Args:
+      chunks: Retrieved chunks, best first, each with a `text` and optionally a `source` and an
+        integer `position` giving its place in the source. Chunks without one keep their rank order.
+      token_budget: Maximum tokens of context.
+      query_vector, vectors: When both are given, chunks are re-ranked with MMR first.
+      limit: Maximum number of chunks to keep; defaults to all of them.
+
+    Chunks are taken in rank order while they fit the budget, net of text they share with
+    neighbours already taken. Runs of neighbouring chunks are then joined into one passage without
+    the repeated text, and passages are ordered by their best ranked chunk.
+    """
+    limit = len(chunks) if limit is None else limit
+    if vectors is not None and query_vector is not None:
+        order = mmr_select(query_vector, vectors, len(chunks), lambda_mult)
+    else:
+        order = list(range(len(chunks)))
+
+    baseline_tokens = token_counter("\n".join(chunk["text"] for chunk in chunks[:limit]))
+    taken: List[int] = []
+    used_tokens = 0
+    for index in order:
+        if len(taken) == limit:
+            break
+        text = chunks[index]["text"]
+        shared = 0
+        for other in taken:
+            if chunks[other].get("source") == chunks[index].get("source"):
+                shared = max(shared, overlap_length(chunks[other]["text"], text),
+                             overlap_length(text, chunks[other]["text"]))
+        cost = token_counter(text) - (token_counter(text[:shared]) if shared else 0)
+        if used_tokens + cost > token_budget:
+            continue
+        taken.append(index)
+        used_tokens += cost
+
+    rank = {index: position for position, index in enumerate(taken)}
+    by_position = sorted(taken, key=lambda index: (str(chunks[index].get("source", "")),
+                                                   _position(chunks[index], rank[index])))
+    passages: List[Dict[str, Any]] = []
+    overlap_chars = 0
+    for index in by_position:
+        text = chunks[index]["text"]
+        previous = passages[-1] if passages else None
+        if previous is not None and previous["source"] == chunks[index].get("source"):
+            shared = overlap_length(previous["text"], text)
+            if shared:
+                previous["text"] += text[shared:]
+                previous["rank"] = min(previous["rank"], rank[index])
+                overlap_chars += shared
+                continue
+        passages.append({"text": text, "source": chunks[index].get("source"), "rank": rank[index]})
+    context = "\n".join(passage["text"] for passage in sorted(passages, key=lambda passage: passage["rank"]))
+
+    context_tokens = token_counter(context)
+    return PackedContext(
+        context=context,
+        chunks=[chunks[index] for index in taken],
+        stats={
+            "candidates": len(chunks),
+            "chunks_used": len(taken),
+            "token_budget": token_budget,
+            "context_tokens": context_tokens,
+            "baseline_context_tokens": baseline_tokens,
+            "tokens_saved": baseline_tokens - context_tokens,
+            "overlap_chars_removed": overlap_chars,
+        },
+    )
@@ -0,0 +1,183 @@
+# embedding_providers.py - Embedding backends shared by the API, the Streamlit apps and the scripts.
+# EMBEDDING_PROVIDER picks "openai" (remote, the default), "local" (sentence-transformers on CPU,
+# optionally int8-quantized or ONNX) or "fake" (deterministic vectors for offline runs), and
+# EMBEDDING_MODEL the model. Collection sizes come from `embedding_dimension` rather than a constant.
+
+import asyncio
+import os
+import threading
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+
+PROVIDERS = ("openai", "local", "fake")
+DEFAULT_MODELS = {
+    "openai": "text-embedding-ada-002",
+    "local": "all-MiniLM-L6-v2",
+}
+# Output sizes of remote models, so collections can be created without an embedding call
+KNOWN_DIMENSIONS = {
+    "text-embedding-ada-002": 1536,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+}
+
+
+@lru_cache(maxsize=None)
+def _load_sentence_transformer(model_name: str, backend: str, quantize: bool, onnx_file: Optional[str]):
+    # One model per process and configuration, however many LocalEmbeddings objects use it
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError as e:
+        raise ImportError("The local embedding provider needs sentence-transformers: "
+                          "pip install sentence-transformers") from e
+    if backend == "onnx":
+        # Quantized ONNX exports ship in the model repo, e.g. onnx/model_qint8_avx512_vnni.onnx
+        model_kwargs = {"file_name": onnx_file} if onnx_file else None
+        return SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+    model = SentenceTransformer(model_name, device="cpu")
+    if quantize:
+        import torch
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+class _MicroBatcher:
+    """Collects concurrent single-text requests on one event loop into batched encode calls."""
+
+    def __init__(self, encode: Callable[[List[str]], List[List[float]]], max_batch: int, max_wait: float):
+        self.encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._worker: Optional[asyncio.Task] = None
+
+    async def submit(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._worker = loop.create_task(self._drain())
+        return await future
+
+    async def _drain(self):
+        while self._pending:
+            # Give requests arriving at the same moment a chance to join the batch
+            await asyncio.sleep(self.max_wait)
+            batch = [(text, future) for text, future in self._pending[:self.max_batch] if not future.done()]
+            del self._pending[:self.max_batch]
+            if not batch:
+                continue
+            try:
+                vectors = await asyncio.to_thread(self.encode, [text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future), vector in zip(batch, vectors):
+                    if not future.done():
+                        future.set_result(vector)
+
+
+class LocalEmbeddings(Embeddings):
+    """sentence-transformers embeddings computed on this machine's CPU.
+
+    Args:
+      model_name: Any sentence-transformers model, e.g. "all-MiniLM-L6-v2".
+      backend: "torch" or "onnx".
+      quantize: With the torch backend, dynamically quantize the linear layers to int8.
+      onnx_file: With the onnx backend, the ONNX file in the model repo to load, e.g. a quantized export.
+      batch_size: Texts encoded per forward pass.
+      num_threads: Torch intra-op threads; defaults to one per core.
+      max_wait: Seconds a query waits for concurrent queries to share its forward pass.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODELS["local"], backend: str = "torch", quantize: bool = False,
+                 onnx_file: Optional[str] = None, batch_size: int = 64, num_threads: Optional[int] = None,
+                 max_wait: float = 0.002):
+        if backend not in ("torch", "onnx"):
+            raise ValueError(f"Unknown backend {backend!r}, expected 'torch' or 'onnx'")
+        self.model_name = model_name
+        self.backend = backend
+        self.quantize = quantize
+        self.onnx_file = onnx_file
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self._lock = threading.Lock()
+        self._batcher = _MicroBatcher(self._encode, max_batch=batch_size, max_wait=max_wait)
+
+    @property
+    def model(self) -> str:
+        # Embedding caches key on this name, so quantized and exported variants never share vectors
+        variant = "onnx" if self.backend == "onnx" else ("int8" if self.quantize else "")
+        suffix = "/".join(filter(None, [variant, self.onnx_file]))
+        return f"{self.model_name}+{suffix}" if suffix else self.model_name
+
+    @property
+    def client(self):
+        if self.num_threads:
+            import torch
+            torch.set_num_threads(self.num_threads)
+        return _load_sentence_transformer(self.model_name, self.backend, self.quantize, self.onnx_file)
+
+    @property
+    def dimensions(self) -> int:
+        return self.client.get_sentence_embedding_dimension()
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        # One forward pass at a time per model; torch already spreads each pass over all cores
+        with self._lock:
+            vectors = self.client.encode(texts, batch_size=self.batch_size, normalize_embeddings=True,
+                                         convert_to_numpy=True, show_progress_bar=False)
+        return vectors.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts)) if texts else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self._batcher.submit(text)
+
+
+def create_embeddings(provider: Optional[str] = None, model: Optional[str] = None, **options) -> Embeddings:
+    """Builds the embeddings object for `provider`, defaulting to EMBEDDING_PROVIDER and EMBEDDING_MODEL.
+
+    The local provider also reads EMBEDDING_BACKEND, EMBEDDING_QUANTIZE=1, EMBEDDING_ONNX_FILE and
+    EMBEDDING_THREADS; `options` override them.
+    """
+    provider = provider or os.getenv("EMBEDDING_PROVIDER", "openai")
+    model = model or os.getenv("EMBEDDING_MODEL") or DEFAULT_MODELS.get(provider)
+    if provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(model=model, **options)
+    if provider == "local":
+        settings = {
+            "backend": os.getenv("EMBEDDING_BACKEND", "torch"),
+            "quantize": os.getenv("EMBEDDING_QUANTIZE") == "1",
+            "onnx_file": os.getenv("EMBEDDING_ONNX_FILE"),
+            "num_threads": int(os.environ["EMBEDDING_THREADS"]) if os.getenv("EMBEDDING_THREADS") else None,
+        }
+        return LocalEmbeddings(model, **{**settings, **options})
+    if provider == "fake":
+        return DeterministicFakeEmbedding(size=options.get("size", int(os.getenv("EMBEDDING_DIMENSION", "1536"))))
+    raise ValueError(f"Unknown embedding provider {provider!r}, expected one of {PROVIDERS}")
+
+
+def embedding_dimension(embeddings: Embeddings) -> int:
+    """Vector size produced by `embeddings`; embeds a probe text only when it cannot be looked up."""
+    # `dimension` is set by CachedEmbeddings when it knows the size of the embedder it wraps
+    dimensions = (getattr(embeddings, "dimensions", None) or getattr(embeddings, "size", None)
+                  or getattr(embeddings, "dimension", None))
+    if dimensions:
+        return int(dimensions)
+    model = getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None)
+    if model in KNOWN_DIMENSIONS:
+        return KNOWN_DIMENSIONS[model]
+    return len(embeddings.embed_query("dimension probe"))
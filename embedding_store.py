@@ -0,0 +1,178 @@
+# embedding_store.py - Persistent, content-addressed store of chunk embeddings.
+# Vectors are keyed by a hash of (model, dimension, chunk text), so re-ingesting an unchanged or
+# lightly edited corpus only sends the new chunks to the embedding API.
+
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+from langchain_core.embeddings import Embeddings
+
+# SQLite caps the number of bound parameters per statement
+_MAX_PARAMS = 500
+
+
+def embedding_model_name(embeddings) -> str:
+    """Best-effort name of the model behind a LangChain embeddings object."""
+    return getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None) or type(embeddings).__name__
+
+
+class EmbeddingStore:
+    """SQLite-backed map from hash(model, dimension, text) to a float32 vector.
+
+    Args:
+      path: SQLite database file; created if missing. Several processes may share it.
+      max_entries: When set, least recently used vectors beyond this count are evicted after each write.
+    """
+
+    def __init__(self, path: str, max_entries: Optional[int] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, dimension INTEGER NOT NULL, "
+                "vector BLOB NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+
+    @staticmethod
+    def make_key(model: str, dimension: int, text: str) -> str:
+        return hashlib.sha256(f"{model}\x00{dimension}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, dimension: int, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Returns the stored vector for each text, or None where the text has not been embedded yet."""
+        keys = [self.make_key(model, dimension, text) for text in texts]
+        found: Dict[str, List[float]] = {}
+        now = time.time()
+        with self._connect() as conn:
+            for start in range(0, len(keys), _MAX_PARAMS):
+                chunk = keys[start:start + _MAX_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                for key, blob in conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ):
+                    found[key] = array("f", blob).tolist()
+                conn.execute(f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})", [now, *chunk])
+        vectors = [found.get(key) for key in keys]
+        with self._lock:
+            hits = sum(vector is not None for vector in vectors)
+            self.hits += hits
+            self.misses += len(vectors) - hits
+        return vectors
+
+    def put_many(self, model: str, dimension: int, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        now = time.time()
+        rows = [
+            (self.make_key(model, dimension, text), model, dimension, array("f", vector).tobytes(), now, now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dimension, vector, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+        if self.max_entries is not None:
+            self.evict(self.max_entries)
+
+    def evict(self, max_entries: int) -> int:
+        """Deletes the least recently used vectors beyond `max_entries` and returns how many were removed."""
+        with self._connect() as conn:
+            removed = conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                "SELECT key FROM embeddings ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (max_entries,)
+            ).rowcount
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    def compact(self):
+        """Reclaims the disk space freed by evictions."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self) -> Dict[str, float]:
+        entries = len(self)
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embeddings object so document embeddings are read from and written to an EmbeddingStore.
+
+    Only the chunks missing from the store are sent to the wrapped embedder, in one batched call.
+    Query embeddings are passed straight through.
+
+    Args:
+      embeddings: The LangChain embeddings object doing the actual work.
+      store: The EmbeddingStore consulted before every call.
+      dimension: Output dimension used in the cache key; read from the embedder when not given.
+    """
+
+    def __init__(self, embeddings: Embeddings, store: EmbeddingStore, dimension: Optional[int] = None):
+        self.embeddings = embeddings
+        self.store = store
+        self.model = embedding_model_name(embeddings)
+        self.dimension = dimension or getattr(embeddings, "dimensions", None) or getattr(embeddings, "size", None) or 0
+        self.embedded = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.store.get_many(self.model, self.dimension, texts)
+        missing = [idx for idx, vector in enumerate(vectors) if vector is None]
+        if missing:
+            self._fill(vectors, missing, self.embeddings.embed_documents([texts[idx] for idx in missing]), texts)
+        return vectors
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = await asyncio.to_thread(self.store.get_many, self.model, self.dimension, texts)
+        missing = [idx for idx, vector in enumerate(vectors) if vector is None]
+        if missing:
+            fresh = await self.embeddings.aembed_documents([texts[idx] for idx in missing])
+            await asyncio.to_thread(self._fill, vectors, missing, fresh, texts)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
+
+    def _fill(self, vectors, missing, fresh, texts):
+        self.store.put_many(self.model, self.dimension, [texts[idx] for idx in missing], fresh)
+        for idx, vector in zip(missing, fresh):
+            vectors[idx] = vector
+        self.embedded += len(missing)
@@ -0,0 +1,462 @@
+# faiss_service.py - FAISS retrieval over an index directory that is opened once and memory-mapped.
+# The vectors are written with faiss.write_index and mapped in place on load, so opening the index
+# costs the same at any size and processes serving the same directory share its pages. Documents
+# live in an offset-indexed JSON lines file instead of LangChain's pickle: row i of the docstore is
+# the record between offsets i and i + 1, read from the mapped file only when a search returns it.
+# FAISS labels every vector with its docstore row.
+#
+# IndexWriter adds and removes documents without rebuilding: new records are appended to the
+# docstore and the index is trained once, on its first batch. Every commit produces a new generation
+# of files and then replaces manifest.json atomically, so a reader never sees a half-written index;
+# FaissService.refresh() switches to the newest generation.
+
+import json
+import math
+import mmap
+import os
+import pickle
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+METRICS = {"l2": faiss.METRIC_L2, "inner_product": faiss.METRIC_INNER_PRODUCT}
+# flat: exact search. hnsw: graph search tuned with ef_search. pq: exact scan of compressed codes.
+# ivf / ivfpq: search only the nprobe nearest of nlist clusters, storing full vectors or PQ codes.
+INDEX_TYPES = ("flat", "hnsw", "pq", "ivf", "ivfpq")
+DEFAULT_NPROBE = 8
+DEFAULT_EF_SEARCH = 64
+
+
+def _read_index(path: str):
+    # In-place mapping needs faiss >= 1.10; older releases can still map the file with IO_FLAG_MMAP
+    flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    try:
+        return faiss.read_index(path, flag)
+    except RuntimeError:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+
+
+def read_manifest(directory: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def index_exists(directory: str) -> bool:
+    return read_manifest(directory) is not None
+
+
+def indexed_sources(directory: str) -> Set[str]:
+    """The metadata "source" of every document in the index; empty when there is no index."""
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return set()
+    if "sources" in manifest:
+        return set(manifest["sources"])
+    # Written before manifests listed their sources: read them from the live docstore records
+    deleted = set()
+    if manifest["deleted"]:
+        deleted = set(np.fromfile(os.path.join(directory, manifest["deleted"]), dtype="<i8").tolist())
+    docstore = OffsetDocstore(os.path.join(directory, manifest["records"]),
+                              os.path.join(directory, manifest["offsets"]))
+    try:
+        sources = {docstore[row].metadata.get("source") for row in range(manifest["rows"]) if row not in deleted}
+    finally:
+        docstore.close()
+    return sources - {None}
+
+
+def default_nlist(count: int) -> int:
+    # About 4 * sqrt(n) clusters, with the 39 training vectors per cluster FAISS asks for
+    return max(1, min(int(4 * math.sqrt(count)), count // 39))
+
+
+def default_pq_m(dimension: int) -> int:
+    # Sub-vectors of about 8 dimensions; their number has to divide the dimension
+    return next(m for m in range(max(1, dimension // 8), 0, -1) if dimension % m == 0)
+
+
+class OffsetDocstore:
+    """Read-only documents stored as JSON lines plus a little-endian uint64 offset per row.
+
+    Both files are memory-mapped, so opening the store reads nothing and a lookup reads one record.
+    """
+
+    def __init__(self, records_path: str, offsets_path: str):
+        self.offsets = np.memmap(offsets_path, dtype="<u8", mode="r")
+        with open(records_path, "rb") as f:
+            # mmap cannot map an empty file, which is what a store without documents has
+            self._records = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    @staticmethod
+    def write(records_path: str, offsets_path: str, documents: Iterable[Document], ids: Iterable[str],
+              start_row: int = 0) -> int:
+        """Writes the documents as rows start_row, start_row + 1, ... and returns the new row count.
+
+        Rows from start_row on are replaced, which drops any left by a write that never reached the
+        manifest. Readers only map rows below start_row, so appending does not disturb them.
+        """
+        end = int(np.fromfile(offsets_path, dtype="<u8", count=start_row + 1)[-1]) if start_row else 0
+        offsets = [] if start_row else [0]
+        with open(records_path, "r+b" if start_row else "wb") as f:
+            f.truncate(end)
+            f.seek(end)
+            for document, doc_id in zip(documents, ids):
+                record = {"id": doc_id, "page_content": document.page_content, "metadata": document.metadata}
+                f.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                offsets.append(f.tell())
+        with open(offsets_path, "r+b" if start_row else "wb") as f:
+            f.truncate((start_row + 1) * 8 if start_row else 0)
+            f.seek(0, os.SEEK_END)
+            f.write(np.asarray(offsets, dtype="<u8").tobytes())
+        return start_row + len(offsets) - (0 if start_row else 1)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> Document:
+        record = json.loads(self._records[int(self.offsets[row]):int(self.offsets[row + 1])])
+        return Document(id=record["id"], page_content=record["page_content"], metadata=record["metadata"])
+
+    def close(self):
+        if isinstance(self._records, mmap.mmap):
+            self._records.close()
+        self.offsets = np.zeros(1, dtype="<u8")
+        self._records = b""
+
+
+def _write_json(path: str, value: Dict[str, Any]):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(value, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def _remove_unreferenced(directory: str, manifests: Sequence[Optional[Dict[str, Any]]]):
+    # Files of the previous generation are kept for readers that have not refreshed yet; processes
+    # that still map an older file keep reading it after it is deleted
+    keep = {manifest[key] for manifest in manifests if manifest for key in ("index", "records", "offsets", "deleted")}
+    for name in os.listdir(directory):
+        if name.startswith(("index.", "docstore.", "deleted.")) and name.count(".") == 2 and name not in keep:
+            os.remove(os.path.join(directory, name))
+
+
+class IndexWriter:
+    """Adds and removes documents of an index directory; `commit()` saves them as a new generation.
+
+    Args:
+      directory: The index directory; created by the first commit.
+      index_type: One of INDEX_TYPES. Defaults to the type of the index on disk, or "flat".
+        "pq", "ivf" and "ivfpq" are trained on the first batch passed to `add`.
+      metric: "l2" or "inner_product", for a new index.
+      rebuild: Start from an empty index instead of the one on disk.
+      nlist: IVF clusters; by default about 4 * sqrt(size of the first batch).
+      hnsw_m: Neighbours per HNSW node.
+      ef_construction: HNSW beam width while adding vectors.
+      pq_m: PQ sub-vectors per vector; by default one per 8 dimensions.
+      pq_bits: Bits per PQ sub-vector code; training needs 2 ** pq_bits vectors.
+      nprobe, ef_search: Query defaults saved with the index, overridable per search.
+
+    Opening an existing index reads it into memory and every live docstore record once, to map ids
+    and sources to rows. Only one writer should work on a directory at a time.
+    """
+
+    def __init__(self, directory: str, index_type: Optional[str] = None, metric: str = "l2",
+                 rebuild: bool = False, nlist: Optional[int] = None, hnsw_m: int = 32, ef_construction: int = 40,
+                 pq_m: Optional[int] = None, pq_bits: int = 8, nprobe: Optional[int] = None,
+                 ef_search: Optional[int] = None):
+        self.directory = directory
+        self.manifest = None if rebuild else read_manifest(directory)
+        if self.manifest is not None:
+            existing = self.manifest["index_type"]
+            if index_type is not None and index_type != existing:
+                raise ValueError(f"{directory} holds a {existing} index; rebuild it to change it to {index_type}")
+            index_type, metric = existing, self.manifest["metric"]
+        self.index_type = index_type or "flat"
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type {self.index_type!r}; expected one of {', '.join(INDEX_TYPES)}")
+        self.metric = metric
+        self.nlist, self.hnsw_m, self.ef_construction = nlist, hnsw_m, ef_construction
+        self.pq_m, self.pq_bits = pq_m, pq_bits
+        search = self.manifest["search"] if self.manifest is not None else {}
+        self.nprobe = nprobe or search.get("nprobe", DEFAULT_NPROBE)
+        self.ef_search = ef_search or search.get("ef_search", DEFAULT_EF_SEARCH)
+
+        self.index = None
+        self.rows = 0
+        self.deleted: Set[int] = set()
+        # True once the index could not remove vectors itself and searches have to skip deleted rows
+        self.filter_deleted = False
+        self._live: Dict[int, Tuple[str, Optional[str]]] = {}
+        self._rows_by_id: Dict[str, int] = {}
+        self._pending: List[Tuple[Document, str]] = []
+        if self.manifest is not None:
+            self._load()
+
+    def _load(self):
+        manifest = self.manifest
+        self.index = faiss.read_index(os.path.join(self.directory, manifest["index"]))
+        self.rows = manifest["rows"]
+        if manifest["deleted"]:
+            self.deleted = set(np.fromfile(os.path.join(self.directory, manifest["deleted"]), dtype="<i8").tolist())
+        self.filter_deleted = manifest["filter_deleted"]
+        docstore = OffsetDocstore(os.path.join(self.directory, manifest["records"]),
+                                  os.path.join(self.directory, manifest["offsets"]))
+        try:
+            for row in range(self.rows):
+                if row not in self.deleted:
+                    document = docstore[row]
+                    self._live[row] = (document.id, document.metadata.get("source"))
+                    self._rows_by_id[document.id] = row
+        finally:
+            docstore.close()
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def _factory(self, count: int, dimension: int) -> Tuple[str, int]:
+        """FAISS factory string of a new index and the vectors needed to train it."""
+        nlist = self.nlist or default_nlist(count)
+        pq = f"PQ{self.pq_m or default_pq_m(dimension)}x{self.pq_bits}"
+        return {
+            "flat": ("IDMap2,Flat", 0),
+            "hnsw": (f"IDMap2,HNSW{self.hnsw_m}", 0),
+            "pq": (f"IDMap2,{pq}", 2 ** self.pq_bits),
+            "ivf": (f"IVF{nlist},Flat", nlist),
+            "ivfpq": (f"IVF{nlist},{pq}", max(nlist, 2 ** self.pq_bits)),
+        }[self.index_type]
+
+    def _create(self, matrix: np.ndarray):
+        factory, needed = self._factory(*matrix.shape)
+        if len(matrix) < needed:
+            raise ValueError(f"A {self.index_type} index is trained on its first batch, which needs at least "
+                             f"{needed} vectors; got {len(matrix)}")
+        index = faiss.index_factory(matrix.shape[1], factory, METRICS[self.metric])
+        if self.index_type == "hnsw":
+            faiss.downcast_index(index.index).hnsw.efConstruction = self.ef_construction
+        if not index.is_trained:
+            index.train(matrix)
+        return index
+
+    def add(self, documents: Sequence[Document], vectors: Sequence[Sequence[float]], ids: Sequence[str]):
+        """Appends documents with their vectors; documents whose id is already indexed are replaced."""
+        matrix = np.asarray(vectors, dtype="float32")
+        if len(matrix) != len(documents) or len(documents) != len(ids):
+            raise ValueError(f"{len(matrix)} vectors, {len(documents)} documents and {len(ids)} ids do not match")
+        if not len(matrix):
+            return
+        self.remove(ids)
+        if self.index is None:
+            self.index = self._create(matrix)
+        rows = np.arange(self.rows, self.rows + len(matrix), dtype="int64")
+        self.index.add_with_ids(matrix, rows)
+        for row, document, doc_id in zip(rows.tolist(), documents, ids):
+            self._live[row] = (doc_id, document.metadata.get("source"))
+            self._rows_by_id[doc_id] = row
+            self._pending.append((document, doc_id))
+        self.rows += len(matrix)
+
+    def remove(self, ids: Iterable[str]) -> int:
+        """Removes documents by id and returns how many were indexed."""
+        return self._remove_rows([self._rows_by_id[doc_id] for doc_id in ids if doc_id in self._rows_by_id])
+
+    def remove_sources(self, sources: Iterable[str]) -> int:
+        """Removes every document whose metadata "source" is one of `sources`, e.g. re-crawled pages."""
+        sources = set(sources)
+        return self._remove_rows([row for row, (_, source) in self._live.items() if source in sources])
+
+    def _remove_rows(self, rows: List[int]) -> int:
+        if not rows:
+            return 0
+        for row in rows:
+            doc_id, _ = self._live.pop(row)
+            del self._rows_by_id[doc_id]
+        self.deleted.update(rows)
+        if not self.filter_deleted:
+            try:
+                self.index.remove_ids(np.asarray(rows, dtype="int64"))
+            except RuntimeError:
+                # HNSW graphs cannot drop nodes; deleted rows stay in the graph until a rebuild and
+                # searches skip them
+                self.filter_deleted = True
+        return len(rows)
+
+    def commit(self) -> Dict[str, Any]:
+        """Writes the index and the new docstore rows as the next generation and returns its manifest."""
+        if self.index is None:
+            raise ValueError("Nothing to commit: no vectors have been added")
+        os.makedirs(self.directory, exist_ok=True)
+        previous = read_manifest(self.directory)
+        generation = previous["generation"] + 1 if previous else 1
+        if self.manifest is None:
+            # A new or rebuilt index starts a new docstore; later commits append to it
+            files = {"records": f"docstore.{generation}.jsonl", "offsets": f"docstore.{generation}.offsets"}
+            start_row = 0
+        else:
+            files = {"records": self.manifest["records"], "offsets": self.manifest["offsets"]}
+            start_row = self.manifest["rows"]
+        OffsetDocstore.write(os.path.join(self.directory, files["records"]),
+                             os.path.join(self.directory, files["offsets"]),
+                             [document for document, _ in self._pending], [doc_id for _, doc_id in self._pending],
+                             start_row=start_row)
+        files["index"] = f"index.{generation}.faiss"
+        faiss.write_index(self.index, os.path.join(self.directory, files["index"]))
+        files["deleted"] = f"deleted.{generation}.rows" if self.deleted else None
+        if self.deleted:
+            np.asarray(sorted(self.deleted), dtype="<i8").tofile(os.path.join(self.directory, files["deleted"]))
+        manifest = {
+            "format": FORMAT_VERSION, "generation": generation, "index_type": self.index_type,
+            "metric": self.metric, "dimension": self.index.d, "count": len(self._live), "rows": self.rows,
+            "filter_deleted": self.filter_deleted,
+            "search": {"nprobe": self.nprobe, "ef_search": self.ef_search}, **files,
+            # Lets callers check which pages are indexed without opening the docstore
+            "sources": sorted({source for _, source in self._live.values() if source is not None}),
+        }
+        _write_json(os.path.join(self.directory, MANIFEST), manifest)
+        _remove_unreferenced(self.directory, [manifest, previous])
+        self.manifest = manifest
+        self._pending = []
+        return manifest
+
+
+def build_index(directory: str, documents: Sequence[Document], vectors: Sequence[Sequence[float]],
+                ids: Sequence[str], metric: str = "l2", index_type: str = "flat", **options):
+    """Builds an index of `vectors` and saves it with `documents`, replacing what was there.
+
+    `options` are passed to IndexWriter, e.g. nlist, pq_m or ef_search.
+    """
+    writer = IndexWriter(directory, index_type=index_type, metric=metric, rebuild=True, **options)
+    writer.add(documents, vectors, ids)
+    writer.commit()
+
+
+def migrate_langchain_index(directory: str, metric: str = "l2"):
+    """Converts an index saved with LangChain's FAISS.save_local into this format, in place.
+
+    This unpickles index.pkl, so only run it on a directory you wrote yourself.
+    """
+    with open(os.path.join(directory, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    index = faiss.read_index(os.path.join(directory, "index.faiss"))
+    ids = [index_to_docstore_id[row] for row in range(index.ntotal)]
+    build_index(directory, [docstore.search(doc_id) for doc_id in ids], index.reconstruct_n(0, index.ntotal), ids,
+                metric=metric)
+    os.remove(os.path.join(directory, "index.pkl"))
+    os.remove(os.path.join(directory, "index.faiss"))
+
+
+@dataclass
+class _Generation:
+    manifest: Dict[str, Any]
+    index: Any
+    docstore: OffsetDocstore
+    # Excludes deleted rows the index could not remove itself
+    selector: Any = None
+    _selector_rows: Any = field(default=None, repr=False)
+
+    def search_parameters(self, nprobe: Optional[int], ef_search: Optional[int]):
+        index_type, search = self.manifest["index_type"], self.manifest["search"]
+        options = {"sel": self.selector} if self.selector is not None else {}
+        if index_type in ("ivf", "ivfpq"):
+            return faiss.SearchParametersIVF(nprobe=nprobe or search["nprobe"], **options)
+        if index_type == "hnsw":
+            return faiss.SearchParametersHNSW(efSearch=ef_search or search["ef_search"], **options)
+        return faiss.SearchParameters(**options) if options else None
+
+
+class FaissService:
+    """Similarity search over an index directory written by `IndexWriter` or `build_index`.
+
+    Open one per process and share it: searches are thread safe, and `refresh()` picks up a newer
+    generation after the index has been changed.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._current: Optional[_Generation] = None
+        if not self.refresh():
+            raise FileNotFoundError(f"No FAISS index in {directory}")
+
+    @property
+    def generation(self) -> int:
+        return self._current.manifest["generation"] if self._current else 0
+
+    @property
+    def index(self):
+        return self._current.index
+
+    def refresh(self) -> bool:
+        """Switches to the newest generation on disk; returns False when the directory has no index."""
+        manifest = read_manifest(self.directory)
+        if manifest is None:
+            return False
+        if manifest["format"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format {manifest['format']} in {self.directory}")
+        with self._lock:
+            if manifest["generation"] != self.generation:
+                current = _Generation(manifest, _read_index(os.path.join(self.directory, manifest["index"])),
+                                      OffsetDocstore(os.path.join(self.directory, manifest["records"]),
+                                                     os.path.join(self.directory, manifest["offsets"])))
+                if manifest["filter_deleted"]:
+                    rows = np.fromfile(os.path.join(self.directory, manifest["deleted"]), dtype="<i8")
+                    current._selector_rows = faiss.IDSelectorBatch(rows)
+                    current.selector = faiss.IDSelectorNot(current._selector_rows)
+                # The old files stay mapped until searches holding them return, so they are not closed here
+                self._current = current
+        return True
+
+    def __len__(self) -> int:
+        return self._current.manifest["count"]
+
+    def search_by_vectors(self, vectors: Sequence[Sequence[float]], k: int = 4, nprobe: Optional[int] = None,
+                          ef_search: Optional[int] = None) -> List[List[Tuple[Document, float]]]:
+        """The k nearest documents of each query vector with their distance (l2) or score (inner_product).
+
+        `nprobe` (IVF types) and `ef_search` (HNSW) trade recall for speed; they default to the values
+        saved with the index.
+        """
+        current = self._current
+        matrix = np.asarray(vectors, dtype="float32").reshape(-1, current.index.d)
+        distances, rows = current.index.search(matrix, k, params=current.search_parameters(nprobe, ef_search))
+        return [
+            [(current.docstore[row], float(distance)) for row, distance in zip(query_rows, query_distances) if row >= 0]
+            for query_rows, query_distances in zip(rows, distances)
+        ]
+
+    def similarity_search_with_vectors_by_vector(self, vector: Sequence[float], k: int = 4, nprobe: Optional[int] = None,
+                                                 ef_search: Optional[int] = None) -> Tuple[List[Document], np.ndarray]:
+        """The k nearest documents and a matrix of their stored vectors, one row per document.
+
+        The vectors are read back from the index, so callers such as MMR never embed the documents again.
+        PQ types store compressed codes and return their approximate reconstruction.
+        """
+        current = self._current
+        matrix = np.asarray(vector, dtype="float32").reshape(1, current.index.d)
+        _, rows, stored = current.index.search_and_reconstruct(matrix, k,
+                                                               params=current.search_parameters(nprobe, ef_search))
+        found = rows[0] >= 0
+        return [current.docstore[row] for row in rows[0][found]], stored[0][found]
+
+    def similarity_search_with_score_by_vector(self, vector: Sequence[float], k: int = 4,
+                                               **search_options) -> List[Tuple[Document, float]]:
+        return self.search_by_vectors([vector], k, **search_options)[0]
+
+    def similarity_search_by_vector(self, vector: Sequence[float], k: int = 4, **search_options) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score_by_vector(vector, k, **search_options)]
+
+    def close(self):
+        with self._lock:
+            if self._current is not None:
+                self._current.docstore.close()
+            self._current = None
@@ -0,0 +1,184 @@
+# feedback_log.py - Append-only log of user votes on retrieved sources, written off the request path.
+# `record` only puts the event on a queue; a background thread writes queued events to SQLite in
+# batches, one transaction per batch, so concurrent users never wait on file I/O. The log is
+# aggregated per source into small score boosts that retrieval adds to the similarity scores.
+
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+UP = 1
+DOWN = -1
+
+
+@dataclass
+class FeedbackEvent:
+    question: str
+    source: str
+    # Retrieval score of the source when it was shown
+    score: Optional[float]
+    # UP or DOWN
+    vote: int
+    created: float = field(default_factory=time.time)
+
+
+@dataclass
+class SourceFeedback:
+    source: str
+    up: int
+    down: int
+    mean_score: Optional[float]
+    last_vote: float
+
+    @property
+    def votes(self) -> int:
+        return self.up + self.down
+
+
+class FeedbackLog:
+    """SQLite feedback store with a background, batching writer.
+
+    Args:
+      path: SQLite database file; created if missing. Several processes may share it.
+      batch_size: Most events written per transaction.
+      flush_interval: Seconds an event may wait in the queue for a batch to fill.
+      max_queue: Events held in memory; further events are dropped rather than blocking the caller.
+    """
+
+    def __init__(self, path: str, batch_size: int = 200, flush_interval: float = 1.0, max_queue: int = 10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[FeedbackEvent]]" = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS feedback_events ("
+                "id INTEGER PRIMARY KEY, created REAL NOT NULL, question TEXT NOT NULL, source TEXT NOT NULL, "
+                "score REAL, vote INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS feedback_events_source ON feedback_events (source, created)")
+        self._thread = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+        self._thread.start()
+        # Events still queued when the interpreter exits are written, not lost
+        atexit.register(self.close)
+
+    def record(self, question: str, source: str, score: Optional[float], vote: int) -> bool:
+        """Queues a vote without waiting for the write; returns False if it had to be dropped."""
+        if vote not in (UP, DOWN):
+            raise ValueError(f"vote must be {UP} or {DOWN}, got {vote!r}")
+        if self._closed:
+            raise RuntimeError("FeedbackLog is closed")
+        try:
+            self._queue.put_nowait(FeedbackEvent(question, source, score, vote))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            batch, stopping = ([], True) if first is None else ([first], False)
+            deadline = time.monotonic() + self.flush_interval
+            while not stopping and len(batch) < self.batch_size:
+                try:
+                    event = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if event is None:
+                    stopping = True
+                else:
+                    batch.append(event)
+            try:
+                if batch:
+                    self._write(batch)
+            finally:
+                for _ in range(len(batch) + stopping):
+                    self._queue.task_done()
+
+    def _write(self, batch: List[FeedbackEvent]):
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT INTO feedback_events (created, question, source, score, vote) VALUES (?, ?, ?, ?, ?)",
+                    [(event.created, event.question, event.source, event.score, event.vote) for event in batch]
+                )
+        except sqlite3.Error:
+            # Feedback is best effort; a locked or broken database must not stop the writer
+            with self._lock:
+                self.dropped += len(batch)
+            return
+        with self._lock:
+            self.written += len(batch)
+            self.batches += 1
+
+    def flush(self):
+        """Blocks until every event queued so far has been written."""
+        self._queue.join()
+
+    def close(self):
+        """Writes the queued events and stops the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        atexit.unregister(self.close)
+
+    def source_feedback(self, since: Optional[float] = None) -> Dict[str, SourceFeedback]:
+        """Votes per source, optionally only those cast after the `since` timestamp."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT source, SUM(vote > 0), SUM(vote < 0), AVG(score), MAX(created) FROM feedback_events "
+                "WHERE created >= ? GROUP BY source", (since or 0.0,)
+            ).fetchall()
+        return {row[0]: SourceFeedback(*row) for row in rows}
+
+    def source_boosts(self, weight: float = 0.05, prior_votes: int = 5, since: Optional[float] = None) -> Dict[str, float]:
+        """Score adjustment per source in (-weight, weight), from its share of up and down votes.
+
+        The net vote is divided by votes + `prior_votes`, so a source needs several consistent votes
+        before its boost approaches `weight`.
+        """
+        return {
+            source: weight * (feedback.up - feedback.down) / (feedback.votes + prior_votes)
+            for source, feedback in self.source_feedback(since).items()
+        }
+
+    def stats(self) -> Dict[str, int]:
+        return {"queued": self._queue.qsize(), "written": self.written, "dropped": self.dropped,
+                "batches": self.batches}
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+def apply_source_boosts(results: Sequence[T], boosts: Dict[str, float], source: Callable[[T], str],
+                        score: Callable[[T], float]) -> List[Tuple[T, float]]:
+    """Results re-ranked by similarity score plus their source's boost, with the boosted scores.
+
+    Scores must grow with relevance, as cosine similarity does.
+    """
+    boosted = [(result, score(result) + boosts.get(source(result), 0.0)) for result in results]
+    return sorted(boosted, key=lambda item: item[1], reverse=True)
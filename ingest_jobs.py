@@ -0,0 +1,147 @@
+# ingest_jobs.py - Background ingestion jobs for qdrant_api.
+# Submitting a job returns immediately; a bounded pool of asyncio workers runs the jobs and keeps
+# their progress (chunks embedded and upserted, throughput, ETA) available for polling.
+
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from ingest_pipeline import IngestionStats
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+@dataclass
+class IngestJob:
+    id: str
+    request: Dict[str, Any]
+    status: str = QUEUED
+    stats: IngestionStats = field(default_factory=IngestionStats)
+    # Number of chunks the job will produce; an estimate while streaming ingestion is still reading
+    chunks_total: Optional[int] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    cancel_requested: bool = False
+
+    def as_dict(self) -> Dict[str, Any]:
+        now = self.finished_at or time.time()
+        elapsed = now - self.started_at if self.started_at else 0.0
+        throughput = self.stats.chunks / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.status == RUNNING and self.chunks_total and throughput > 0:
+            eta = max(self.chunks_total - self.stats.chunks, 0) / throughput
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "request": self.request,
+            "chunks_total": self.chunks_total,
+            "chunks_embedded": self.stats.chunks_embedded,
+            "chunks_upserted": self.stats.chunks,
+            "batch_retries": self.stats.retries,
+            "elapsed_seconds": round(elapsed, 3),
+            "chunks_per_sec": round(throughput, 2),
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """Queues ingestion jobs and runs them on a bounded pool of asyncio workers.
+
+    Args:
+      runner: Coroutine function doing the work for one job; it reports progress through `job.stats`
+        and `job.chunks_total` and returns the job result.
+      max_workers: Number of jobs processed at the same time.
+      max_finished: Number of finished jobs kept for status queries.
+    """
+
+    def __init__(self, runner: Callable[[IngestJob], Awaitable[Dict[str, Any]]],
+                 max_workers: int = 2, max_finished: int = 100):
+        self.runner = runner
+        self.max_workers = max_workers
+        self.max_finished = max_finished
+        self.jobs: Dict[str, IngestJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+
+    async def start(self):
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_workers)]
+
+    async def stop(self):
+        for task in list(self._running.values()) + self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    async def submit(self, request: Dict[str, Any]) -> IngestJob:
+        await self.start()
+        job = IngestJob(id=uuid.uuid4().hex, request=request)
+        self.jobs[job.id] = job
+        self._prune()
+        await self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[IngestJob]:
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return job
+        job.cancel_requested = True
+        if job.status == QUEUED:
+            self._finish(job, CANCELLED)
+        elif job.id in self._running:
+            self._running[job.id].cancel()
+        return job
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status != QUEUED:
+                    continue
+                job.status = RUNNING
+                job.started_at = time.time()
+                task = asyncio.create_task(self.runner(job))
+                self._running[job.id] = task
+                try:
+                    job.result = await task
+                    self._finish(job, COMPLETED)
+                except asyncio.CancelledError:
+                    if not job.cancel_requested:
+                        raise
+                    self._finish(job, CANCELLED)
+                except Exception as e:
+                    job.error = str(e)
+                    self._finish(job, FAILED)
+                finally:
+                    self._running.pop(job.id, None)
+            finally:
+                self._queue.task_done()
+
+    def _finish(self, job: IngestJob, status: str):
+        job.status = status
+        job.finished_at = time.time()
+
+    def _prune(self):
+        finished = [job for job in self.jobs.values() if job.status in FINISHED_STATES]
+        for job in sorted(finished, key=lambda job: job.finished_at)[:-self.max_finished or None]:
+            del self.jobs[job.id]
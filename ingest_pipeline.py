@@ -0,0 +1,208 @@
+# ingest_pipeline.py - Batched, concurrent embedding pipeline used to ingest chunks into Qdrant.
+# Chunks are grouped into batches that are embedded with `aembed_documents`, several batches are
+# kept in flight at once, and each finished batch is upserted while the next ones are still embedding.
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+from qdrant_client import models
+
+from sparse_encoder import SPARSE_VECTOR_NAME
+from stage_metrics import stage
+
+
+@dataclass
+class IngestionStats:
+    chunks: int = 0
+    chunks_embedded: int = 0
+    batches: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+
+    @property
+    def chunks_per_sec(self) -> float:
+        return self.chunks / self.seconds if self.seconds > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "chunks": self.chunks,
+            "chunks_embedded": self.chunks_embedded,
+            "batches": self.batches,
+            "retries": self.retries,
+            "seconds": round(self.seconds, 3),
+            "chunks_per_sec": round(self.chunks_per_sec, 2),
+        }
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Yields lists of at most `size` items from `items`."""
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+async def abatched(items: Union[Iterable[Any], AsyncIterable[Any]], size: int) -> AsyncIterator[List[Any]]:
+    """`batched` for sync or async iterables."""
+    if not hasattr(items, "__aiter__"):
+        for batch in batched(items, size):
+            yield batch
+        return
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class IngestionPipeline:
+    """Embeds and upserts documents into a Qdrant collection in concurrent batches.
+
+    Args:
+      embeddings: Any LangChain embeddings object exposing `aembed_documents`.
+      vdb_client: The `AsyncQdrantClient` points are upserted with.
+      collection_name: Target collection.
+      batch_size: Number of chunks sent to the embedder per call.
+      max_concurrency: Maximum number of batches being embedded at the same time.
+      max_retries: How often a failed embedding or upsert call is retried before the run fails.
+      retry_backoff: Seconds to wait before the first retry; doubled after every further attempt.
+      sparse_encoder: When set (a `BM25Encoder`), points also get a sparse keyword vector for hybrid search.
+      id_field: Document key holding the point id.
+    """
+
+    def __init__(self, embeddings, vdb_client, collection_name: str,
+                 batch_size: int = 64, max_concurrency: int = 4,
+                 max_retries: int = 2, retry_backoff: float = 0.5, sparse_encoder=None, id_field: str = "id"):
+        if batch_size < 1 or max_concurrency < 1:
+            raise ValueError("batch_size and max_concurrency must be at least 1")
+        self.embeddings = embeddings
+        self.vdb_client = vdb_client
+        self.collection_name = collection_name
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.sparse_encoder = sparse_encoder
+        self.id_field = id_field
+
+    async def run(self, docs: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
+                  on_batch: Optional[Callable[[IngestionStats], None]] = None,
+                  stats: Optional[IngestionStats] = None) -> IngestionStats:
+        """Ingests `docs`, dicts holding at least an `id` and a `text` key used as the point payload.
+
+        `docs` may be a sync or async iterable and is consumed lazily, so at most `batch_size * max_concurrency` chunks are held at once.
+        Batches are upserted in input order and `on_batch` is called after each one. Pass `stats`
+        to watch progress from another task while the run is in flight.
+        """
+        stats = stats if stats is not None else IngestionStats()
+        start = time.perf_counter()
+        pending = deque()
+        try:
+            async for batch in abatched(docs, self.batch_size):
+                texts = [doc["text"] for doc in batch]
+                pending.append((batch, asyncio.ensure_future(self._embed(texts, stats))))
+                # Upsert the oldest batch while the remaining ones keep embedding
+                if len(pending) >= self.max_concurrency:
+                    await self._upsert(*pending.popleft(), stats, on_batch)
+            while pending:
+                await self._upsert(*pending.popleft(), stats, on_batch)
+        finally:
+            for _, task in pending:
+                task.cancel()
+        stats.seconds = time.perf_counter() - start
+        return stats
+
+    async def _with_retries(self, call, stats: IngestionStats):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await call()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                stats.retries += 1
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+
+    async def _embed(self, texts, stats: IngestionStats):
+        with stage("embed_documents"):
+            vectors = await self._with_retries(lambda: self.embeddings.aembed_documents(texts), stats)
+        stats.chunks_embedded += len(texts)
+        return vectors
+
+    async def _upsert(self, batch, task, stats: IngestionStats, on_batch):
+        vectors = await task
+        if self.sparse_encoder is not None:
+            sparse_vectors = await asyncio.to_thread(
+                self.sparse_encoder.encode_documents, self.collection_name, [doc["text"] for doc in batch],
+                [doc[self.id_field] for doc in batch]
+            )
+            vectors = [
+                {"": vector, SPARSE_VECTOR_NAME: sparse_vector}
+                for vector, sparse_vector in zip(vectors, sparse_vectors)
+            ]
+        points = [
+            models.PointStruct(id=doc[self.id_field], vector=vector, payload=doc)
+            for doc, vector in zip(batch, vectors)
+        ]
+        with stage("upsert"):
+            await self._with_retries(
+                lambda: self.vdb_client.upsert(collection_name=self.collection_name, points=points), stats
+            )
+        stats.chunks += len(points)
+        stats.batches += 1
+        if on_batch is not None:
+            on_batch(stats)
+
+
+class IngestCheckpoint:
+    """Remembers how many leading chunks of a file were upserted so an interrupted ingestion can resume.
+
+    The checkpoint is tied to the file's size and modification time and is ignored once the file changes.
+    """
+
+    def __init__(self, checkpoint_dir: str, file_name: str, collection_name: str):
+        self.file_name = file_name
+        self.collection_name = collection_name
+        key = hashlib.sha1(f"{os.path.abspath(file_name)}\x00{collection_name}".encode("utf-8")).hexdigest()
+        self.path = os.path.join(checkpoint_dir, f"{key}.json")
+
+    def _fingerprint(self) -> Dict[str, Any]:
+        stat = os.stat(self.file_name)
+        return {
+            "file_name": os.path.abspath(self.file_name),
+            "collection_name": self.collection_name,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+
+    def load(self) -> int:
+        """Returns the number of chunks already upserted, or 0 if there is no usable checkpoint."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if state.get("fingerprint") != self._fingerprint():
+            return 0
+        return int(state.get("chunks_upserted", 0))
+
+    def save(self, chunks_upserted: int):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self._fingerprint(), "chunks_upserted": chunks_upserted}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
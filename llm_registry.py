@@ -0,0 +1,100 @@
+# llm_registry.py - Process-wide registry of chat model clients.
+# One client is created per (model, temperature) on first use and every client shares the same
+# keep-alive HTTP connection pools, so requests stop paying for new connections and TLS handshakes.
+
+import asyncio
+import threading
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import httpx
+from langchain_core.language_models import BaseChatModel
+
+
+def groq_factory(model: str, temperature: float, http_client: httpx.Client,
+                 http_async_client: httpx.AsyncClient) -> BaseChatModel:
+    from langchain_groq import ChatGroq
+
+    return ChatGroq(
+        model=model,
+        temperature=temperature,
+        http_client=http_client,
+        http_async_client=http_async_client
+    )
+
+
+class LLMRegistry:
+    """Creates chat model clients lazily and hands out the same instance for repeated lookups.
+
+    Args:
+      factory: Callable building a client from `model`, `temperature` and the shared HTTP clients.
+      max_connections: Size of the shared HTTP connection pool.
+      max_keepalive_connections: Idle connections kept open for reuse.
+    """
+
+    def __init__(self, factory: Callable[..., BaseChatModel] = groq_factory,
+                 max_connections: int = 100, max_keepalive_connections: int = 20):
+        self.factory = factory
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections
+        )
+        self._http_client: Optional[httpx.Client] = None
+        self._http_async_client: Optional[httpx.AsyncClient] = None
+        self._clients: Dict[Tuple[str, float], BaseChatModel] = {}
+        self._overrides: Dict[str, BaseChatModel] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model: str, temperature: float = 0.5) -> BaseChatModel:
+        if model in self._overrides:
+            return self._overrides[model]
+        key = (model, float(temperature))
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self.factory(
+                        model=model,
+                        temperature=temperature,
+                        http_client=self._get_http_client(),
+                        http_async_client=self._get_http_async_client()
+                    )
+                    self._clients[key] = client
+        return client
+
+    def register(self, model: str, llm: BaseChatModel):
+        """Serves `llm` for `model` at every temperature, e.g. to plug an offline stub into tests."""
+        self._overrides[model] = llm
+
+    def unregister(self, model: str):
+        self._overrides.pop(model, None)
+
+    async def warm_up(self, models: Iterable[str], temperature: float = 0.5, ping: bool = False):
+        """Creates clients for `models` ahead of traffic; with `ping`, also opens a pooled connection
+        by sending each model a one-word prompt."""
+        clients = [self.get(model, temperature) for model in models]
+        if ping:
+            await asyncio.gather(*(client.ainvoke("ping") for client in clients))
+
+    def cached_models(self):
+        return sorted(self._clients)
+
+    async def aclose(self):
+        with self._lock:
+            self._clients.clear()
+            http_client, self._http_client = self._http_client, None
+            http_async_client, self._http_async_client = self._http_async_client, None
+        if http_client is not None:
+            http_client.close()
+        if http_async_client is not None:
+            await http_async_client.aclose()
+
+    def _get_http_client(self) -> httpx.Client:
+        if self._http_client is None:
+            self._http_client = httpx.Client(limits=self._limits)
+        return self._http_client
+
+    def _get_http_async_client(self) -> httpx.AsyncClient:
+        if self._http_async_client is None:
+            self._http_async_client = httpx.AsyncClient(limits=self._limits)
+        return self._http_async_client
@@ -20,7 +20,7 @@ In this walkthrough we will see how to use Pinecone for semantic search. To begi
 #!pip install -qU langchain langchain_community langchain_openai qdrant_client
 
 from langchain_community.document_loaders import TextLoader
-from langchain_openai import OpenAIEmbeddings
+from embedding_providers import create_embeddings, embedding_dimension
 from langchain.text_splitter import CharacterTextSplitter
 
 # Load the document, split it into chunks, embed each chunk and load it into the vector store.
@@ -41,27 +41,30 @@ load_dotenv()
 os.environ['OPENAI_API_KEY']=os.getenv('OPENAI_API_KEY')
 os.environ['GROQ_API_KEY']=os.getenv('GROQ_API_KEY')
 
-embeddings = OpenAIEmbeddings(model='text-embedding-ada-002')
+# Chunk embeddings are cached on disk, so re-running the walkthrough does not re-embed unchanged chunks
+from embedding_store import CachedEmbeddings, EmbeddingStore
+# Set EMBEDDING_PROVIDER=local to embed on this machine instead of calling OpenAI
+embeddings = CachedEmbeddings(create_embeddings(), EmbeddingStore('embedding_store.sqlite'))
 
 len(chunks)
 
 chunks[0].page_content
 
-values=embeddings.embed_query(chunks[0].page_content)
+values=embeddings.embed_documents([chunks[0].page_content])[0]
 len(values)
 
 for chunck in chunks[0:1]:
   print(chunck.page_content)
-  values=embeddings.embed_query(chunck.page_content)
+  values=embeddings.embed_documents([chunck.page_content])[0]
   print(values)
 
 from importlib import metadata
 docs=[]
 docs_json={}
 id=0
-for chunk in chunks:
+vectors=embeddings.embed_documents([chunk.page_content for chunk in chunks])
+for chunk,values in zip(chunks,vectors):
   id+=1
-  values=embeddings.embed_query(chunk.page_content)
   docs_json={
       'id':str(id),
       'vector':values,
@@ -92,7 +95,7 @@ collection_name = 'semantic-search-obama-text-test01'
 vdb_client.create_collection(
     collection_name=collection_name,
     vectors_config=models.VectorParams(
-        size=1536,
+        size=embedding_dimension(embeddings),
         distance=models.Distance.COSINE
     ),
 )
@@ -0,0 +1,129 @@
+# parallel_splitting.py - Splits many documents at once on a pool of worker processes.
+# Each worker runs the very LangChain splitter it is given, so chunks are identical to calling
+# `split_documents` inline. Chunks stream back in input order with ids derived from their source
+# and position, so re-splitting the same corpus yields the same ids however the work was scheduled.
+
+import multiprocessing
+import os
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Sized, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import TextSplitter
+
+# Fixed namespace so chunk ids are the same across runs and machines
+CHUNK_ID_NAMESPACE = uuid.UUID("6f1c3b1e-5d0a-4e0b-9a57-3c2f1d8e4b21")
+
+
+def chunk_id(source: str, index: int) -> str:
+    """Stable id of the `index`-th chunk of `source`; a valid Qdrant and pgvector point id."""
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{source}\x00{index}"))
+
+
+@dataclass
+class Chunk:
+    id: str
+    source: str
+    # Position of the chunk within its document, from 0
+    index: int
+    document: Document
+
+    @property
+    def text(self) -> str:
+        return self.document.page_content
+
+
+def _split(splitter: TextSplitter, text: str, metadata: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    # Runs in a worker; plain tuples pickle faster than Documents on the way back
+    return [(doc.page_content, doc.metadata) for doc in splitter.create_documents([text], [metadata])]
+
+
+class ParallelSplitter:
+    """Fans documents out to worker processes running `splitter` and yields their chunks in order.
+
+    Args:
+      splitter: The LangChain splitter to run; it is pickled to each worker.
+      max_workers: Worker processes; defaults to SPLIT_WORKERS or one per core. With 1, documents
+        are split in this process.
+      max_pending: Documents in flight at once, which bounds memory on large corpora; defaults to
+        four per worker.
+      executor: An existing executor to submit to instead of starting a pool.
+      start_method: How workers start. "spawn" is safe in threaded servers but re-imports the main
+        module, so scripts without a `__main__` guard should use "fork".
+      inline_small_inputs: Split lists of fewer documents than `max_workers` in this process, since
+        starting workers costs more than splitting a handful of documents.
+
+    The pool starts on first use; call `close` or use the splitter as a context manager to stop it.
+    """
+
+    def __init__(self, splitter: TextSplitter, max_workers: Optional[int] = None,
+                 max_pending: Optional[int] = None, executor: Optional[Executor] = None,
+                 start_method: str = "spawn", inline_small_inputs: bool = False):
+        self.splitter = splitter
+        self.max_workers = max_workers or int(os.getenv("SPLIT_WORKERS", "0")) or os.cpu_count() or 1
+        self.max_pending = max_pending or 4 * self.max_workers
+        self._executor = executor
+        self._owns_executor = executor is None
+        self.start_method = start_method
+        self.inline_small_inputs = inline_small_inputs
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context(self.start_method))
+            return self._executor
+
+    def iter_chunks(self, documents: Iterable[Document]) -> Iterator[Chunk]:
+        """Chunks of every document, in document order and then chunk order."""
+        small = self.inline_small_inputs and isinstance(documents, Sized) and len(documents) < self.max_workers
+        if (self.max_workers == 1 or small) and self._owns_executor:
+            for position, document in enumerate(documents):
+                yield from self._chunks(position, document,
+                                        _split(self.splitter, document.page_content, document.metadata))
+            return
+
+        pending: Deque[Tuple[int, Document, Any]] = deque()
+        try:
+            for position, document in enumerate(documents):
+                future = self.executor.submit(_split, self.splitter, document.page_content, document.metadata)
+                pending.append((position, document, future))
+                if len(pending) >= self.max_pending:
+                    head, head_document, head_future = pending.popleft()
+                    yield from self._chunks(head, head_document, head_future.result())
+            while pending:
+                head, head_document, head_future = pending.popleft()
+                yield from self._chunks(head, head_document, head_future.result())
+        finally:
+            # An abandoned iteration should not leave queued documents for the workers
+            for _, _, future in pending:
+                future.cancel()
+
+    def _chunks(self, position: int, document: Document,
+                splits: List[Tuple[str, Dict[str, Any]]]) -> Iterator[Chunk]:
+        # Documents without a source are told apart by their position in the input
+        source = str(document.metadata.get("source") or f"#{position}")
+        for index, (text, metadata) in enumerate(splits):
+            yield Chunk(id=chunk_id(source, index), source=source, index=index,
+                        document=Document(page_content=text, metadata=metadata))
+
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        """Same result as `splitter.split_documents(documents)`."""
+        return [chunk.document for chunk in self.iter_chunks(documents)]
+
+    def close(self):
+        if self._executor is not None and self._owns_executor:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self) -> "ParallelSplitter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,185 +1,778 @@
 # qdrant_api.py - This is a FastAPI application that provides a REST API for interacting with Qdrant vector database.
 # and was created by Venkat using Vibe Coding technology.
 
+import asyncio
 import os
-from fastapi import FastAPI, HTTPException
+import threading
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from qdrant_client import models, QdrantClient
-from langchain_openai import OpenAIEmbeddings
+from qdrant_client import models, AsyncQdrantClient
 from langchain.text_splitter import CharacterTextSplitter
 from langchain_community.document_loaders import TextLoader
-from langchain_groq import ChatGroq
+from answer_cache import SemanticAnswerCache
+from bulk_ingest import BulkIngestion, IngestManifest, iter_sources, iterate_in_thread
+from context_packing import context_token_budget, pack_context
+from collection_profiles import (DEFAULT_KEYWORD_INDEXES, FilterValue, build_collection_config,
+                                 build_payload_filter, build_search_params)
+from embedding_providers import create_embeddings, embedding_dimension
+from embedding_store import CachedEmbeddings, EmbeddingStore, embedding_model_name
+from ingest_jobs import IngestJob, JobManager
+from ingest_pipeline import IngestionPipeline, IngestionStats, IngestCheckpoint
+from llm_registry import LLMRegistry
+from parallel_splitting import Chunk, ParallelSplitter, chunk_id
+from text_chunking import iter_file_chunks
+from query_cache import QueryEmbeddingCache
+from rerank import DEFAULT_RERANK_MODEL, Reranker
+from sparse_encoder import SPARSE_VECTOR_NAME, BM25Encoder
+from stage_metrics import ProfileLog, RequestTrace, StackSampler, current_trace, metrics, record, stage
 import json
-from typing import Optional
+from itertools import islice
+from typing import Dict, List, Literal, Optional
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI()
+# Chat model clients are created once per (model, temperature) and share one HTTP connection pool
+llm_registry = LLMRegistry()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # LLM_WARMUP_MODELS is a comma separated list of models to create clients for at startup
+    warmup_models = [m.strip() for m in os.getenv("LLM_WARMUP_MODELS", "").split(",") if m.strip()]
+    if warmup_models:
+        await llm_registry.warm_up(warmup_models, ping=os.getenv("LLM_WARMUP_PING") == "1")
+    # Load the cross-encoder up front so the first reranked request is not cut off by the latency cap
+    if os.getenv("RERANK_WARMUP") == "1":
+        await run_in_threadpool(reranker.warm_up)
+    await job_manager.start()
+    yield
+    await job_manager.stop()
+    await llm_registry.aclose()
+    split_pool.close()
+
+app = FastAPI(lifespan=lifespan)
+
+# Breakdowns and sampled stacks of requests sent with an `X-Profile: 1` header, served at /profiles/{id}
+profile_log = ProfileLog()
+
+@app.middleware("http")
+async def stage_timing(request: Request, call_next):
+    # Stage histograms are always recorded; the per-request breakdown and stack samples only on request
+    if request.headers.get("x-profile") != "1":
+        return await call_next(request)
+    trace = RequestTrace()
+    token = current_trace.set(trace)
+    sampler = StackSampler(threading.get_ident()).start()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        sampler.stop()
+        current_trace.reset(token)
+    # Streaming responses return here once headers are ready, so later stages are not included
+    total = time.perf_counter() - start
+    profile_id = profile_log.add({
+        "method": request.method,
+        "path": request.url.path,
+        "total_seconds": total,
+        "stages": dict(trace.stages),
+        "sampled_profile": sampler.report()
+    })
+    response.headers["Server-Timing"] = ", ".join(filter(None, [trace.server_timing(), f"total;dur={total * 1000:.2f}"]))
+    response.headers["X-Profile-Id"] = profile_id
+    return response
 
 # Pydantic models for request payloads
 class CollectionRequest(BaseModel):
     collection_name: str
+    # Storage settings; None keeps the Qdrant default
+    hnsw_m: Optional[int] = None
+    hnsw_ef_construct: Optional[int] = None
+    quantization: Optional[Literal["scalar", "product", "binary"]] = None
+    quantization_always_ram: Optional[bool] = True
+    product_compression: Optional[Literal["x4", "x8", "x16", "x32", "x64"]] = "x16"
+    on_disk_vectors: Optional[bool] = None
+    on_disk_payload: Optional[bool] = None
+    # Payload fields that get a keyword index for filtered search
+    payload_indexes: Optional[List[str]] = DEFAULT_KEYWORD_INDEXES
+    # Also store BM25 sparse vectors so searches can combine dense and keyword matches
+    hybrid: Optional[bool] = False
 
 class GenerateRequest(BaseModel):
     question: str
     collection_name: str
     limit: Optional[int] = 5
     model: Optional[str] = "llama3-70b-8192"
+    use_answer_cache: Optional[bool] = True
+    hybrid: Optional[bool] = False
+    # Context packing: MMR re-ranks fetch_k candidates (default 4 * limit) for diversity, and at most
+    # max_context_tokens of context (default per model) are sent to the LLM
+    mmr: Optional[bool] = True
+    mmr_lambda: Optional[float] = 0.7
+    fetch_k: Optional[int] = None
+    max_context_tokens: Optional[int] = None
+    # Order the fetch_k candidates with the cross-encoder instead of MMR
+    rerank: Optional[bool] = False
+
+    def candidates(self):
+        return self.fetch_k or (4 * self.limit if self.mmr or self.rerank else self.limit)
+
+    def token_budget(self):
+        return self.max_context_tokens or context_token_budget(self.model)
 
 class FileUploadRequest(BaseModel):
     file_name: str
     collection_name: str
+    batch_size: Optional[int] = 64
+    max_concurrency: Optional[int] = 4
+    # Stream the file through chunking, embedding and upserting instead of loading it whole
+    streaming: Optional[bool] = False
+    resume: Optional[bool] = True
 
-class SearchRequest(BaseModel):
+class BulkUploadRequest(BaseModel):
+    # A directory, a glob such as "docs/**/*.md", or a .zip/.tar(.gz) archive
+    path: str
+    collection_name: str
+    # Files inside a directory or archive are ingested when their relative path matches this
+    pattern: Optional[str] = "*.txt"
+    batch_size: Optional[int] = 64
+    max_concurrency: Optional[int] = 4
+    # Re-ingest files the manifest lists as unchanged
+    force: Optional[bool] = False
+
+# Payload fields returned by /search when the request does not project its own
+RESULT_FIELDS = ['text', 'source']
+
+class SearchOptions(BaseModel):
+    # Query-time knobs matching the /create_collection storage settings
+    hnsw_ef: Optional[int] = None
+    exact: Optional[bool] = False
+    rescore: Optional[bool] = None
+    oversampling: Optional[float] = None
+    # Payload fields to return; only these are read from Qdrant
+    with_payload: Optional[List[str]] = None
+    # Only return points whose payload matches, e.g. {"source": "sotu_address_obama.txt"}
+    source: Optional[str] = None
+    filters: Optional[Dict[str, FilterValue]] = None
+    # Fuse dense and BM25 keyword results with reciprocal rank fusion (collections created with hybrid=true)
+    hybrid: Optional[bool] = False
+    # Candidates fetched by each of the dense and keyword searches before fusion; defaults to 4 * limit
+    prefetch_limit: Optional[int] = None
+
+    def search_params(self):
+        return build_search_params(self.hnsw_ef, self.exact, self.rescore, self.oversampling)
+
+    def payload_fields(self):
+        return self.with_payload if self.with_payload is not None else RESULT_FIELDS
+
+    def query_filter(self):
+        filters = dict(self.filters or {})
+        if self.source is not None:
+            filters['source'] = self.source
+        return build_payload_filter(filters)
+
+    def hybrid_query(self, query_vector, sparse_vector, limit):
+        # Dense and keyword candidates are fetched and fused by Qdrant in one query
+        prefetch_limit = self.prefetch_limit or 4 * limit
+        query_filter = self.query_filter()
+        return {
+            "prefetch": [
+                models.Prefetch(query=query_vector, limit=prefetch_limit, params=self.search_params(),
+                                filter=query_filter),
+                models.Prefetch(query=sparse_vector, using=SPARSE_VECTOR_NAME, limit=prefetch_limit,
+                                filter=query_filter),
+            ],
+            "query": models.FusionQuery(fusion=models.Fusion.RRF),
+        }
+
+class SearchRequest(SearchOptions):
     query: str
     collection_name: str
     limit: Optional[int] = 5
+    # Fetch rerank_candidates (default 4 * limit) and keep the limit best by cross-encoder score
+    rerank: Optional[bool] = False
+    rerank_candidates: Optional[int] = None
 
-# Initialize Qdrant client
+class BatchSearchRequest(SearchOptions):
+    queries: List[str]
+    collection_name: str
+    limit: Optional[int] = 5
+
+# Initialize Qdrant client (async so requests never block the event loop)
 qdrant_url = "https://abae8011-6e7d-4331-9275-141914068878.us-east4-0.gcp.cloud.qdrant.io:6333"
 qdrant_api_key = os.getenv("QDRANT_API_KEY")
-vdb_client = QdrantClient(url=qdrant_url, api_key=qdrant_api_key)
+vdb_client = AsyncQdrantClient(url=qdrant_url, api_key=qdrant_api_key)
+
+# Where streaming ingestion keeps its resume checkpoints
+checkpoint_dir = os.getenv("INGEST_CHECKPOINT_DIR", ".ingest_checkpoints")
+
+# Embedding provider chosen by EMBEDDING_PROVIDER / EMBEDDING_MODEL; OpenAI by default
+embeddings = create_embeddings()
+
+# Splits the files of /upload_files in worker processes (SPLIT_WORKERS) with the same splitter settings as
+# before; the single document of /upload_file has nothing to fan out, so it is split inline
+split_pool = ParallelSplitter(CharacterTextSplitter(separator="\n", chunk_size=600, chunk_overlap=100),
+                              inline_small_inputs=True)
+
+# Fingerprints of the files /upload_files ingested into each collection, so re-runs skip unchanged files
+ingest_manifest = IngestManifest(os.getenv("INGEST_MANIFEST_PATH", "ingest_manifest.sqlite"))
+
+# Cache for query embeddings; set QUERY_CACHE_PATH to share vectors between workers on one host
+query_cache = QueryEmbeddingCache(
+    max_size=int(os.getenv("QUERY_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("QUERY_CACHE_TTL", "3600")),
+    disk_path=os.getenv("QUERY_CACHE_PATH")
+)
+
+# Content-addressed store of chunk embeddings consulted by every ingestion before the embedder
+embedding_store = EmbeddingStore(
+    os.getenv("EMBEDDING_STORE_PATH", "embedding_store.sqlite"),
+    max_entries=int(os.environ["EMBEDDING_STORE_MAX_ENTRIES"]) if os.getenv("EMBEDDING_STORE_MAX_ENTRIES") else None
+)
+
+# Per-collection term statistics for the BM25 sparse vectors of hybrid collections
+sparse_encoder = BM25Encoder(os.getenv("SPARSE_STATS_PATH", "sparse_stats.sqlite"))
+
+# Optional cross-encoder reranking; needs sentence-transformers and loads RERANK_MODEL on first use
+reranker = Reranker(
+    model_name=os.getenv("RERANK_MODEL", DEFAULT_RERANK_MODEL),
+    batch_size=int(os.getenv("RERANK_BATCH_SIZE", "16")),
+    max_latency=float(os.getenv("RERANK_MAX_LATENCY", "0.5"))
+)
+
+# Answers reused for paraphrased questions until the collection is written to again
+answer_cache = SemanticAnswerCache(
+    threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+    max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+)
 
-# Initialize OpenAI embeddings
-embeddings = OpenAIEmbeddings()
+async def embed_query(text: str):
+    # Key on the model name so switching embedding models never returns stale vectors
+    model_name = embedding_model_name(embeddings)
+    with stage("embed"):
+        # The async variants read and write the optional SQLite tier off the event loop
+        query_vector = await query_cache.aget(model_name, text)
+        if query_vector is None:
+            query_vector = await embeddings.aembed_query(text)
+            await query_cache.aput(model_name, text, query_vector)
+    return query_vector
+
+async def embed_queries(texts: List[str]):
+    model_name = embedding_model_name(embeddings)
+    with stage("embed"):
+        query_vectors = list(await asyncio.gather(*(query_cache.aget(model_name, text) for text in texts)))
+        missing = [idx for idx, query_vector in enumerate(query_vectors) if query_vector is None]
+        if missing:
+            fresh = await embeddings.aembed_documents([texts[idx] for idx in missing])
+            for idx, query_vector in zip(missing, fresh):
+                query_vectors[idx] = query_vector
+            await asyncio.gather(*(query_cache.aput(model_name, texts[idx], query_vectors[idx]) for idx in missing))
+    return query_vectors
 
 @app.post("/create_collection")
 async def create_collection(collection_request: CollectionRequest):
     try:
         # Create collection
-        vdb_client.create_collection(
+        await vdb_client.create_collection(
             collection_name=collection_request.collection_name,
-            vectors_config=models.VectorParams(
-                size=1536,  # OpenAI embeddings dimension
-                distance=models.Distance.COSINE
+            **build_collection_config(
+                size=await run_in_threadpool(embedding_dimension, embeddings),
+                hnsw_m=collection_request.hnsw_m,
+                hnsw_ef_construct=collection_request.hnsw_ef_construct,
+                quantization=collection_request.quantization,
+                quantization_always_ram=collection_request.quantization_always_ram,
+                product_compression=collection_request.product_compression,
+                on_disk_vectors=collection_request.on_disk_vectors,
+                on_disk_payload=collection_request.on_disk_payload,
+                hybrid=collection_request.hybrid
             )
         )
+        # Reset only once the collection is really new; creating one that already exists fails
+        # above and must leave the term statistics and the file manifest of its points alone
+        answer_cache.invalidate(collection_request.collection_name)
+        await run_in_threadpool(sparse_encoder.reset, collection_request.collection_name)
+        await run_in_threadpool(ingest_manifest.clear, collection_request.collection_name)
+        for field_name in collection_request.payload_indexes or []:
+            await vdb_client.create_payload_index(
+                collection_name=collection_request.collection_name,
+                field_name=field_name,
+                field_schema=models.PayloadSchemaType.KEYWORD
+            )
         return {"message": f"Collection {collection_request.collection_name} created successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def format_result(scored_point, fields=RESULT_FIELDS):
+    result = {
+        'id': scored_point.id,
+        'score': scored_point.score
+    }
+    for field_name in fields:
+        result[field_name] = scored_point.payload.get(field_name, '')
+    return result
+
+async def search_points(request: SearchRequest, query_vector, with_vectors: bool = False):
+    with stage("vector_search"):
+        if request.hybrid:
+            sparse_vector = await run_in_threadpool(sparse_encoder.encode_query, request.collection_name, request.query)
+            response = await vdb_client.query_points(
+                collection_name=request.collection_name,
+                limit=request.limit,
+                with_payload=request.payload_fields(),
+                with_vectors=with_vectors,
+                **request.hybrid_query(query_vector, sparse_vector, request.limit)
+            )
+            return response.points
+        return await vdb_client.search(
+            collection_name=request.collection_name,
+            query_vector=query_vector,
+            limit=request.limit,
+            search_params=request.search_params(),
+            query_filter=request.query_filter(),
+            with_payload=request.payload_fields(),
+            with_vectors=with_vectors
+        )
+
+async def rerank_points(query: str, points):
+    # Falls back to the vector search order when the cross-encoder misses RERANK_MAX_LATENCY
+    with stage("rerank"):
+        result = await reranker.arerank(query, [point.payload.get('text', '') for point in points])
+    return [points[idx] for idx in result.order], result
+
+def dense_vector(scored_point):
+    # Points of hybrid collections carry named vectors; the dense one is the unnamed vector
+    vector = scored_point.vector
+    return vector[""] if isinstance(vector, dict) else vector
+
 @app.post("/search")
 async def search(request: SearchRequest):
     try:
         # Get embeddings for the query
-        query_vector = embeddings.embed_query(request.query)
+        query_vector = await embed_query(request.query)
         
+        if request.rerank:
+            # Retrieve wide, then keep the best few by cross-encoder score; the text is always needed to score
+            candidates_request = request.model_copy(update={
+                "limit": request.rerank_candidates or 4 * request.limit,
+                "with_payload": list(dict.fromkeys(request.payload_fields() + ['text']))
+            })
+            candidates = await search_points(candidates_request, query_vector)
+            _, rerank_result = await rerank_points(request.query, candidates)
+            results = [
+                {**format_result(candidates[idx], request.payload_fields()), 'rerank_score': rerank_result.scores.get(idx)}
+                for idx in rerank_result.order[:request.limit]
+            ]
+            return {"results": results, "rerank": rerank_result.as_dict()}
+
         # Search in Qdrant
-        search_result = vdb_client.search(
-            collection_name=request.collection_name,
-            query_vector=query_vector,
-            limit=request.limit
-        )
+        search_result = await search_points(request, query_vector)
         
         # Format results
-        results = []
-        for scored_point in search_result:
-            results.append({
-                'id': scored_point.id,
-                'score': scored_point.score,
-                'text': scored_point.payload.get('text', ''),
-                'source': scored_point.payload.get('source', ''),
-                'directory': scored_point.payload.get('directory', '')
-            })
+        results = [format_result(scored_point, request.payload_fields()) for scored_point in search_result]
             
         return {"results": results}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/upload_file")
-async def upload_file(request: FileUploadRequest):
+@app.post("/search_batch")
+async def search_batch(request: BatchSearchRequest):
     try:
-        print(request)
-        # Load and process the document
-        loader = TextLoader(request.file_name, encoding='utf-8')
-        # Split text into chunks    
-        text_splitter = CharacterTextSplitter(
-            separator="\n",
-            chunk_size=600,
-            chunk_overlap=100)
-        docs = text_splitter.split_documents(loader.load())
-        print("in")
-        # Format documents
-        docs_formatted = []
-        for idx, doc in enumerate(docs):
-            docs_formatted.append({
-                'id': idx + 1,
-                'text': doc.page_content,
-                'directory': os.getcwd(),
-                'source': request.file_name
-            })
+        # Embed every query missing from the cache in a single embedding call
+        query_vectors = await embed_queries(request.queries)
 
-        # Create points for Qdrant
-        points = []
-        for doc in docs_formatted:
-            vector = embeddings.embed_query(doc['text'])
-            point = models.PointStruct(
-                id=doc['id'],
-                vector=vector,
-                payload=doc
+        if request.hybrid:
+            sparse_vectors = await run_in_threadpool(
+                lambda: [sparse_encoder.encode_query(request.collection_name, query) for query in request.queries]
             )
-            points.append(point)
+            requests = [
+                models.QueryRequest(limit=request.limit, with_payload=request.payload_fields(),
+                                    **request.hybrid_query(query_vector, sparse_vector, request.limit))
+                for query_vector, sparse_vector in zip(query_vectors, sparse_vectors)
+            ]
+        else:
+            requests = [
+                models.QueryRequest(query=query_vector, limit=request.limit, params=request.search_params(),
+                                    filter=request.query_filter(), with_payload=request.payload_fields())
+                for query_vector in query_vectors
+            ]
 
-        # Upload points to Qdrant
-        vdb_client.upload_points(
-            collection_name=request.collection_name,
-            points=points
-        )
+        # Run all searches in one Qdrant round trip
+        with stage("vector_search"):
+            responses = await vdb_client.query_batch_points(collection_name=request.collection_name, requests=requests)
 
         return {
-            "message": f"File processed and uploaded to collection {request.collection_name}",
-            "documents_processed": len(points)
+            "results": [
+                {"query": query, "results": [format_result(point, request.payload_fields()) for point in response.points]}
+                for query, response in zip(request.queries, responses)
+            ]
         }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def format_chunk(idx: int, text: str, file_name: str):
+    return {
+        'id': idx + 1,
+        'text': text,
+        'source': file_name
+    }
+
+async def is_hybrid_collection(collection_name: str):
+    collection = await vdb_client.get_collection(collection_name)
+    return SPARSE_VECTOR_NAME in (collection.config.params.sparse_vectors or {})
+
+async def ingest_file(request: FileUploadRequest, job: Optional[IngestJob] = None):
+    # Shared by /upload_file and background jobs; `job` receives live progress when given
+    stats = job.stats if job is not None else IngestionStats()
+    # Cached answers stop being valid as soon as the first new point lands in the collection
+    answer_cache.invalidate(request.collection_name)
+    try:
+        ingest_embeddings = CachedEmbeddings(embeddings, embedding_store)
+        # Embed in concurrent batches and upload each batch to Qdrant as soon as it is ready
+        pipeline = IngestionPipeline(
+            ingest_embeddings,
+            vdb_client,
+            request.collection_name,
+            batch_size=request.batch_size,
+            max_concurrency=request.max_concurrency,
+            # Hybrid collections get BM25 sparse vectors computed locally alongside the embeddings
+            sparse_encoder=sparse_encoder if await is_hybrid_collection(request.collection_name) else None
+        )
+
+        if request.streaming:
+            # Read, split, embed and upsert the file in bounded windows; a checkpoint records
+            # the upserted prefix so a rerun after a crash only embeds the remaining chunks
+            checkpoint = IngestCheckpoint(checkpoint_dir, request.file_name, request.collection_name)
+            resume_from = checkpoint.load() if request.resume else 0
+            if job is not None:
+                # Each chunk advances through the file by roughly chunk_size - chunk_overlap characters
+                job.chunks_total = max(os.path.getsize(request.file_name) // 500, 1) - resume_from
+            chunks = iter_file_chunks(request.file_name, chunk_size=600, chunk_overlap=100, separator="\n")
+            docs_formatted = (
+                format_chunk(idx, text, request.file_name)
+                for idx, text in islice(enumerate(chunks), resume_from, None)
+            )
+            # Reading and splitting the file blocks, so the generator is advanced in a worker thread
+            await pipeline.run(
+                iterate_in_thread(docs_formatted, pipeline.batch_size),
+                on_batch=lambda stats: checkpoint.save(resume_from + stats.chunks),
+                stats=stats
+            )
+            checkpoint.clear()
+        else:
+            # Load and process the document
+            loader = TextLoader(request.file_name, encoding='utf-8')
+            # File reading and splitting have no async API, so they run in the bounded thread pool
+            docs = await run_in_threadpool(lambda: split_pool.split_documents(loader.load()))
+            # Format documents
+            docs_formatted = [format_chunk(idx, doc.page_content, request.file_name) for idx, doc in enumerate(docs)]
+            resume_from = 0
+            if job is not None:
+                job.chunks_total = len(docs_formatted)
+            await pipeline.run(docs_formatted, stats=stats)
+    finally:
+        # Also on failure or cancellation, so no answer cached while the collection was half written stays valid
+        answer_cache.invalidate(request.collection_name)
 
+    return {
+        "message": f"File processed and uploaded to collection {request.collection_name}",
+        "documents_processed": resume_from + stats.chunks,
+        "resumed_from_chunk": resume_from,
+        "chunks_embedded": ingest_embeddings.embedded,
+        "ingestion_stats": stats.as_dict()
+    }
+
+@app.post("/upload_file")
+async def upload_file(request: FileUploadRequest):
+    try:
+        print(request)
+        return await ingest_file(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/generate")
-async def generate_response(request: GenerateRequest):
+def format_bulk_chunk(chunk: Chunk):
+    # Point ids come from the file and chunk position, so files never overwrite each other's points
+    return {**format_chunk(chunk.index, chunk.text, chunk.source), 'chunk_id': chunk.id}
+
+@app.post("/upload_files")
+async def upload_files(request: BulkUploadRequest):
     try:
-        # First, get relevant context using search
-        search_request = SearchRequest(
-            query=request.question,
-            collection_name=request.collection_name,
-            limit=request.limit
+        answer_cache.invalidate(request.collection_name)
+        try:
+            ingest_embeddings = CachedEmbeddings(embeddings, embedding_store)
+            # One pipeline for all files, so small files still fill whole embedding batches
+            pipeline = IngestionPipeline(
+                ingest_embeddings,
+                vdb_client,
+                request.collection_name,
+                batch_size=request.batch_size,
+                max_concurrency=request.max_concurrency,
+                sparse_encoder=sparse_encoder if await is_hybrid_collection(request.collection_name) else None,
+                id_field='chunk_id'
+            )
+            bulk = BulkIngestion(pipeline, split_pool, ingest_manifest, format_bulk_chunk, force=request.force)
+            stats = await bulk.run(iter_sources(request.path, request.pattern))
+            # Files that shrank were overwritten chunk by chunk; drop the points past their new end
+            for report in bulk.shrunk_files():
+                if pipeline.sparse_encoder is not None:
+                    await run_in_threadpool(sparse_encoder.remove, request.collection_name,
+                                            [chunk_id(report.source, index)
+                                             for index in range(report.chunks, report.previous_chunks)])
+                await vdb_client.delete(
+                    collection_name=request.collection_name,
+                    points_selector=models.FilterSelector(filter=models.Filter(must=[
+                        models.FieldCondition(key='source', match=models.MatchValue(value=report.source)),
+                        models.FieldCondition(key='id', range=models.Range(gt=report.chunks)),
+                    ]))
+                )
+        finally:
+            answer_cache.invalidate(request.collection_name)
+        return {
+            "message": f"Files under {request.path} processed and uploaded to collection {request.collection_name}",
+            **bulk.summary(stats),
+            "chunks_embedded": ingest_embeddings.embedded,
+            "ingestion_stats": stats.as_dict(),
+            "files": [report.as_dict() for report in bulk.files]
+        }
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def run_ingest_job(job: IngestJob):
+    return await ingest_file(FileUploadRequest(**job.request), job)
+
+# Bounded pool of background ingestion workers; INGEST_WORKERS sets how many jobs run at once
+job_manager = JobManager(run_ingest_job, max_workers=int(os.getenv("INGEST_WORKERS", "2")))
+
+@app.post("/jobs/upload_file")
+async def submit_upload_job(request: FileUploadRequest):
+    try:
+        job = await job_manager.submit(request.model_dump())
+        return {"job_id": job.id, "status": job.status}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/jobs")
+async def list_jobs():
+    return {"jobs": [job.as_dict() for job in job_manager.jobs.values()]}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.as_dict()
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.as_dict()
+
+async def build_generation_prompt(request: GenerateRequest):
+    # First, get relevant context using search
+    search_request = SearchRequest(
+        query=request.question,
+        collection_name=request.collection_name,
+        limit=request.candidates(),
+        hybrid=request.hybrid,
+        # The payload `id` is the chunk's position in its file; point ids of /upload_files are UUIDs
+        with_payload=RESULT_FIELDS + ['id']
+    )
+    
+    # Search for relevant context
+    query_vector = await embed_query(request.question)
+    use_mmr = request.mmr and not request.rerank
+    points = await search_points(search_request, query_vector, with_vectors=use_mmr)
+    rerank_result = None
+    if request.rerank:
+        points, rerank_result = await rerank_points(request.question, points)
+    
+    with stage("context_assembly"):
+        # Pick diverse chunks, drop text repeated by overlapping neighbours and stay within the token budget
+        packed = pack_context(
+            [{**format_result(point), 'position': point.payload.get('id')} for point in points],
+            request.token_budget(),
+            query_vector=query_vector if use_mmr else None,
+            vectors=[dense_vector(point) for point in points] if use_mmr else None,
+            limit=request.limit,
+            lambda_mult=request.mmr_lambda
         )
-        
-        # Search for relevant context
-        search_results = await search(search_request)
-        
-        # Combine all relevant text into context
-        context = "\n".join([result["text"] for result in search_results["results"]])
-        
+        context = packed.context
+
         # Create prompt with the retrieved context
         prompt = f'''
-        Use the following context to answer the question. If the answer cannot be found in the context, say "I don't have enough information to answer this question."
-        
-        Context:
-        {context}
-        
-        Question: {request.question}
-        
-        Please provide a clear and concise answer based on the given context.
-        '''
+    Use the following context to answer the question. If the answer cannot be found in the context, say "I don't have enough information to answer this question."
+    
+    Context:
+    {context}
+    
+    Question: {request.question}
+    
+    Please provide a clear and concise answer based on the given context.
+    '''
+    if rerank_result is not None:
+        packed.stats["rerank"] = rerank_result.as_dict()
+    # The position only steers packing; source documents keep the /search result shape
+    source_documents = [{key: value for key, value in chunk.items() if key != 'position'} for chunk in packed.chunks]
+    return prompt, source_documents, packed.stats
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def lookup_cached_answer(request: GenerateRequest):
+    # The question vector comes from the query cache, so the search that follows a miss reuses it
+    if not request.use_answer_cache:
+        return None, None, None
+    question_vector = await embed_query(request.question)
+    # The version is handed back to `store`, so an ingest that lands during generation discards the answer
+    cached, version = answer_cache.lookup(request.collection_name, request.model, request.limit, question_vector,
+                                          retrieval_mode(request))
+    return question_vector, cached, version
+
+def retrieval_mode(request: GenerateRequest):
+    # Part of the answer cache key, since each retrieval and packing setting feeds the LLM different context
+    mode = "hybrid" if request.hybrid else "dense"
+    if request.rerank:
+        mode += f"+rerank/{request.candidates()}"
+    elif request.mmr:
+        mode += f"+mmr{request.mmr_lambda}/{request.candidates()}"
+    return f"{mode}/{request.token_budget()}"
+
+@app.post("/generate")
+async def generate_response(request: GenerateRequest):
+    try:
+        start = time.perf_counter()
+        question_vector, cached, cache_version = await lookup_cached_answer(request)
+        if cached is not None:
+            return {
+                "response": cached.response,
+                "source_documents": cached.source_documents,
+                "context_stats": None,
+                "cached": True
+            }
+
+        prompt, source_documents, context_stats = await build_generation_prompt(request)
         
         # Generate response using the specified model
-        llm = ChatGroq(model=request.model, temperature=0.5)
-        response = llm.invoke(prompt)
+        llm = llm_registry.get(request.model, temperature=0.5)
+        with stage("llm_total"):
+            response = await llm.ainvoke(prompt)
+
+        if question_vector is not None:
+            answer_cache.store(request.collection_name, request.model, request.limit, request.question,
+                               question_vector, response.content, source_documents,
+                               time.perf_counter() - start, cache_version, retrieval_mode(request))
         
         return {
             "response": response.content,
-            "source_documents": search_results["results"]
+            "source_documents": source_documents,
+            "context_stats": context_stats,
+            "cached": False
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/generate_stream")
+async def generate_stream(request: GenerateRequest):
+    # Streams the answer as server-sent events: one `sources` event with the retrieved documents,
+    # a `token` event per LLM chunk and a final `done` event with the time to first token and
+    # the total latency in seconds.
+    start = time.perf_counter()
+    try:
+        question_vector, cached, cache_version = await lookup_cached_answer(request)
+        if cached is None:
+            prompt, source_documents, context_stats = await build_generation_prompt(request)
+        else:
+            source_documents, context_stats = cached.source_documents, None
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def event_stream():
+        yield sse_event("sources", {"source_documents": source_documents, "context_stats": context_stats})
+        if cached is not None:
+            yield sse_event("token", {"token": cached.response})
+            total_time = time.perf_counter() - start
+            yield sse_event("done", {"time_to_first_token": total_time, "total_time": total_time, "cached": True})
+            return
+        first_token_time = None
+        tokens = []
+        try:
+            llm = llm_registry.get(request.model, temperature=0.5)
+            llm_start = time.perf_counter()
+            async for chunk in llm.astream(prompt):
+                if not chunk.content:
+                    continue
+                if first_token_time is None:
+                    first_token_time = time.perf_counter() - start
+                    record("llm_first_token", time.perf_counter() - llm_start)
+                tokens.append(chunk.content)
+                yield sse_event("token", {"token": chunk.content})
+            record("llm_total", time.perf_counter() - llm_start)
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+            return
+        total_time = time.perf_counter() - start
+        if question_vector is not None:
+            answer_cache.store(request.collection_name, request.model, request.limit, request.question,
+                               question_vector, "".join(tokens), source_documents, total_time,
+                               cache_version, retrieval_mode(request))
+        yield sse_event("done", {
+            "time_to_first_token": first_token_time,
+            "total_time": total_time,
+            "cached": False
+        })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    # Prometheus text exposition format of the per-stage latency histograms
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    profile = profile_log.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    return profile
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "query_embedding_cache": query_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "rerank_scores": reranker.stats(),
+        "embedding_store": await run_in_threadpool(embedding_store.stats)
+    }
+
+@app.post("/cache/compact")
+async def compact_embedding_store(max_entries: Optional[int] = None):
+    try:
+        evicted = await run_in_threadpool(embedding_store.evict, max_entries) if max_entries is not None else 0
+        await run_in_threadpool(embedding_store.compact)
+        return {"evicted": evicted, "embedding_store": await run_in_threadpool(embedding_store.stats)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.delete("/collection/{collection_name}")
 async def delete_collection(collection_name: str):
     try:
-        vdb_client.delete_collection(collection_name=collection_name)
+        await vdb_client.delete_collection(collection_name=collection_name)
+        answer_cache.invalidate(collection_name)
+        await run_in_threadpool(sparse_encoder.reset, collection_name)
+        await run_in_threadpool(ingest_manifest.clear, collection_name)
         return {"message": f"Collection {collection_name} deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
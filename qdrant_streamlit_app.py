@@ -1,6 +1,8 @@
 import streamlit as st
 import requests
 import os
+import json
+import time
 from dotenv import load_dotenv
 from datetime import datetime
 
@@ -10,6 +12,25 @@ load_dotenv()
 # FastAPI endpoint
 API_URL = "http://localhost:8000"
 
+def iter_sse_events(lines):
+    """Parses server-sent event lines into (event, data) tuples.
+
+    Args:
+      lines: Decoded text lines, e.g. from `response.iter_lines(decode_unicode=True)`.
+    """
+    event, data = "message", []
+    for line in lines:
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+    if data:
+        yield event, json.loads("\n".join(data))
+
 st.title("📚 Document Q&A System")
 st.write("Upload documents, search through them, and ask questions!")
 
@@ -50,15 +71,34 @@ with tab1:
         
         if st.button("Process Document"):
             response = requests.post(
-                f"{API_URL}/upload_file",
+                f"{API_URL}/jobs/upload_file",
                 json={
                     "file_name": uploaded_file.name,
                     "collection_name": collection_name
                 }
             )
             if response.status_code == 200:
-                st.success("Document processed and uploaded successfully!")
-                st.json(response.json())
+                job_id = response.json()["job_id"]
+                progress_bar = st.progress(0.0, text="Queued...")
+                # Poll the background job instead of blocking on one long request
+                while True:
+                    job = requests.get(f"{API_URL}/jobs/{job_id}").json()
+                    if job["status"] not in ("queued", "running"):
+                        break
+                    if job["chunks_total"]:
+                        eta = f", ETA {job['eta_seconds']:.0f}s" if job["eta_seconds"] is not None else ""
+                        progress_bar.progress(
+                            min(job["chunks_upserted"] / job["chunks_total"], 1.0),
+                            text=f"{job['chunks_upserted']}/{job['chunks_total']} chunks "
+                                 f"({job['chunks_per_sec']:.1f} chunks/sec{eta})"
+                        )
+                    time.sleep(1)
+                progress_bar.empty()
+                if job["status"] == "completed":
+                    st.success("Document processed and uploaded successfully!")
+                    st.json(job["result"])
+                else:
+                    st.error(f"Error: job {job['status']} {job['error'] or ''}")
             else:
                 st.error(f"Error: {response.text}")
             
@@ -100,25 +140,42 @@ with tab3:
     )
     
     if st.button("Ask") and question:
-        with st.spinner("Generating answer..."):
-            response = requests.post(
-                f"{API_URL}/generate",
-                json={
-                    "question": question,
-                    "collection_name": collection_name,
-                    "model": model
-                }
-            )
-            if response.status_code == 200:
-                result = response.json()
-                st.markdown("### Answer:")
-                answer_text = result["response"]
-                st.write(answer_text)
-                
-                st.markdown("### Source Documents:")
-                for idx, doc in enumerate(result["source_documents"], 1):
-                    with st.expander(f"Source {idx} (Score: {doc['score']:.4f})"):
-                        st.write(doc["text"])
-                        st.write(f"Source: {doc['source']}")
-            else:
-                st.error(f"Error: {response.text}")
+        response = requests.post(
+            f"{API_URL}/generate_stream",
+            json={
+                "question": question,
+                "collection_name": collection_name,
+                "model": model
+            },
+            stream=True
+        )
+        if response.status_code == 200:
+            result = {"source_documents": [], "timings": {}}
+
+            def stream_tokens():
+                for event, data in iter_sse_events(response.iter_lines(decode_unicode=True)):
+                    if event == "sources":
+                        result["source_documents"] = data["source_documents"]
+                    elif event == "token":
+                        yield data["token"]
+                    elif event == "done":
+                        result["timings"].update(data)
+                    elif event == "error":
+                        st.error(f"Error: {data['detail']}")
+
+            st.markdown("### Answer:")
+            st.write_stream(stream_tokens())
+            timings = result["timings"]
+            if timings.get("time_to_first_token") is not None:
+                st.caption(
+                    f"First token after {timings['time_to_first_token']:.2f}s, "
+                    f"complete after {timings['total_time']:.2f}s"
+                )
+            
+            st.markdown("### Source Documents:")
+            for idx, doc in enumerate(result["source_documents"], 1):
+                with st.expander(f"Source {idx} (Score: {doc['score']:.4f})"):
+                    st.write(doc["text"])
+                    st.write(f"Source: {doc['source']}")
+        else:
+            st.error(f"Error: {response.text}")
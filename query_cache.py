@@ -0,0 +1,172 @@
+# query_cache.py - In-process LRU/TTL cache for query embeddings, with an optional shared SQLite tier
+# so several uvicorn workers on the same host reuse each other's vectors. Async callers use `aget` /
+# `aput`, which answer memory hits inline and run the SQLite tier in a worker thread.
+
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+def normalize_query(text: str) -> str:
+    """Normalizes a query so trivially different spellings share a cache entry."""
+    return " ".join(text.casefold().split()).rstrip(" ?!.")
+
+
+class QueryEmbeddingCache:
+    """Caches query vectors keyed on the embedding model name and the normalized query text.
+
+    Args:
+      max_size: Maximum number of vectors kept in memory; least recently used entries are evicted first.
+      ttl_seconds: Age after which an entry is treated as missing, in memory and on disk.
+      disk_path: Optional SQLite file shared between processes as a second cache tier.
+      time_func: Clock used for TTL bookkeeping, replaceable in tests.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600,
+                 disk_path: Optional[str] = None, time_func=time.time):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self.time_func = time_func
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        if disk_path:
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS query_embeddings "
+                    "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, created REAL NOT NULL)"
+                )
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\x00{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = self.make_key(model, text)
+        now = self.time_func()
+        vector = self._memory_get(key, now)
+        if vector is not None or not self.disk_path:
+            return vector
+        return self._disk_lookup(key, now)
+
+    async def aget(self, model: str, text: str) -> Optional[List[float]]:
+        """`get` for the event loop: the SQLite tier is read in a worker thread."""
+        key = self.make_key(model, text)
+        now = self.time_func()
+        vector = self._memory_get(key, now)
+        if vector is not None or not self.disk_path:
+            return vector
+        return await asyncio.to_thread(self._disk_lookup, key, now)
+
+    def put(self, model: str, text: str, vector: List[float]):
+        key, vector, created = self._memory_put(model, text, vector)
+        if self.disk_path:
+            self._disk_put(key, vector, created)
+
+    async def aput(self, model: str, text: str, vector: List[float]):
+        """`put` for the event loop: the SQLite tier is written in a worker thread."""
+        key, vector, created = self._memory_put(model, text, vector)
+        if self.disk_path:
+            await asyncio.to_thread(self._disk_put, key, vector, created)
+
+    def _memory_get(self, key: str, now: float) -> Optional[List[float]]:
+        # Counts a miss only when there is no disk tier left to ask
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                vector, created = entry
+                if now - created <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+                self.expirations += 1
+            if not self.disk_path:
+                self.misses += 1
+        return None
+
+    def _disk_lookup(self, key: str, now: float) -> Optional[List[float]]:
+        row = self._disk_get(key, now)
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            vector, created = row
+            self.disk_hits += 1
+            self._store(key, vector, created)
+        return vector
+
+    def _memory_put(self, model: str, text: str, vector: List[float]):
+        key = self.make_key(model, text)
+        created = self.time_func()
+        vector = list(vector)
+        with self._lock:
+            self._store(key, vector, created)
+        return key, vector, created
+
+    def _disk_put(self, key: str, vector: List[float], created: float):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, vector, created) VALUES (?, ?, ?)",
+                (key, array("d", vector).tobytes(), created)
+            )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+    def _store(self, key: str, vector: List[float], created: float):
+        self._entries[key] = (vector, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.disk_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _disk_get(self, key: str, now: float):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT vector, created FROM query_embeddings WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            blob, created = row
+            if now - created > self.ttl_seconds:
+                conn.execute("DELETE FROM query_embeddings WHERE key = ?", (key,))
+                return None
+        return array("d", blob).tolist(), created
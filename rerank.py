@@ -0,0 +1,159 @@
+# rerank.py - Optional second-stage reranking of retrieved chunks with a local cross-encoder.
+# Scores (query, chunk) pairs in batches on CPU, caches scores, and falls back to the vector search
+# order when scoring would exceed a latency cap. Used by qdrant_api's /search and /generate endpoints.
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+Scorer = Callable[[Sequence[Tuple[str, str]]], Sequence[float]]
+
+
+class CrossEncoderScorer:
+    """Scores (query, text) pairs with a sentence-transformers CrossEncoder, loaded on first use.
+
+    sentence-transformers is optional; install it to enable reranking.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, max_length: int = 512):
+        self.model_name = model_name
+        self.max_length = max_length
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                try:
+                    from sentence_transformers import CrossEncoder
+                except ImportError as e:
+                    raise ImportError(
+                        "Reranking needs sentence-transformers: pip install sentence-transformers"
+                    ) from e
+                self._model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+        return self._model
+
+    def __call__(self, pairs: Sequence[Tuple[str, str]]) -> List[float]:
+        return [float(score) for score in self._load().predict(list(pairs), show_progress_bar=False)]
+
+
+@dataclass
+class RerankResult:
+    # Candidate indices, best first; the vector search order when `fallback` is set
+    order: List[int]
+    scores: Dict[int, float] = field(default_factory=dict)
+    seconds: float = 0.0
+    scored: int = 0
+    cache_hits: int = 0
+    fallback: bool = False
+
+    def as_dict(self) -> Dict[str, object]:
+        return {"seconds": round(self.seconds, 4), "scored": self.scored, "cache_hits": self.cache_hits,
+                "fallback": self.fallback}
+
+
+class Reranker:
+    """Reorders candidates by cross-encoder relevance to the query.
+
+    Args:
+      scorer: Callable scoring a batch of (query, text) pairs; higher is more relevant.
+      model_name: Name the scores are cached under.
+      batch_size: Pairs scored per scorer call.
+      max_latency: Seconds after which scoring stops and the vector order is kept. The cap is
+        checked between batches, so keep batches small enough to finish well within it.
+      cache_size: Scores of recent (query, text) pairs kept in memory.
+    """
+
+    def __init__(self, scorer: Optional[Scorer] = None, model_name: str = DEFAULT_RERANK_MODEL,
+                 batch_size: int = 16, max_latency: float = 0.5, cache_size: int = 10000):
+        self.scorer = scorer if scorer is not None else CrossEncoderScorer(model_name)
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.fallbacks = 0
+
+    def _key(self, query: str, text: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\x00{query}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _cached(self, key: str) -> Optional[float]:
+        with self._lock:
+            score = self._cache.get(key)
+            if score is not None:
+                self._cache.move_to_end(key)
+            return score
+
+    def _store(self, key: str, score: float):
+        with self._lock:
+            self._cache[key] = score
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def rerank(self, query: str, texts: Sequence[str]) -> RerankResult:
+        """Scores every text against `query` and returns the candidate order, best first."""
+        result = self._rerank(query, texts)
+        if result.fallback:
+            self.fallbacks += 1
+        return result
+
+    def _rerank(self, query: str, texts: Sequence[str], deadline: Optional[float] = None) -> RerankResult:
+        start = time.perf_counter()
+        deadline = deadline if deadline is not None else start + self.max_latency
+        result = RerankResult(order=list(range(len(texts))))
+        keys = [self._key(query, text) for text in texts]
+        missing = []
+        for index, key in enumerate(keys):
+            score = self._cached(key)
+            if score is None:
+                missing.append(index)
+            else:
+                result.scores[index] = score
+        result.cache_hits = len(texts) - len(missing)
+
+        for batch_start in range(0, len(missing), self.batch_size):
+            if time.perf_counter() >= deadline:
+                # Scores computed so far stay cached, so a repeated query gets further next time
+                result.fallback = True
+                result.seconds = time.perf_counter() - start
+                return result
+            batch = missing[batch_start:batch_start + self.batch_size]
+            scores = self.scorer([(query, texts[index]) for index in batch])
+            for index, score in zip(batch, scores):
+                result.scores[index] = score
+                self._store(keys[index], score)
+            result.scored += len(batch)
+
+        # Stable sort keeps the vector order between equal scores
+        result.order = sorted(result.order, key=lambda index: -result.scores[index])
+        result.seconds = time.perf_counter() - start
+        return result
+
+    async def arerank(self, query: str, texts: Sequence[str]) -> RerankResult:
+        """Runs `rerank` in a worker thread and keeps the vector order if it does not finish in time."""
+        start = time.perf_counter()
+        try:
+            # A batch still running when the cap passes finishes in the background and is cached
+            result = await asyncio.wait_for(
+                asyncio.to_thread(self._rerank, query, texts, start + self.max_latency), timeout=self.max_latency
+            )
+        except asyncio.TimeoutError:
+            result = RerankResult(order=list(range(len(texts))), seconds=time.perf_counter() - start, fallback=True)
+        if result.fallback:
+            self.fallbacks += 1
+        return result
+
+    def warm_up(self):
+        self.scorer([("warm up", "warm up")])
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {"model": self.model_name, "cached_scores": len(self._cache), "fallbacks": self.fallbacks}
@@ -2,13 +2,14 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from langchain_openai import OpenAIEmbeddings
 from langchain.vectorstores.pgvector import PGVector
+from embedding_providers import create_embeddings
 
-embeddings = OpenAIEmbeddings()
+embeddings = create_embeddings()
 
 from langchain.document_loaders import TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from parallel_splitting import ParallelSplitter
 
 loader = TextLoader("sotu_address_obama.txt", encoding='utf-8')
 documents = loader.load()
@@ -21,7 +22,12 @@ text_splitter = RecursiveCharacterTextSplitter(
     chunk_size=1000,
     chunk_overlap=200,separators=['\n\n', '\n', '.', ','],
 )
-docs = text_splitter.split_documents(documents)
+# Documents are split across worker processes; the chunks match text_splitter.split_documents.
+# Fewer documents than workers (here just one) are split inline without starting the pool.
+# Forked workers, because spawned ones would re-run this script from the top
+with ParallelSplitter(text_splitter, start_method="fork", inline_small_inputs=True) as splitter:
+    chunks = list(splitter.iter_chunks(documents))
+docs = [chunk.document for chunk in chunks]
 
 print(docs)  # prints the document objects
 print(len(docs))  # 1 - we've only read one file/document into the loader
@@ -35,7 +41,9 @@ db = PGVector.from_documents(
     collection_name=COLLECTION_NAME,
     connection_string=CONNECTION_STRING,
     distance_strategy="cosine",
-    pre_delete_collection=True
+    pre_delete_collection=True,
+    # Ids derived from source and position, so re-running updates rows instead of adding new ones
+    ids=[chunk.id for chunk in chunks]
 )
 print(db)
 
@@ -0,0 +1,200 @@
+# sparse_encoder.py - Local BM25 sparse vectors for hybrid dense + keyword search in Qdrant.
+# Term statistics are kept per collection in SQLite and grow with every ingested batch, so no
+# vocabulary has to be fitted up front and nothing is sent over the network. The terms and length of
+# every point are kept too, so re-ingesting a point replaces its contribution instead of adding to it.
+
+import math
+import re
+import sqlite3
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+from qdrant_client import models
+
+# Name of the sparse vector stored next to the unnamed dense vector in hybrid collections
+SPARSE_VECTOR_NAME = "bm25"
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he i in is it its of on or she so that the their "
+    "there they this to was we were will with you".split()
+)
+# SQLite caps the number of bound parameters per statement
+_MAX_PARAMS = 500
+
+PointId = Union[int, str]
+
+
+def tokenize(text: str) -> List[str]:
+    """Casefolded word and number tokens of `text`, without common English stopwords."""
+    return [token for token in _TOKEN_PATTERN.findall(text.casefold()) if token not in _STOPWORDS]
+
+
+def term_index(term: str) -> int:
+    """Stable sparse vector index of a term; a hash, so no vocabulary has to be stored."""
+    return zlib.crc32(term.encode("utf-8"))
+
+
+def _sparse_vector(weights: Dict[int, float]) -> models.SparseVector:
+    indices = sorted(weights)
+    return models.SparseVector(indices=indices, values=[weights[index] for index in indices])
+
+
+class BM25Encoder:
+    """Encodes documents and queries as BM25 sparse vectors.
+
+    Documents carry the BM25 term-frequency part, normalised by the collection's average document
+    length at the time they are ingested; queries carry the inverse document frequency of their
+    terms. The dot product Qdrant computes between the two is the BM25 score.
+
+    Args:
+      path: SQLite file holding document counts and document frequencies per collection.
+      k1: Term frequency saturation.
+      b: Strength of document length normalisation.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS collection_stats ("
+                "collection TEXT PRIMARY KEY, documents INTEGER NOT NULL, tokens INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS term_stats ("
+                "collection TEXT NOT NULL, term INTEGER NOT NULL, documents INTEGER NOT NULL, "
+                "PRIMARY KEY (collection, term))"
+            )
+            # Distinct terms (space separated) and token count of each point, to undo on replacement
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS point_terms ("
+                "collection TEXT NOT NULL, point TEXT NOT NULL, tokens INTEGER NOT NULL, terms TEXT NOT NULL, "
+                "PRIMARY KEY (collection, point))"
+            )
+
+    def encode_documents(self, collection_name: str, texts: Sequence[str],
+                         ids: Optional[Sequence[PointId]] = None) -> List[models.SparseVector]:
+        """Adds `texts` to the collection's statistics and returns their sparse vectors.
+
+        With `ids`, the point ids the vectors are upserted under, points already counted are
+        replaced rather than counted twice.
+        """
+        counts = [Counter(term_index(token) for token in tokenize(text)) for text in texts]
+        lengths = [sum(count.values()) for count in counts]
+        with self._connect() as conn:
+            if ids is None:
+                added = list(zip(counts, lengths))
+            else:
+                # A point repeated within the batch is upserted once, with its last text
+                points = {str(point): (count, length) for point, count, length in zip(ids, counts, lengths)}
+                self._remove_points(conn, collection_name, points)
+                conn.executemany(
+                    "INSERT INTO point_terms VALUES (?, ?, ?, ?)",
+                    [(collection_name, point, length, " ".join(map(str, count)))
+                     for point, (count, length) in points.items()]
+                )
+                added = list(points.values())
+            self._add_stats(conn, collection_name, len(added), sum(length for _, length in added),
+                            Counter(term for count, _ in added for term in count))
+            documents, tokens = conn.execute(
+                "SELECT documents, tokens FROM collection_stats WHERE collection = ?", (collection_name,)
+            ).fetchone()
+        average_length = tokens / documents if documents else 1.0
+        vectors = []
+        for count, length in zip(counts, lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / (average_length or 1.0))
+            vectors.append(_sparse_vector({
+                term: frequency * (self.k1 + 1) / (frequency + norm) for term, frequency in count.items()
+            }))
+        return vectors
+
+    def remove(self, collection_name: str, ids: Iterable[PointId]):
+        """Takes deleted points out of the collection's statistics."""
+        with self._connect() as conn:
+            self._remove_points(conn, collection_name, [str(point) for point in ids])
+
+    def _remove_points(self, conn: sqlite3.Connection, collection_name: str, points: Iterable[str]):
+        points = list(points)
+        rows = []
+        for start in range(0, len(points), _MAX_PARAMS):
+            chunk = points[start:start + _MAX_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            rows.extend(conn.execute(
+                f"SELECT point, tokens, terms FROM point_terms WHERE collection = ? AND point IN ({placeholders})",
+                [collection_name, *chunk]
+            ))
+        if not rows:
+            return
+        conn.executemany("DELETE FROM point_terms WHERE collection = ? AND point = ?",
+                         [(collection_name, point) for point, _, _ in rows])
+        self._add_stats(conn, collection_name, -len(rows), -sum(tokens for _, tokens, _ in rows),
+                        Counter({term: -frequency for term, frequency in
+                                 Counter(int(term) for _, _, terms in rows for term in terms.split()).items()}))
+        conn.execute("DELETE FROM term_stats WHERE collection = ? AND documents <= 0", (collection_name,))
+
+    @staticmethod
+    def _add_stats(conn: sqlite3.Connection, collection_name: str, documents: int, tokens: int,
+                   document_frequencies: Dict[int, int]):
+        conn.execute(
+            "INSERT INTO collection_stats VALUES (?, ?, ?) ON CONFLICT(collection) DO UPDATE SET "
+            "documents = documents + excluded.documents, tokens = tokens + excluded.tokens",
+            (collection_name, documents, tokens)
+        )
+        conn.executemany(
+            "INSERT INTO term_stats VALUES (?, ?, ?) ON CONFLICT(collection, term) DO UPDATE SET "
+            "documents = documents + excluded.documents",
+            [(collection_name, term, frequency) for term, frequency in document_frequencies.items()]
+        )
+
+    def encode_query(self, collection_name: str, text: str) -> models.SparseVector:
+        """Weights each distinct query term by its IDF; terms never seen in the collection are dropped."""
+        terms = list({term_index(token) for token in tokenize(text)})
+        frequencies: Dict[int, int] = {}
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT documents FROM collection_stats WHERE collection = ?", (collection_name,)
+            ).fetchone()
+            for start in range(0, len(terms), _MAX_PARAMS):
+                chunk = terms[start:start + _MAX_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                frequencies.update(conn.execute(
+                    f"SELECT term, documents FROM term_stats WHERE collection = ? AND term IN ({placeholders})",
+                    [collection_name, *chunk]
+                ))
+        documents = row[0] if row else 0
+        return _sparse_vector({
+            term: math.log(1 + (documents - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in frequencies.items()
+        })
+
+    def reset(self, collection_name: str):
+        """Forgets the statistics of a dropped or re-created collection."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM collection_stats WHERE collection = ?", (collection_name,))
+            conn.execute("DELETE FROM term_stats WHERE collection = ?", (collection_name,))
+            conn.execute("DELETE FROM point_terms WHERE collection = ?", (collection_name,))
+
+    def stats(self, collection_name: str) -> Dict[str, int]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT documents, tokens FROM collection_stats WHERE collection = ?", (collection_name,)
+            ).fetchone()
+            terms = conn.execute(
+                "SELECT COUNT(*) FROM term_stats WHERE collection = ?", (collection_name,)
+            ).fetchone()[0]
+        documents, tokens = row or (0, 0)
+        return {"documents": documents, "tokens": tokens, "terms": terms}
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
@@ -0,0 +1,176 @@
+# stage_metrics.py - Per-stage latency histograms, per-request stage breakdowns and a stack sampler.
+# qdrant_api wraps embedding, vector search, context assembly, LLM calls and upserts in `stage(...)`;
+# the histograms are served at /metrics in the Prometheus text format.
+
+import contextvars
+import sys
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence
+
+# Upper bounds in seconds; spans from sub-millisecond cache hits to multi-second LLM answers
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        totals, running = [], 0
+        for count in self.counts:
+            running += count
+            totals.append(running)
+        return totals
+
+
+class StageMetrics:
+    """Latency histograms keyed by stage name, e.g. "embed" or "vector_search"."""
+
+    def __init__(self, name: str = "rag_stage_seconds", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.buckets = buckets
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage_name: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(stage_name)
+            if histogram is None:
+                histogram = self._histograms[stage_name] = LatencyHistogram(self.buckets)
+            histogram.observe(seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {stage_name: {"count": h.count, "sum": h.sum} for stage_name, h in self._histograms.items()}
+
+    def render_prometheus(self) -> str:
+        lines = [f"# HELP {self.name} Latency of each request processing stage in seconds.",
+                 f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for stage_name, histogram in sorted(self._histograms.items()):
+                bounds = [repr(float(bound)) for bound in histogram.buckets] + ["+Inf"]
+                for bound, total in zip(bounds, histogram.cumulative()):
+                    lines.append(f'{self.name}_bucket{{stage="{stage_name}",le="{bound}"}} {total}')
+                lines.append(f'{self.name}_sum{{stage="{stage_name}"}} {histogram.sum}')
+                lines.append(f'{self.name}_count{{stage="{stage_name}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+class RequestTrace:
+    """Seconds spent in each stage while serving one request; repeated stages are summed."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage_name: str, seconds: float):
+        self.stages[stage_name] = self.stages.get(stage_name, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        # Server-Timing header value, shown per request in the browser's network panel
+        return ", ".join(f"{stage_name};dur={seconds * 1000:.2f}" for stage_name, seconds in self.stages.items())
+
+
+metrics = StageMetrics()
+current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar("current_trace", default=None)
+
+
+def record(stage_name: str, seconds: float):
+    """Adds a measured span to the histograms and to the current request's trace, if any."""
+    metrics.observe(stage_name, seconds)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(stage_name, seconds)
+
+
+@contextmanager
+def stage(stage_name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage_name, time.perf_counter() - start)
+
+
+class StackSampler:
+    """Samples the call stack of one thread at a fixed interval from a background thread.
+
+    Run it around a request on the event loop thread to see where its wall time goes; frames from
+    other requests served concurrently on the same loop show up as well.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005, max_depth: int = 64):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self.frames: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            seen = set()
+            depth = 0
+            while frame is not None and depth < self.max_depth:
+                code = frame.f_code
+                seen.add(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                frame = frame.f_back
+                depth += 1
+            # Count each function once per sample, so shares read as "on the stack x% of the time"
+            self.frames.update(seen)
+
+    def report(self, top: int = 25) -> Dict[str, Any]:
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "top": [
+                {"frame": frame, "samples": count, "share": round(count / self.samples, 3)}
+                for frame, count in self.frames.most_common(top)
+            ],
+        }
+
+
+class ProfileLog:
+    """Keeps the most recent request profiles by id."""
+
+    def __init__(self, max_entries: int = 50):
+        self.max_entries = max_entries
+        self._profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: Dict[str, Any]) -> str:
+        profile_id = uuid.uuid4().hex
+        with self._lock:
+            self._profiles[profile_id] = profile
+            while len(self._profiles) > self.max_entries:
+                self._profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._profiles.get(profile_id)
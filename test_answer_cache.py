@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+
+from answer_cache import SemanticAnswerCache
+
+
+class TestSemanticAnswerCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = SemanticAnswerCache(threshold=0.9)
+        self.vector = np.array([1.0, 0.0, 0.0])
+        self.cache.store("docs", "gemma2-9b-it", 5, "What about schools?", self.vector,
+                         "Answer", [{"text": "ctx"}], latency=2.0, version=0)
+
+    def test_hit_for_similar_question(self):
+        cached, version = self.cache.lookup("docs", "gemma2-9b-it", 5, [0.95, 0.1, 0.0])
+        self.assertIsNotNone(cached)
+        self.assertEqual(version, 0)
+        self.assertEqual(cached.response, "Answer")
+        stats = self.cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["latency_saved_seconds"], 2.0)
+
+    def test_miss_below_threshold(self):
+        self.assertIsNone(self.cache.lookup("docs", "gemma2-9b-it", 5, [0.5, 0.8, 0.0])[0])
+        self.assertEqual(self.cache.stats()["hit_rate"], 0.0)
+
+    def test_scoped_by_model_limit_and_collection(self):
+        self.assertIsNone(self.cache.lookup("docs", "qwen/qwen3-32b", 5, self.vector)[0])
+        self.assertIsNone(self.cache.lookup("docs", "gemma2-9b-it", 3, self.vector)[0])
+        self.assertIsNone(self.cache.lookup("other", "gemma2-9b-it", 5, self.vector)[0])
+        self.assertIsNone(self.cache.lookup("docs", "gemma2-9b-it", 5, self.vector, retrieval="hybrid")[0])
+
+    def test_invalidate_on_collection_write(self):
+        self.cache.invalidate("docs")
+        self.assertEqual(self.cache.lookup("docs", "gemma2-9b-it", 5, self.vector), (None, 1))
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_store_dropped_after_concurrent_write(self):
+        # A miss, then an ingest while the answer is generated: the answer reflects the old contents
+        _, version = self.cache.lookup("docs", "gemma2-9b-it", 5, [0.0, 1.0, 0.0])
+        self.cache.invalidate("docs")
+        self.assertFalse(self.cache.store("docs", "gemma2-9b-it", 5, "Stale?", [0.0, 1.0, 0.0], "Old answer", [],
+                                          latency=1.0, version=version))
+        self.assertIsNone(self.cache.lookup("docs", "gemma2-9b-it", 5, [0.0, 1.0, 0.0])[0])
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_max_entries(self):
+        cache = SemanticAnswerCache(threshold=0.99, max_entries=2)
+        for i, vector in enumerate(np.eye(3)):
+            cache.store("docs", "m", 5, f"q{i}", vector, f"a{i}", [], latency=1.0, version=0)
+        self.assertIsNone(cache.lookup("docs", "m", 5, np.eye(3)[0])[0])
+        self.assertEqual(cache.lookup("docs", "m", 5, np.eye(3)[2])[0].response, "a2")
+
+
+if __name__ == '__main__':
+    unittest.main()
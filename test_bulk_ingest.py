@@ -0,0 +1,125 @@
+import asyncio
+import os
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+from langchain.text_splitter import CharacterTextSplitter
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from qdrant_client import AsyncQdrantClient, models
+
+from bulk_ingest import ARCHIVE_MEMBER_SEPARATOR, BulkIngestion, IngestManifest, iter_sources
+from ingest_pipeline import IngestionPipeline
+from parallel_splitting import ParallelSplitter
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+class TestIterSources(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = os.path.join(self.tmp.name, "docs")
+        write(os.path.join(self.root, "b.txt"), "bee")
+        write(os.path.join(self.root, "a.txt"), "ay")
+        write(os.path.join(self.root, "sub", "c.txt"), "sea")
+        write(os.path.join(self.root, "notes.md"), "# notes")
+
+    def test_directory_walk_is_sorted_and_filtered(self):
+        names = [os.path.relpath(source.name, self.root) for source in iter_sources(self.root, "*.txt")]
+        self.assertEqual(names, ["a.txt", "b.txt", os.path.join("sub", "c.txt")])
+        self.assertEqual(len(list(iter_sources(self.root))), 4)
+
+    def test_glob(self):
+        sources = list(iter_sources(os.path.join(self.root, "**", "*.txt")))
+        self.assertEqual(sorted(source.read() for source in sources), [b"ay", b"bee", b"sea"])
+        self.assertEqual(list(iter_sources(os.path.join(self.root, "*.pdf"))), [])
+        with self.assertRaises(FileNotFoundError):
+            list(iter_sources(os.path.join(self.root, "missing")))
+
+    def test_archives(self):
+        zip_path = os.path.join(self.tmp.name, "docs.zip")
+        with zipfile.ZipFile(zip_path, "w") as archive:
+            archive.writestr("x/one.txt", "first")
+            archive.writestr("x/two.md", "second")
+        tar_path = os.path.join(self.tmp.name, "docs.tar.gz")
+        with tarfile.open(tar_path, "w:gz") as archive:
+            archive.add(self.root, arcname="docs")
+        zipped = [(source.name, source.read()) for source in iter_sources(zip_path, "*.txt")]
+        self.assertEqual(zipped, [(f"{zip_path}{ARCHIVE_MEMBER_SEPARATOR}x/one.txt", b"first")])
+        tarred = {source.name.split(ARCHIVE_MEMBER_SEPARATOR)[1]: source.read()
+                  for source in iter_sources(tar_path, "*.txt")}
+        self.assertEqual(tarred, {"docs/a.txt": b"ay", "docs/b.txt": b"bee", "docs/sub/c.txt": b"sea"})
+
+    def test_fingerprint_changes_with_content(self):
+        path = os.path.join(self.root, "a.txt")
+        before = next(iter_sources(path)).fingerprint
+        write(path, "a longer text")
+        self.assertNotEqual(next(iter_sources(path)).fingerprint, before)
+
+
+class TestBulkIngestion(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = os.path.join(self.tmp.name, "docs")
+        for idx in range(3):
+            write(os.path.join(self.root, f"doc{idx}.txt"), "\n".join(f"line {idx}-{n}" for n in range(40)))
+        with open(os.path.join(self.root, "broken.txt"), "wb") as f:
+            f.write(b"\xff\xfe\xfa")
+        self.manifest = IngestManifest(os.path.join(self.tmp.name, "manifest.sqlite"))
+        self.client = AsyncQdrantClient(":memory:")
+        asyncio.run(self.client.create_collection(
+            "test", vectors_config=models.VectorParams(size=8, distance=models.Distance.COSINE)
+        ))
+
+    def ingest(self, force=False):
+        pipeline = IngestionPipeline(DeterministicFakeEmbedding(size=8), self.client, "test", batch_size=8,
+                                     id_field="chunk_id")
+        splitter = ParallelSplitter(CharacterTextSplitter(separator="\n", chunk_size=60, chunk_overlap=10),
+                                    max_workers=1)
+        bulk = BulkIngestion(pipeline, splitter, self.manifest, force=force, format_chunk=lambda chunk: {
+            "id": chunk.index + 1, "text": chunk.text, "source": chunk.source, "chunk_id": chunk.id
+        })
+        stats = asyncio.run(bulk.run(iter_sources(self.root)))
+        return bulk, stats
+
+    def test_ingests_every_file_once(self):
+        bulk, stats = self.ingest()
+        statuses = {os.path.basename(report.source): report.status for report in bulk.files}
+        self.assertEqual(statuses, {"broken.txt": "failed", "doc0.txt": "ingested", "doc1.txt": "ingested",
+                                    "doc2.txt": "ingested"})
+        self.assertEqual(stats.chunks, sum(report.chunks for report in bulk.files))
+        # Chunk ids differ between files, so no file overwrites another's points
+        self.assertEqual(asyncio.run(self.client.count("test")).count, stats.chunks)
+        self.assertEqual(bulk.summary(stats)["files_failed"], 1)
+
+    def test_rerun_skips_unchanged_files(self):
+        self.ingest()
+        write(os.path.join(self.root, "doc1.txt"), "short now")
+        bulk, stats = self.ingest()
+        statuses = [report.status for report in bulk.files]
+        self.assertEqual(statuses.count("unchanged"), 2)
+        self.assertEqual([os.path.basename(report.source) for report in bulk.shrunk_files()], ["doc1.txt"])
+        self.assertEqual(stats.chunks, 1)
+        bulk, stats = self.ingest(force=True)
+        self.assertEqual(bulk.summary(stats)["files_ingested"], 3)
+
+    def test_crlf_files_chunk_like_lf_files(self):
+        with open(os.path.join(self.root, "doc0.txt"), "wb") as f:
+            f.write("\r\n".join(f"line 0-{n}" for n in range(40)).encode("utf-8"))
+        self.ingest()
+        points, _ = asyncio.run(self.client.scroll("test", limit=100, with_payload=True))
+        texts = {point.payload["text"] for point in points if point.payload["source"].endswith("doc0.txt")}
+        self.assertTrue(texts)
+        self.assertFalse(any("\r" in text for text in texts))
+        self.assertIn("line 0-0\nline 0-1", "".join(texts))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+from qdrant_client import models
+
+from collection_profiles import (build_collection_config, build_payload_filter, build_quantization_config,
+                                 build_search_params, estimate_memory_bytes)
+
+
+class TestCollectionProfiles(unittest.TestCase):
+    def test_default_config_keeps_qdrant_defaults(self):
+        config = build_collection_config(size=1536)
+        self.assertEqual(set(config), {"vectors_config"})
+        self.assertEqual(config["vectors_config"].size, 1536)
+        self.assertIsNone(config["vectors_config"].on_disk)
+
+    def test_full_config(self):
+        config = build_collection_config(size=8, hnsw_m=32, hnsw_ef_construct=200, quantization="scalar",
+                                         on_disk_vectors=True, on_disk_payload=True)
+        self.assertTrue(config["vectors_config"].on_disk)
+        self.assertEqual((config["hnsw_config"].m, config["hnsw_config"].ef_construct), (32, 200))
+        self.assertEqual(config["quantization_config"].scalar.type, models.ScalarType.INT8)
+        self.assertTrue(config["on_disk_payload"])
+
+    def test_hybrid_config_adds_sparse_vector(self):
+        config = build_collection_config(size=8, hybrid=True)
+        self.assertEqual(list(config["sparse_vectors_config"]), ["bm25"])
+
+    def test_quantization_types(self):
+        self.assertIsNone(build_quantization_config(None))
+        self.assertEqual(build_quantization_config("product", product_compression="x32").product.compression,
+                         models.CompressionRatio.X32)
+        self.assertFalse(build_quantization_config("binary", always_ram=False).binary.always_ram)
+        with self.assertRaises(ValueError):
+            build_quantization_config("int4")
+
+    def test_search_params(self):
+        self.assertIsNone(build_search_params())
+        params = build_search_params(hnsw_ef=128, rescore=True, oversampling=2.0)
+        self.assertEqual(params.hnsw_ef, 128)
+        self.assertEqual((params.quantization.rescore, params.quantization.oversampling), (True, 2.0))
+
+    def test_payload_filter(self):
+        self.assertIsNone(build_payload_filter({}))
+        query_filter = build_payload_filter({"source": "a.txt", "tag": ["x", "y"]})
+        self.assertEqual([c.key for c in query_filter.must], ["source", "tag"])
+        self.assertEqual(query_filter.must[0].match.value, "a.txt")
+        self.assertEqual(query_filter.must[1].match.any, ["x", "y"])
+
+    def test_memory_estimate_shrinks_with_quantization_and_disk(self):
+        baseline = estimate_memory_bytes(100_000, 1536)["total_ram"]
+        scalar_on_disk = estimate_memory_bytes(100_000, 1536, quantization="scalar", on_disk_vectors=True)
+        binary_on_disk = estimate_memory_bytes(100_000, 1536, quantization="binary", on_disk_vectors=True)
+        self.assertLess(scalar_on_disk["total_ram"], baseline / 3)
+        self.assertLess(binary_on_disk["total_ram"], scalar_on_disk["total_ram"])
+        self.assertEqual(scalar_on_disk["vectors_disk"], 100_000 * 1536 * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
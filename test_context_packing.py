@@ -0,0 +1,62 @@
+import unittest
+
+import numpy as np
+from langchain.text_splitter import CharacterTextSplitter
+
+from context_packing import mmr_select, overlap_length, pack_context
+
+
+def count_words(text):
+    return len(text.split())
+
+
+class TestContextPacking(unittest.TestCase):
+    def setUp(self):
+        lines = [f"Line {i} of the address talks about topic number {i}." for i in range(40)]
+        splitter = CharacterTextSplitter(separator="\n", chunk_size=200, chunk_overlap=60)
+        self.document = "\n".join(lines)
+        self.chunks = [{"position": idx + 1, "text": text, "source": "speech.txt"}
+                       for idx, text in enumerate(splitter.split_text(self.document))]
+
+    def test_overlap_length(self):
+        self.assertEqual(overlap_length("first line\nshared line of text here", "shared line of text here\nnext"), 24)
+        self.assertEqual(overlap_length("no shared text at all", "completely different text"), 0)
+        # Overlaps shorter than MIN_OVERLAP_CHARS are ignored
+        self.assertEqual(overlap_length("ends with the", "the start"), 0)
+
+    def test_adjacent_chunks_are_merged_without_repeated_text(self):
+        packed = pack_context(self.chunks[:3], token_budget=10_000, token_counter=count_words)
+        self.assertEqual(packed.context, "\n".join(self.document.split("\n")[:packed.context.count("\n") + 1]))
+        self.assertGreater(packed.stats["overlap_chars_removed"], 0)
+        self.assertGreater(packed.stats["tokens_saved"], 0)
+
+    def test_token_budget(self):
+        packed = pack_context(self.chunks, token_budget=60, limit=10, token_counter=count_words)
+        self.assertLessEqual(packed.stats["context_tokens"], 60)
+        self.assertLess(len(packed.chunks), 10)
+        self.assertEqual(packed.stats["baseline_context_tokens"],
+                         count_words("\n".join(chunk["text"] for chunk in self.chunks[:10])))
+
+    def test_passages_follow_rank_order(self):
+        chunks = [{"position": 9, "text": "x" * 40, "source": "b.txt"},
+                  {"position": 1, "text": "y" * 40, "source": "a.txt"}]
+        self.assertEqual(pack_context(chunks, token_budget=100).context, "x" * 40 + "\n" + "y" * 40)
+
+    def test_neighbours_merge_by_position_not_point_id(self):
+        # /upload_files points have UUID ids; chunks in reverse rank order still merge by position
+        chunks = [{**chunk, "id": f"uuid-{idx}"} for idx, chunk in reversed(list(enumerate(self.chunks[:3])))]
+        chunks.append({"id": 7, "text": "unrelated text from a file ingested by /upload_file", "source": "speech.txt"})
+        packed = pack_context(chunks, token_budget=10_000, token_counter=count_words)
+        self.assertIn("\n".join(self.document.split("\n")[:8]), packed.context)
+        self.assertGreater(packed.stats["overlap_chars_removed"], 0)
+
+    def test_mmr_skips_near_duplicates(self):
+        query = [1.0, 0.0, 0.0]
+        vectors = [[0.9, 0.1, 0.0], [0.9, 0.11, 0.0], [0.6, 0.0, 0.8]]
+        self.assertEqual(mmr_select(query, vectors, 2, lambda_mult=1.0), [0, 1])
+        self.assertEqual(mmr_select(query, vectors, 2, lambda_mult=0.3), [0, 2])
+        self.assertEqual(mmr_select(query, np.empty((0, 3)), 2), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
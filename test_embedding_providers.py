@@ -0,0 +1,113 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+
+from embedding_providers import LocalEmbeddings, _MicroBatcher, create_embeddings, embedding_dimension
+from embedding_store import CachedEmbeddings, EmbeddingStore
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+class ProbeEmbeddings(Embeddings):
+    # Exposes neither its size nor a known model name
+    def __init__(self, size, model=None):
+        self.size_ = size
+        self.model = model
+        self.probes = 0
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        self.probes += 1
+        return [0.5] * self.size_
+
+
+class TestCreateEmbeddings(unittest.TestCase):
+    def test_fake_provider(self):
+        embeddings = create_embeddings("fake", size=8)
+        self.assertEqual(len(embeddings.embed_query("hello")), 8)
+        self.assertEqual(embeddings.embed_query("hello"), embeddings.embed_query("hello"))
+
+    def test_provider_from_environment(self):
+        with mock.patch.dict(os.environ, {"EMBEDDING_PROVIDER": "fake", "EMBEDDING_DIMENSION": "12"}):
+            self.assertEqual(embedding_dimension(create_embeddings()), 12)
+
+    def test_local_settings_from_environment(self):
+        env = {"EMBEDDING_BACKEND": "onnx", "EMBEDDING_ONNX_FILE": "onnx/model_qint8_avx512_vnni.onnx"}
+        with mock.patch.dict(os.environ, env):
+            embeddings = create_embeddings("local")
+        # Nothing is loaded until the first encode
+        self.assertIsInstance(embeddings, LocalEmbeddings)
+        self.assertEqual(embeddings.model, "all-MiniLM-L6-v2+onnx/onnx/model_qint8_avx512_vnni.onnx")
+        self.assertEqual(create_embeddings("local", quantize=True).model, "all-MiniLM-L6-v2+int8")
+
+    def test_unknown_provider(self):
+        with self.assertRaises(ValueError):
+            create_embeddings("nope")
+        with self.assertRaises(ValueError):
+            LocalEmbeddings(backend="tensorrt")
+
+
+class TestEmbeddingDimension(unittest.TestCase):
+    def test_known_model_needs_no_call(self):
+        embeddings = ProbeEmbeddings(4, model="text-embedding-3-large")
+        self.assertEqual(embedding_dimension(embeddings), 3072)
+        self.assertEqual(embeddings.probes, 0)
+
+    def test_probe_when_unknown(self):
+        embeddings = ProbeEmbeddings(6)
+        self.assertEqual(embedding_dimension(embeddings), 6)
+        self.assertEqual(embeddings.probes, 1)
+
+    def test_cached_embeddings(self):
+        store = EmbeddingStore(":memory:")
+        self.assertEqual(embedding_dimension(CachedEmbeddings(DeterministicFakeEmbedding(size=5), store)), 5)
+
+
+class TestMicroBatcher(unittest.TestCase):
+    def test_concurrent_queries_share_a_batch(self):
+        encoder = CountingEncoder()
+        batcher = _MicroBatcher(encoder, max_batch=3, max_wait=0.01)
+
+        async def run():
+            return await asyncio.gather(*(batcher.submit("x" * n) for n in range(1, 6)))
+
+        self.assertEqual(asyncio.run(run()), [[1.0], [2.0], [3.0], [4.0], [5.0]])
+        self.assertEqual([len(call) for call in encoder.calls], [3, 2])
+
+    def test_errors_reach_every_caller(self):
+        def failing(texts):
+            raise RuntimeError("model failed")
+
+        batcher = _MicroBatcher(failing, max_batch=8, max_wait=0.0)
+
+        async def run():
+            return await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in asyncio.run(run())))
+
+    def test_local_embeddings_batches_async_queries(self):
+        encoder = CountingEncoder()
+        embeddings = LocalEmbeddings(max_wait=0.01)
+        embeddings._batcher.encode = encoder
+
+        async def run():
+            return await asyncio.gather(*(embeddings.aembed_query(text) for text in ["a", "bb", "ccc"]))
+
+        self.assertEqual(asyncio.run(run()), [[1.0], [2.0], [3.0]])
+        self.assertEqual(len(encoder.calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
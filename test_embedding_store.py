@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from embedding_store import CachedEmbeddings, EmbeddingStore
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    embedded_texts: list = []
+
+    def embed_documents(self, texts):
+        self.embedded_texts.extend(texts)
+        return super().embed_documents(texts)
+
+
+class TestEmbeddingStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "embeddings.sqlite")
+
+    def test_reingesting_unchanged_corpus_makes_no_embedding_calls(self):
+        texts = [f"chunk {i}" for i in range(20)]
+        first = CountingEmbeddings(size=8, embedded_texts=[])
+        vectors = CachedEmbeddings(first, EmbeddingStore(self.path)).embed_documents(texts)
+        self.assertEqual(len(first.embedded_texts), 20)
+
+        second = CountingEmbeddings(size=8, embedded_texts=[])
+        store = EmbeddingStore(self.path)
+        cached = CachedEmbeddings(second, store).embed_documents(texts)
+        self.assertEqual(second.embedded_texts, [])
+        for expected, actual in zip(vectors, cached):
+            self.assertEqual([round(v, 5) for v in expected], [round(v, 5) for v in actual])
+        self.assertEqual(store.stats()["hit_rate"], 1.0)
+
+    def test_only_changed_chunks_are_embedded(self):
+        embedder = CountingEmbeddings(size=8, embedded_texts=[])
+        cached = CachedEmbeddings(embedder, EmbeddingStore(self.path))
+        cached.embed_documents(["a", "b", "c"])
+        cached.embed_documents(["a", "b edited", "c", "d"])
+        self.assertEqual(embedder.embedded_texts, ["a", "b", "c", "b edited", "d"])
+        self.assertEqual(cached.embedded, 5)
+
+    def test_key_includes_model_and_dimension(self):
+        store = EmbeddingStore(self.path)
+        store.put_many("model-a", 8, ["text"], [[1.0] * 8])
+        self.assertIsNotNone(store.get_many("model-a", 8, ["text"])[0])
+        self.assertIsNone(store.get_many("model-b", 8, ["text"])[0])
+        self.assertIsNone(store.get_many("model-a", 4, ["text"])[0])
+
+    def test_eviction_and_compaction(self):
+        store = EmbeddingStore(self.path, max_entries=3)
+        for i in range(5):
+            store.put_many("m", 2, [f"t{i}"], [[float(i), 0.0]])
+        self.assertEqual(len(store), 3)
+        self.assertEqual(store.stats()["evictions"], 2)
+        self.assertIsNone(store.get_many("m", 2, ["t0"])[0])
+        store.compact()
+        self.assertEqual(store.get_many("m", 2, ["t4"])[0], [4.0, 0.0])
+
+
+class TestCachedEmbeddingsAsync(unittest.IsolatedAsyncioTestCase):
+    async def test_aembed_documents_uses_store(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            embedder = CountingEmbeddings(size=8, embedded_texts=[])
+            cached = CachedEmbeddings(embedder, EmbeddingStore(os.path.join(tmp, "e.sqlite")))
+            await cached.aembed_documents(["x", "y"])
+            await cached.aembed_documents(["x", "y", "z"])
+            self.assertEqual(embedder.embedded_texts, ["x", "y", "z"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+import importlib.util
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+HAS_FAISS = importlib.util.find_spec("faiss") is not None
+if HAS_FAISS:
+    from faiss_service import (MANIFEST, FaissService, IndexWriter, OffsetDocstore, build_index, index_exists,
+                               indexed_sources, migrate_langchain_index)
+
+
+def make_documents(count):
+    return [Document(page_content=f"chunk {i} — naïve café {'x' * (i % 7)}", metadata={"source": f"page{i % 3}"})
+            for i in range(count)]
+
+
+@unittest.skipUnless(HAS_FAISS, "faiss is not installed")
+class TestFaissService(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.directory = os.path.join(self.tmp.name, "faiss_index")
+        self.vectors = np.random.default_rng(0).random((50, 8), dtype="float32")
+        self.documents = make_documents(50)
+        self.ids = [f"id-{i}" for i in range(50)]
+
+    def test_search_matches_brute_force(self):
+        build_index(self.directory, self.documents, self.vectors, self.ids)
+        service = FaissService(self.directory)
+        self.addCleanup(service.close)
+        query = self.vectors[7] + 0.01
+        expected = np.argsort(((self.vectors - query) ** 2).sum(axis=1))[:5]
+        results = service.similarity_search_with_score_by_vector(query, k=5)
+        self.assertEqual([document.id for document, _ in results], [self.ids[row] for row in expected])
+        self.assertEqual(results[0][0].page_content, self.documents[7].page_content)
+        self.assertEqual(results[0][0].metadata, {"source": "page1"})
+        self.assertAlmostEqual(results[0][1], float(((self.vectors[7] - query) ** 2).sum()), places=5)
+        # Asking for more neighbours than there are rows returns what exists
+        self.assertEqual(len(service.search_by_vectors(self.vectors[:2], k=80)[1]), 50)
+
+    def test_search_returns_stored_vectors(self):
+        build_index(self.directory, self.documents, self.vectors, self.ids, index_type="hnsw", hnsw_m=8)
+        writer = IndexWriter(self.directory)
+        writer.remove(["id-7"])
+        writer.commit()
+        service = FaissService(self.directory)
+        self.addCleanup(service.close)
+        documents, stored = service.similarity_search_with_vectors_by_vector(self.vectors[7], k=60, ef_search=100)
+        self.assertEqual(len(documents), 49)
+        self.assertNotIn("id-7", {document.id for document in documents})
+        for document, vector in zip(documents, stored):
+            np.testing.assert_array_equal(vector, self.vectors[self.ids.index(document.id)])
+
+    def test_refresh_switches_generation(self):
+        build_index(self.directory, self.documents, self.vectors, self.ids)
+        service = FaissService(self.directory)
+        self.addCleanup(service.close)
+        for _ in range(3):
+            build_index(self.directory, self.documents[:10], self.vectors[:10], self.ids[:10])
+        # Still serving the mapped first generation until told to refresh
+        self.assertEqual(len(service), 50)
+        self.assertEqual(service.similarity_search_by_vector(self.vectors[40], k=1)[0].id, "id-40")
+        self.assertTrue(service.refresh())
+        self.assertEqual((service.generation, len(service)), (4, 10))
+        self.assertEqual(sorted(name for name in os.listdir(self.directory) if name.startswith("index.")),
+                         ["index.3.faiss", "index.4.faiss"])
+
+    def test_offset_docstore(self):
+        records, offsets = os.path.join(self.tmp.name, "docs.jsonl"), os.path.join(self.tmp.name, "docs.offsets")
+        self.assertEqual(OffsetDocstore.write(records, offsets, self.documents, self.ids), 50)
+        docstore = OffsetDocstore(records, offsets)
+        self.assertEqual(len(docstore), 50)
+        for row in (0, 49, 3):
+            self.assertEqual((docstore[row].page_content, docstore[row].metadata),
+                             (self.documents[row].page_content, self.documents[row].metadata))
+        self.assertEqual(docstore[49].id, "id-49")
+        docstore.close()
+        OffsetDocstore.write(records, offsets, [], [])
+        self.assertEqual(len(OffsetDocstore(records, offsets)), 0)
+
+    def test_offset_docstore_append(self):
+        records, offsets = os.path.join(self.tmp.name, "docs.jsonl"), os.path.join(self.tmp.name, "docs.offsets")
+        OffsetDocstore.write(records, offsets, self.documents[:5], self.ids[:5])
+        OffsetDocstore.write(records, offsets, self.documents[5:9], self.ids[5:9], start_row=5)
+        # A second append from row 5 replaces rows an interrupted commit left behind
+        self.assertEqual(OffsetDocstore.write(records, offsets, self.documents[20:22], self.ids[20:22], start_row=5), 7)
+        docstore = OffsetDocstore(records, offsets)
+        self.addCleanup(docstore.close)
+        self.assertEqual([docstore[row].id for row in range(7)], self.ids[:5] + ["id-20", "id-21"])
+
+    def test_incremental_add_and_remove(self):
+        build_index(self.directory, self.documents[:30], self.vectors[:30], self.ids[:30])
+        service = FaissService(self.directory)
+        self.addCleanup(service.close)
+        writer = IndexWriter(self.directory)
+        self.assertEqual(writer.remove_sources(["page0"]), 10)
+        writer.add(self.documents[30:], self.vectors[30:], self.ids[30:])
+        # Re-adding an id replaces its document
+        writer.add([Document(page_content="new text", metadata={"source": "page9"})], self.vectors[31:32], ["id-31"])
+        manifest = writer.commit()
+        self.assertEqual((manifest["count"], manifest["rows"], manifest["records"]), (40, 51, "docstore.1.jsonl"))
+
+        service.refresh()
+        self.assertEqual(len(service), 40)
+        found = {document.id for document in service.similarity_search_by_vector(self.vectors[0], k=50)}
+        self.assertEqual(found, {f"id-{i}" for i in range(50) if i >= 30 or i % 3})
+        self.assertEqual(service.similarity_search_by_vector(self.vectors[31], k=1)[0].page_content, "new text")
+        # A writer opened later sees the same documents
+        self.assertEqual(len(IndexWriter(self.directory)), 40)
+        self.assertEqual(indexed_sources(self.directory), {"page0", "page1", "page2", "page9"})
+        # Manifests that predate the source list are answered from the docstore
+        manifest_path = os.path.join(self.directory, MANIFEST)
+        with open(manifest_path) as f:
+            legacy = {key: value for key, value in json.load(f).items() if key != "sources"}
+        with open(manifest_path, "w") as f:
+            json.dump(legacy, f)
+        self.assertEqual(indexed_sources(self.directory), {"page0", "page1", "page2", "page9"})
+        self.assertEqual(indexed_sources(os.path.join(self.tmp.name, "missing")), set())
+        with self.assertRaises(ValueError):
+            IndexWriter(self.directory, index_type="hnsw")
+
+    def test_hnsw_skips_deleted_rows(self):
+        build_index(self.directory, self.documents, self.vectors, self.ids, index_type="hnsw", hnsw_m=8)
+        writer = IndexWriter(self.directory)
+        writer.remove(["id-7", "id-8"])
+        self.assertTrue(writer.commit()["filter_deleted"])
+        service = FaissService(self.directory)
+        self.addCleanup(service.close)
+        results = service.similarity_search_by_vector(self.vectors[7], k=50, ef_search=100)
+        self.assertEqual(len(results), 48)
+        self.assertNotIn("id-7", {document.id for document in results})
+        writer = IndexWriter(self.directory)
+        writer.add(self.documents[7:8], self.vectors[7:8], ["id-7"])
+        writer.commit()
+        service.refresh()
+        self.assertEqual(service.similarity_search_by_vector(self.vectors[7], k=1)[0].id, "id-7")
+
+    def test_trained_index_types(self):
+        vectors = np.random.default_rng(1).random((600, 16), dtype="float32")
+        documents = make_documents(600)
+        ids = [f"id-{i}" for i in range(600)]
+        for index_type in ("ivf", "ivfpq", "pq"):
+            with self.subTest(index_type=index_type):
+                directory = os.path.join(self.tmp.name, index_type)
+                with self.assertRaises(ValueError):
+                    build_index(directory, documents[:3], vectors[:3], ids[:3], index_type=index_type, nlist=4,
+                                pq_bits=4)
+                build_index(directory, documents[:500], vectors[:500], ids[:500], index_type=index_type, nlist=4,
+                            pq_bits=4)
+                writer = IndexWriter(directory)
+                writer.add(documents[500:], vectors[500:], ids[500:])
+                writer.remove(["id-3"])
+                writer.commit()
+                service = FaissService(directory)
+                self.addCleanup(service.close)
+                self.assertEqual(len(service), 599)
+                # Probing every cluster finds a stored vector among its own neighbours, despite PQ's loss
+                added, removed = service.search_by_vectors(vectors[[550, 3]], k=10, nprobe=4)
+                self.assertIn("id-550", {document.id for document, _ in added})
+                self.assertNotIn("id-3", {document.id for document, _ in removed})
+                found, stored = service.similarity_search_with_vectors_by_vector(vectors[550], k=10, nprobe=4)
+                self.assertEqual(stored.shape, (10, 16))
+                row = [document.id for document in found].index("id-550")
+                distances = np.linalg.norm(vectors - stored[row], axis=1)
+                self.assertLess(distances[550], np.percentile(distances, 5))
+
+    def test_migrate_langchain_index(self):
+        from langchain_community.vectorstores import FAISS
+
+        embeddings = DeterministicFakeEmbedding(size=16)
+        FAISS.from_documents(self.documents, embeddings, ids=self.ids).save_local(self.directory)
+        legacy = FAISS.load_local(self.directory, embeddings, allow_dangerous_deserialization=True)
+        migrate_langchain_index(self.directory)
+        self.assertTrue(index_exists(self.directory))
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "index.pkl")))
+        service = FaissService(self.directory)
+        self.addCleanup(service.close)
+        query = embeddings.embed_query("chunk 3")
+        self.assertEqual(service.similarity_search_by_vector(query, k=4), legacy.similarity_search_by_vector(query, k=4))
+
+    def test_errors(self):
+        with self.assertRaises(FileNotFoundError):
+            FaissService(self.directory)
+        with self.assertRaises(ValueError):
+            build_index(self.directory, self.documents, self.vectors[:3], self.ids)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from feedback_log import DOWN, UP, FeedbackLog, apply_source_boosts
+
+
+class TestFeedbackLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "feedback.sqlite")
+
+    def open_log(self, **options):
+        log = FeedbackLog(self.path, **options)
+        self.addCleanup(log.close)
+        return log
+
+    def test_concurrent_votes_are_written_in_batches(self):
+        log = self.open_log(batch_size=50, flush_interval=0.05)
+
+        def vote(user):
+            for i in range(100):
+                log.record(f"question {user}", f"https://example.org/{i % 4}", 0.5, UP if i % 4 else DOWN)
+
+        threads = [threading.Thread(target=vote, args=(user,)) for user in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        log.flush()
+        self.assertEqual(log.stats()["written"], 400)
+        self.assertLess(log.stats()["batches"], 400)
+        feedback = log.source_feedback()
+        self.assertEqual((feedback["https://example.org/0"].up, feedback["https://example.org/0"].down), (0, 100))
+        self.assertEqual(feedback["https://example.org/1"].votes, 100)
+        self.assertAlmostEqual(feedback["https://example.org/1"].mean_score, 0.5)
+
+    def test_record_never_waits_for_the_writer(self):
+        log = self.open_log(max_queue=2, flush_interval=0.01)
+        release = threading.Event()
+        with mock.patch.object(log, "_write", side_effect=lambda batch: release.wait(5)):
+            log.record("q", "a", 0.1, UP)
+            # The writer holds the first event; the queue then fills up
+            time.sleep(0.05)
+            start = time.perf_counter()
+            accepted = [log.record("q", "a", 0.1, UP) for _ in range(5)]
+            self.assertLess(time.perf_counter() - start, 0.5)
+            release.set()
+            log.flush()
+        self.assertEqual(accepted, [True, True, False, False, False])
+        self.assertEqual(log.stats()["dropped"], 3)
+
+    def test_close_writes_queued_events(self):
+        log = FeedbackLog(self.path, flush_interval=10)
+        log.record("what benefits?", "https://example.org/a", 0.8, UP)
+        log.close()
+        with self.assertRaises(RuntimeError):
+            log.record("q", "a", 0.1, UP)
+        self.assertEqual(self.open_log().source_feedback()["https://example.org/a"].up, 1)
+
+    def test_source_boosts(self):
+        log = self.open_log(flush_interval=0.01)
+        for _ in range(15):
+            log.record("q", "good", 0.7, UP)
+        log.record("q", "bad", 0.7, DOWN)
+        log.flush()
+        boosts = log.source_boosts(weight=0.1, prior_votes=5)
+        self.assertAlmostEqual(boosts["good"], 0.1 * 15 / 20)
+        self.assertAlmostEqual(boosts["bad"], -0.1 / 6)
+        self.assertEqual(log.source_boosts(since=time.time() + 60), {})
+        with self.assertRaises(ValueError):
+            log.record("q", "good", 0.7, 0)
+
+        results = [("bad", 0.80), ("other", 0.79), ("good", 0.74)]
+        ranked = apply_source_boosts(results, boosts, source=lambda r: r[0], score=lambda r: r[1])
+        self.assertEqual([result[0] for result, _ in ranked], ["good", "other", "bad"])
+        self.assertAlmostEqual(ranked[0][1], 0.74 + 0.075)
+
+
+if __name__ == "__main__":
+    unittest.main()
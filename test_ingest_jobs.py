@@ -0,0 +1,77 @@
+import asyncio
+import unittest
+
+from ingest_jobs import CANCELLED, COMPLETED, FAILED, QUEUED, RUNNING, JobManager
+
+
+class TestJobManager(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.release = asyncio.Event()
+
+        async def runner(job):
+            job.chunks_total = 10
+            for _ in range(job.request.get("batches", 1)):
+                job.stats.chunks_embedded += 5
+                job.stats.chunks += 5
+                await asyncio.sleep(0)
+            if job.request.get("fail"):
+                raise RuntimeError("embedding API unavailable")
+            if job.request.get("block"):
+                await self.release.wait()
+            return {"documents_processed": job.stats.chunks}
+
+        self.manager = JobManager(runner, max_workers=1)
+        await self.manager.start()
+
+    async def asyncTearDown(self):
+        await self.manager.stop()
+
+    async def wait_for(self, job, *states):
+        for _ in range(200):
+            if job.status in states:
+                return
+            await asyncio.sleep(0.01)
+        self.fail(f"job stayed {job.status}")
+
+    async def test_job_completes_with_progress(self):
+        job = await self.manager.submit({"batches": 2})
+        await self.wait_for(job, COMPLETED)
+        status = job.as_dict()
+        self.assertEqual(status["chunks_upserted"], 10)
+        self.assertEqual(status["chunks_embedded"], 10)
+        self.assertEqual(status["result"], {"documents_processed": 10})
+        self.assertIsNone(status["eta_seconds"])
+
+    async def test_failed_job_records_error(self):
+        job = await self.manager.submit({"fail": True})
+        await self.wait_for(job, FAILED)
+        self.assertEqual(job.error, "embedding API unavailable")
+
+    async def test_cancel_running_and_queued_jobs(self):
+        running = await self.manager.submit({"block": True})
+        queued = await self.manager.submit({})
+        await self.wait_for(running, RUNNING)
+        self.assertEqual(queued.status, QUEUED)
+        self.assertGreater(running.as_dict()["chunks_per_sec"], 0)
+        self.assertIsNotNone(running.as_dict()["eta_seconds"])
+
+        self.manager.cancel(queued.id)
+        self.manager.cancel(running.id)
+        await self.wait_for(running, CANCELLED)
+        self.assertEqual(queued.status, CANCELLED)
+
+        # The worker survives cancellation and keeps serving new jobs
+        job = await self.manager.submit({})
+        await self.wait_for(job, COMPLETED)
+
+    async def test_workers_are_bounded(self):
+        jobs = [await self.manager.submit({"block": True}) for _ in range(3)]
+        await self.wait_for(jobs[0], RUNNING)
+        self.assertEqual([job.status for job in jobs], [RUNNING, QUEUED, QUEUED])
+        self.release.set()
+        for job in jobs:
+            await self.wait_for(job, COMPLETED)
+
+
+if __name__ == '__main__':
+    unittest.main()
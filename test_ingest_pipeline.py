@@ -0,0 +1,134 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from qdrant_client import AsyncQdrantClient, models
+
+from ingest_pipeline import IngestCheckpoint, IngestionPipeline, batched
+
+
+class CountingEmbeddings:
+    """Fake embedder that records how it was called and simulates network latency."""
+
+    def __init__(self, size=8, delay=0.0):
+        self.fake = DeterministicFakeEmbedding(size=size)
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+    async def aembed_documents(self, texts):
+        self.calls.append(len(texts))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(self.delay)
+        try:
+            return self.fake.embed_documents(texts)
+        finally:
+            self.active -= 1
+
+
+class TestIngestionPipeline(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = AsyncQdrantClient(":memory:")
+        await self.client.create_collection(
+            collection_name="test",
+            vectors_config=models.VectorParams(size=8, distance=models.Distance.COSINE)
+        )
+        self.docs = [
+            {"id": idx + 1, "text": f"chunk number {idx}", "source": "test.txt"}
+            for idx in range(25)
+        ]
+
+    def test_batched(self):
+        self.assertEqual(list(batched(range(5), 2)), [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(batched([], 3)), [])
+
+    async def test_run_uploads_all_chunks_in_batches(self):
+        embeddings = CountingEmbeddings(size=8)
+        pipeline = IngestionPipeline(embeddings, self.client, "test", batch_size=10, max_concurrency=2)
+
+        stats = await pipeline.run(self.docs)
+
+        self.assertEqual(stats.chunks, 25)
+        self.assertEqual(stats.batches, 3)
+        self.assertEqual(sorted(embeddings.calls), [5, 10, 10])
+        self.assertEqual((await self.client.count("test")).count, 25)
+        point = (await self.client.retrieve("test", ids=[7], with_vectors=True))[0]
+        self.assertEqual(point.payload["text"], "chunk number 6")
+        self.assertEqual(len(point.vector), 8)
+        self.assertGreater(stats.as_dict()["chunks_per_sec"], 0)
+
+    async def test_run_limits_batches_in_flight(self):
+        embeddings = CountingEmbeddings(size=8, delay=0.02)
+        pipeline = IngestionPipeline(embeddings, self.client, "test", batch_size=2, max_concurrency=3)
+
+        await pipeline.run(self.docs)
+
+        self.assertGreater(embeddings.max_active, 1)
+        self.assertLessEqual(embeddings.max_active, 3)
+
+    async def test_checkpoint_resumes_after_failure(self):
+        class FailingEmbeddings(CountingEmbeddings):
+            async def aembed_documents(self, texts):
+                if len(self.calls) == 2:
+                    raise RuntimeError("embedding API unavailable")
+                return await super().aembed_documents(texts)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "doc.txt")
+            with open(source, "w") as f:
+                f.write("content")
+            checkpoint = IngestCheckpoint(os.path.join(tmp, "checkpoints"), source, "test")
+            pipeline = IngestionPipeline(FailingEmbeddings(size=8), self.client, "test", batch_size=5,
+                                         max_concurrency=1, max_retries=0)
+            with self.assertRaises(RuntimeError):
+                await pipeline.run(self.docs, on_batch=lambda stats: checkpoint.save(stats.chunks))
+            self.assertEqual(checkpoint.load(), 10)
+
+            embeddings = CountingEmbeddings(size=8)
+            pipeline = IngestionPipeline(embeddings, self.client, "test", batch_size=5, max_concurrency=1)
+            resume_from = checkpoint.load()
+            await pipeline.run(self.docs[resume_from:])
+            checkpoint.clear()
+            self.assertEqual(sum(embeddings.calls), 15)
+            self.assertEqual((await self.client.count("test")).count, 25)
+            self.assertEqual(checkpoint.load(), 0)
+
+    async def test_failed_batches_are_retried(self):
+        class FlakyEmbeddings(CountingEmbeddings):
+            failures = 2
+
+            async def aembed_documents(self, texts):
+                if self.failures:
+                    self.failures -= 1
+                    raise RuntimeError("rate limited")
+                return await super().aembed_documents(texts)
+
+        pipeline = IngestionPipeline(FlakyEmbeddings(size=8), self.client, "test", batch_size=10,
+                                     max_concurrency=1, max_retries=2, retry_backoff=0.001)
+        stats = await pipeline.run(self.docs)
+        self.assertEqual(stats.retries, 2)
+        self.assertEqual(stats.chunks_embedded, 25)
+        self.assertEqual((await self.client.count("test")).count, 25)
+
+    async def test_checkpoint_ignored_when_file_changes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "doc.txt")
+            with open(source, "w") as f:
+                f.write("content")
+            checkpoint = IngestCheckpoint(tmp, source, "test")
+            checkpoint.save(10)
+            with open(source, "a") as f:
+                f.write(" and more")
+            self.assertEqual(checkpoint.load(), 0)
+
+    def test_invalid_batch_size(self):
+        with self.assertRaises(ValueError):
+            IngestionPipeline(DeterministicFakeEmbedding(size=8), self.client, "test", batch_size=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from langchain_core.language_models import FakeListChatModel
+
+from llm_registry import LLMRegistry
+
+
+class TestLLMRegistry(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.created = []
+
+        def factory(model, temperature, http_client, http_async_client):
+            self.created.append((model, temperature, http_client, http_async_client))
+            return FakeListChatModel(responses=[f"{model} answer"])
+
+        self.registry = LLMRegistry(factory=factory)
+
+    async def asyncTearDown(self):
+        await self.registry.aclose()
+
+    def test_reuses_client_per_model_and_temperature(self):
+        first = self.registry.get("gemma2-9b-it", 0.5)
+        self.assertIs(self.registry.get("gemma2-9b-it", 0.5), first)
+        self.assertIsNot(self.registry.get("gemma2-9b-it", 0.0), first)
+        self.assertIsNot(self.registry.get("qwen/qwen3-32b", 0.5), first)
+        self.assertEqual(len(self.created), 3)
+
+    def test_clients_share_http_pool(self):
+        self.registry.get("gemma2-9b-it")
+        self.registry.get("qwen/qwen3-32b")
+        (_, _, client_a, async_a), (_, _, client_b, async_b) = self.created
+        self.assertIs(client_a, client_b)
+        self.assertIs(async_a, async_b)
+
+    async def test_register_overrides_model(self):
+        stub = FakeListChatModel(responses=["stub"])
+        self.registry.register("gemma2-9b-it", stub)
+        self.assertIs(self.registry.get("gemma2-9b-it", 0.9), stub)
+        self.assertEqual((await self.registry.get("gemma2-9b-it").ainvoke("hi")).content, "stub")
+        self.registry.unregister("gemma2-9b-it")
+        self.assertIsNot(self.registry.get("gemma2-9b-it"), stub)
+
+    async def test_warm_up_creates_clients(self):
+        await self.registry.warm_up(["gemma2-9b-it", "qwen/qwen3-32b"], ping=True)
+        self.assertEqual(self.registry.cached_models(), [("gemma2-9b-it", 0.5), ("qwen/qwen3-32b", 0.5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain.text_splitter import CharacterTextSplitter, RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import TextLoader
+from langchain_core.documents import Document
+
+from parallel_splitting import ParallelSplitter, chunk_id
+
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sotu_address_obama.txt")
+
+
+class TestParallelSplitter(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        speech = TextLoader(SAMPLE_FILE, encoding='utf-8').load()[0].page_content
+        paragraphs = speech.split("\n\n")
+        # Documents of very different sizes, so workers finish out of order
+        cls.documents = [
+            Document(page_content="\n\n".join(paragraphs[start:start + size]), metadata={"source": f"doc{start}.txt"})
+            for start, size in zip(range(0, len(paragraphs), 7), [1, 20, 3, 7, 2, 15, 5, 7, 9, 1] * 10)
+        ]
+
+    def test_matches_inline_splitters(self):
+        splitters = [
+            CharacterTextSplitter(separator="\n", chunk_size=600, chunk_overlap=100),
+            RecursiveCharacterTextSplitter(separators=['\n\n', '\n', '.', ','], chunk_size=1000, chunk_overlap=200,
+                                           add_start_index=True),
+        ]
+        for splitter in splitters:
+            with self.subTest(splitter=type(splitter).__name__):
+                with ParallelSplitter(splitter, max_workers=2, max_pending=3) as parallel:
+                    self.assertEqual(parallel.split_documents(self.documents), splitter.split_documents(self.documents))
+
+    def test_small_inputs_split_inline(self):
+        splitter = CharacterTextSplitter(separator="\n", chunk_size=300, chunk_overlap=50)
+        parallel = ParallelSplitter(splitter, max_workers=4, inline_small_inputs=True)
+        self.assertEqual(parallel.split_documents(self.documents[:3]), splitter.split_documents(self.documents[:3]))
+        self.assertIsNone(parallel._executor)
+        # Iterators have no length, so they always go to the pool
+        with parallel:
+            self.assertEqual(parallel.split_documents(iter(self.documents[:3])),
+                             splitter.split_documents(self.documents[:3]))
+            self.assertIsNotNone(parallel._executor)
+
+    def test_ids_are_stable_and_follow_order(self):
+        splitter = CharacterTextSplitter(separator="\n", chunk_size=300, chunk_overlap=50)
+        with ParallelSplitter(splitter, executor=ThreadPoolExecutor(4), max_pending=2) as parallel:
+            chunks = list(parallel.iter_chunks(self.documents))
+        inline = list(ParallelSplitter(splitter, max_workers=1).iter_chunks(self.documents))
+        self.assertEqual([chunk.id for chunk in chunks], [chunk.id for chunk in inline])
+        self.assertEqual(len({chunk.id for chunk in chunks}), len(chunks))
+        self.assertEqual(chunks[1].id, chunk_id(chunks[1].source, chunks[1].index))
+        sources = [chunk.source for chunk in chunks]
+        self.assertEqual(sorted(set(sources), key=sources.index), [doc.metadata["source"] for doc in self.documents])
+
+    def test_documents_without_source(self):
+        documents = [Document(page_content="same text"), Document(page_content="same text")]
+        chunks = list(ParallelSplitter(CharacterTextSplitter(chunk_size=50, chunk_overlap=0),
+                                       max_workers=1).iter_chunks(documents))
+        self.assertEqual([chunk.index for chunk in chunks], [0, 0])
+        self.assertNotEqual(chunks[0].id, chunks[1].id)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,354 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from fastapi.testclient import TestClient
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import FakeListChatModel
+from qdrant_client import AsyncQdrantClient
+
+import qdrant_api
+from answer_cache import SemanticAnswerCache
+from bulk_ingest import IngestManifest
+from embedding_store import EmbeddingStore
+from ingest_jobs import JobManager
+from llm_registry import LLMRegistry
+from query_cache import QueryEmbeddingCache
+from rerank import Reranker
+from sparse_encoder import BM25Encoder
+from qdrant_streamlit_app import iter_sse_events
+
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sotu_address_obama.txt")
+
+
+class TestQdrantApi(unittest.TestCase):
+    """Exercises the API offline against an in-memory Qdrant and a deterministic fake embedder."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patchers = [
+            patch.object(qdrant_api, "embedding_store", EmbeddingStore(os.path.join(self.tmp.name, "embeddings.sqlite"))),
+            patch.object(qdrant_api, "vdb_client", AsyncQdrantClient(":memory:")),
+            patch.object(qdrant_api, "embeddings", DeterministicFakeEmbedding(size=1536)),
+            patch.object(qdrant_api, "query_cache", QueryEmbeddingCache()),
+            patch.object(qdrant_api, "answer_cache", SemanticAnswerCache()),
+            # Scores chunks by how many query words they contain, in place of a cross-encoder
+            patch.object(qdrant_api, "reranker", Reranker(lambda pairs: [
+                len(set(query.lower().split()) & set(text.lower().split())) for query, text in pairs
+            ], max_latency=5.0)),
+            patch.object(qdrant_api, "ingest_manifest", IngestManifest(os.path.join(self.tmp.name, "manifest.sqlite"))),
+            patch.object(qdrant_api, "sparse_encoder", BM25Encoder(os.path.join(self.tmp.name, "sparse.sqlite"))),
+            patch.object(qdrant_api, "llm_registry", LLMRegistry(
+                factory=lambda **kwargs: FakeListChatModel(responses=["Test answer"])
+            )),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = TestClient(qdrant_api.app)
+        response = self.client.post("/create_collection", json={"collection_name": "test"})
+        self.assertEqual(response.status_code, 200)
+
+    def upload_sample(self):
+        response = self.client.post(
+            "/upload_file",
+            json={"file_name": SAMPLE_FILE, "collection_name": "test", "batch_size": 16}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_upload_file(self):
+        result = self.upload_sample()
+        self.assertGreater(result["documents_processed"], 10)
+        self.assertEqual(result["ingestion_stats"]["chunks"], result["documents_processed"])
+
+    def test_streaming_upload_matches_regular_upload(self):
+        regular = self.upload_sample()
+        with tempfile.TemporaryDirectory() as tmp, patch.object(qdrant_api, "checkpoint_dir", tmp):
+            response = self.client.post(
+                "/upload_file",
+                json={"file_name": SAMPLE_FILE, "collection_name": "test", "batch_size": 16, "streaming": True}
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(os.listdir(tmp), [])
+        self.assertEqual(response.json()["documents_processed"], regular["documents_processed"])
+
+    def test_reupload_uses_embedding_store(self):
+        first = self.upload_sample()
+        second = self.upload_sample()
+        self.assertEqual(first["chunks_embedded"], first["documents_processed"])
+        self.assertEqual(second["chunks_embedded"], 0)
+        stats = self.client.get("/cache/stats").json()["embedding_store"]
+        self.assertEqual(stats["entries"], first["documents_processed"])
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def count_points(self):
+        body = {"query": "anything", "collection_name": "test", "limit": 10000, "with_payload": ["source"]}
+        return len(self.client.post("/search", json=body).json()["results"])
+
+    def test_upload_files(self):
+        docs = os.path.join(self.tmp.name, "docs")
+        os.makedirs(docs)
+        for name in ("a.txt", "b.txt"):
+            with open(os.path.join(docs, name), "w") as f:
+                f.write("\n".join(f"{name} line {i} about schools and energy" for i in range(100)))
+        body = {"path": docs, "collection_name": "test", "batch_size": 16}
+
+        first = self.client.post("/upload_files", json=body).json()
+        self.assertEqual((first["files_ingested"], first["files_unchanged"]), (2, 0))
+        # A failed create of the existing collection keeps its manifest, so nothing is re-ingested
+        self.assertEqual(self.client.post("/create_collection", json={"collection_name": "test"}).status_code, 500)
+        self.assertEqual(self.client.post("/upload_files", json=body).json()["files_unchanged"], 2)
+        self.assertEqual(first["chunks"], sum(entry["chunks"] for entry in first["files"]))
+        self.assertEqual(self.count_points(), first["chunks"])
+
+        with open(os.path.join(docs, "b.txt"), "w") as f:
+            f.write("b.txt is short now")
+        second = self.client.post("/upload_files", json=body).json()
+        self.assertEqual([entry["status"] for entry in second["files"]], ["unchanged", "ingested"])
+        self.assertEqual(second["chunks_embedded"], 1)
+        # The chunks b.txt no longer has are removed, the ones of a.txt stay
+        a_chunks = first["files"][0]["chunks"]
+        self.assertEqual(self.count_points(), a_chunks + 1)
+
+        missing = self.client.post("/upload_files", json={**body, "path": os.path.join(docs, "missing")})
+        self.assertEqual(missing.status_code, 404)
+
+    def test_upload_files_keeps_sparse_statistics_in_step(self):
+        self.client.post("/create_collection", json={"collection_name": "hybrid", "hybrid": True})
+        path = os.path.join(self.tmp.name, "a.txt")
+        with open(path, "w") as f:
+            f.write("\n".join(f"line {i} about schools and energy" for i in range(100)))
+        body = {"path": path, "collection_name": "hybrid", "batch_size": 16}
+        first = self.client.post("/upload_files", json=body).json()
+        self.assertEqual(qdrant_api.sparse_encoder.stats("hybrid")["documents"], first["chunks"])
+        self.client.post("/upload_files", json={**body, "force": True})
+        self.assertEqual(qdrant_api.sparse_encoder.stats("hybrid")["documents"], first["chunks"])
+        # The points past the end of a shrunk file are deleted and no longer counted
+        with open(path, "w") as f:
+            f.write("short now")
+        self.client.post("/upload_files", json=body)
+        self.assertEqual(qdrant_api.sparse_encoder.stats("hybrid"), {"documents": 1, "tokens": 2, "terms": 2})
+
+    def test_upload_job(self):
+        with patch.object(qdrant_api, "job_manager", JobManager(qdrant_api.run_ingest_job)), \
+                TestClient(qdrant_api.app) as client:
+            response = client.post("/jobs/upload_file", json={"file_name": SAMPLE_FILE, "collection_name": "test"})
+            self.assertEqual(response.status_code, 200)
+            job_id = response.json()["job_id"]
+            for _ in range(200):
+                status = client.get(f"/jobs/{job_id}").json()
+                if status["status"] not in ("queued", "running"):
+                    break
+                time.sleep(0.02)
+            self.assertEqual(status["status"], "completed", status["error"])
+            self.assertEqual(status["chunks_upserted"], status["chunks_total"])
+            self.assertEqual(status["result"]["documents_processed"], status["chunks_total"])
+            self.assertEqual(len(client.get("/jobs").json()["jobs"]), 1)
+        self.assertEqual(self.client.get("/jobs/unknown").status_code, 404)
+
+    def test_search(self):
+        self.upload_sample()
+        response = self.client.post("/search", json={"query": "schools", "collection_name": "test", "limit": 3})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0]["source"], SAMPLE_FILE)
+
+    def test_search_batch_matches_single_searches(self):
+        self.upload_sample()
+        queries = ["schools", "health care", "energy"]
+        response = self.client.post("/search_batch", json={"queries": queries, "collection_name": "test", "limit": 3})
+        self.assertEqual(response.status_code, 200)
+        batch = response.json()["results"]
+        self.assertEqual([entry["query"] for entry in batch], queries)
+        for query, entry in zip(queries, batch):
+            single = self.client.post("/search", json={"query": query, "collection_name": "test", "limit": 3})
+            self.assertEqual([r["id"] for r in entry["results"]], [r["id"] for r in single.json()["results"]])
+            self.assertEqual(set(entry["results"][0]), {"id", "score", "text", "source"})
+
+    def test_filtered_search_with_payload_projection(self):
+        self.upload_sample()
+        other = os.path.join(self.tmp.name, "other.txt")
+        with open(other, "w") as f:
+            f.write("\n".join(f"Schools and teachers line {i}" for i in range(200)))
+        self.client.post("/upload_file", json={"file_name": other, "collection_name": "test"})
+
+        body = {"query": "schools", "collection_name": "test", "limit": 5}
+        results = self.client.post("/search", json={**body, "source": other}).json()["results"]
+        self.assertEqual({r["source"] for r in results}, {other})
+        results = self.client.post("/search", json={**body, "filters": {"source": [SAMPLE_FILE]}}).json()["results"]
+        self.assertEqual({r["source"] for r in results}, {SAMPLE_FILE})
+
+        results = self.client.post("/search", json={**body, "with_payload": ["source"]}).json()["results"]
+        self.assertEqual(set(results[0]), {"id", "score", "source"})
+        batch = self.client.post("/search_batch", json={
+            "queries": ["schools"], "collection_name": "test", "source": other, "with_payload": ["text"]
+        }).json()["results"]
+        self.assertEqual(set(batch[0]["results"][0]), {"id", "score", "text"})
+
+    def test_hybrid_search_finds_exact_keyword(self):
+        response = self.client.post("/create_collection", json={"collection_name": "hybrid", "hybrid": True})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post("/upload_file", json={"file_name": SAMPLE_FILE, "collection_name": "hybrid"})
+        self.assertEqual(response.status_code, 200)
+        # Creating it again fails and leaves the term statistics of the existing points alone
+        stats = qdrant_api.sparse_encoder.stats("hybrid")
+        self.assertGreater(stats["documents"], 0)
+        # Re-uploading the same file replaces its points, so the statistics stay the same
+        response = self.client.post("/upload_file", json={"file_name": SAMPLE_FILE, "collection_name": "hybrid"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(qdrant_api.sparse_encoder.stats("hybrid"), stats)
+        response = self.client.post("/create_collection", json={"collection_name": "hybrid", "hybrid": True})
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(qdrant_api.sparse_encoder.stats("hybrid"), stats)
+
+        body = {"query": "Galesburg", "collection_name": "hybrid", "limit": 3, "hybrid": True}
+        results = self.client.post("/search", json=body).json()["results"]
+        self.assertEqual(len(results), 3)
+        self.assertTrue(any("Galesburg" in r["text"] for r in results))
+        batch = self.client.post("/search_batch", json={**body, "queries": ["Galesburg"]}).json()["results"]
+        self.assertEqual([r["id"] for r in batch[0]["results"]], [r["id"] for r in results])
+
+        generated = self.client.post("/generate", json={"question": "Galesburg", "collection_name": "hybrid",
+                                                        "limit": 3, "hybrid": True, "mmr": False}).json()
+        self.assertEqual(generated["source_documents"], results)
+        # Dense-only collections reject hybrid queries
+        self.assertEqual(self.client.post("/search", json={**body, "collection_name": "test"}).status_code, 500)
+
+    def test_repeated_search_hits_query_cache(self):
+        self.upload_sample()
+        for query in ["Schools?", "schools"]:
+            self.client.post("/search", json={"query": query, "collection_name": "test"})
+        stats = self.client.get("/cache/stats").json()["query_embedding_cache"]
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 1)
+
+    def test_generate(self):
+        self.upload_sample()
+        response = self.client.post("/generate", json={"question": "schools?", "collection_name": "test", "limit": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["response"], "Test answer")
+        self.assertEqual(len(response.json()["source_documents"]), 2)
+
+    def test_generate_packs_context_within_token_budget(self):
+        self.upload_sample()
+        body = {"question": "schools?", "collection_name": "test", "limit": 8, "use_answer_cache": False}
+        plain = self.client.post("/generate", json={**body, "mmr": False}).json()
+        self.assertEqual(len(plain["source_documents"]), 8)
+        self.assertEqual(plain["context_stats"]["candidates"], 8)
+
+        packed = self.client.post("/generate", json={**body, "fetch_k": 40, "max_context_tokens": 400}).json()
+        stats = packed["context_stats"]
+        self.assertEqual(stats["candidates"], 40)
+        self.assertLessEqual(stats["context_tokens"], 400)
+        self.assertLess(len(packed["source_documents"]), 8)
+        self.assertGreater(stats["tokens_saved"], 0)
+
+    def test_rerank(self):
+        self.upload_sample()
+        body = {"query": "schools teachers", "collection_name": "test", "limit": 3, "with_payload": ["source"]}
+        response = self.client.post("/search", json={**body, "rerank": True, "rerank_candidates": 30}).json()
+        self.assertEqual(response["rerank"]["scored"], 30)
+        scores = [r["rerank_score"] for r in response["results"]]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual(set(response["results"][0]), {"id", "score", "source", "rerank_score"})
+
+        generated = self.client.post("/generate", json={"question": "schools teachers", "collection_name": "test",
+                                                        "limit": 3, "rerank": True, "fetch_k": 30}).json()
+        self.assertEqual(generated["context_stats"]["rerank"]["cache_hits"], 30)
+        self.assertEqual([doc["id"] for doc in generated["source_documents"]],
+                         [r["id"] for r in response["results"]])
+
+    def test_generate_reuses_cached_answer_until_collection_changes(self):
+        self.upload_sample()
+        body = {"question": "What about schools?", "collection_name": "test", "limit": 2}
+        first = self.client.post("/generate", json=body).json()
+        second = self.client.post("/generate", json={**body, "question": "what about schools"}).json()
+        self.assertFalse(first["cached"])
+        self.assertTrue(second["cached"])
+        self.assertEqual(second["response"], first["response"])
+        self.assertEqual(second["source_documents"], first["source_documents"])
+
+        self.upload_sample()
+        self.assertFalse(self.client.post("/generate", json=body).json()["cached"])
+        stats = self.client.get("/cache/stats").json()["answer_cache"]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_failed_ingest_still_invalidates_answers_cached_during_it(self):
+        def fail_mid_ingest(docs, **kwargs):
+            # An answer is cached while the collection is half written, then the ingest fails
+            _, version = qdrant_api.answer_cache.lookup("test", "m", 5, [1.0, 0.0])
+            qdrant_api.answer_cache.store("test", "m", 5, "q", [1.0, 0.0], "partial", [], 1.0, version)
+            raise RuntimeError("upsert failed")
+
+        with patch.object(qdrant_api.IngestionPipeline, "run", side_effect=fail_mid_ingest):
+            response = self.client.post("/upload_file", json={"file_name": SAMPLE_FILE, "collection_name": "test"})
+        self.assertEqual(response.status_code, 500)
+        self.assertIsNone(qdrant_api.answer_cache.lookup("test", "m", 5, [1.0, 0.0])[0])
+
+    def test_generate_stream(self):
+        self.upload_sample()
+        with self.client.stream(
+            "POST", "/generate_stream", json={"question": "schools?", "collection_name": "test", "limit": 2}
+        ) as response:
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+            events = list(iter_sse_events(response.iter_lines()))
+        self.assertEqual(events[0][0], "sources")
+        self.assertEqual(len(events[0][1]["source_documents"]), 2)
+        tokens = [data["token"] for event, data in events if event == "token"]
+        self.assertEqual("".join(tokens), "Test answer")
+        self.assertGreater(len(tokens), 1)
+        self.assertEqual(events[-1][0], "done")
+        self.assertLessEqual(events[-1][1]["time_to_first_token"], events[-1][1]["total_time"])
+
+    def test_quantized_collection_with_search_tuning(self):
+        response = self.client.post("/create_collection", json={
+            "collection_name": "tuned", "hnsw_m": 32, "hnsw_ef_construct": 200, "quantization": "scalar",
+            "on_disk_vectors": True, "on_disk_payload": True
+        })
+        self.assertEqual(response.status_code, 200)
+        self.client.post("/upload_file", json={"file_name": SAMPLE_FILE, "collection_name": "tuned"})
+        response = self.client.post("/search", json={
+            "query": "schools", "collection_name": "tuned", "limit": 3,
+            "hnsw_ef": 128, "rescore": True, "oversampling": 2.0
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 3)
+        invalid = self.client.post("/create_collection", json={"collection_name": "bad", "quantization": "int4"})
+        self.assertEqual(invalid.status_code, 422)
+
+    def test_metrics_and_profiling_header(self):
+        self.upload_sample()
+        response = self.client.post("/generate", json={"question": "schools?", "collection_name": "test"},
+                                    headers={"X-Profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        stages = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+        self.assertEqual(stages, ["embed", "vector_search", "context_assembly", "llm_total", "total"])
+        profile = self.client.get(f"/profiles/{response.headers['X-Profile-Id']}").json()
+        self.assertEqual(profile["path"], "/generate")
+        self.assertIn("sampled_profile", profile)
+        self.assertEqual(self.client.get("/profiles/unknown").status_code, 404)
+        self.assertNotIn("Server-Timing", self.client.post("/search", json={"query": "x", "collection_name": "test"}).headers)
+
+        metrics = self.client.get("/metrics").text
+        for stage_name in ["embed", "vector_search", "context_assembly", "llm_total", "upsert", "embed_documents"]:
+            self.assertIn(f'rag_stage_seconds_count{{stage="{stage_name}"}}', metrics)
+
+    def test_search_missing_collection(self):
+        response = self.client.post("/search", json={"query": "schools", "collection_name": "missing"})
+        self.assertEqual(response.status_code, 500)
+
+    def test_delete_collection(self):
+        response = self.client.delete("/collection/test")
+        self.assertEqual(response.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
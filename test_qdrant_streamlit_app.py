@@ -4,7 +4,7 @@ import streamlit as st
 import requests
 import json
 import os
-from qdrant_streamlit_app import API_URL
+from qdrant_streamlit_app import API_URL, iter_sse_events
 
 class TestQdrantStreamlitApp(unittest.TestCase):
     def setUp(self):
@@ -150,5 +150,25 @@ class TestQdrantStreamlitApp(unittest.TestCase):
         self.assertEqual(len(response.json()["source_documents"]), 1)
         self.assertEqual(response.json()["source_documents"][0]["score"], 0.92)
 
+    def test_iter_sse_events(self):
+        lines = [
+            'event: sources',
+            'data: {"source_documents": [{"text": "Source text", "source": "test.txt", "score": 0.9}]}',
+            '',
+            'event: token',
+            'data: {"token": "Hello"}',
+            '',
+            'event: token',
+            'data: {"token": " world"}',
+            '',
+            'event: done',
+            'data: {"time_to_first_token": 0.1, "total_time": 0.5}',
+        ]
+        events = list(iter_sse_events(lines))
+        self.assertEqual([event for event, _ in events], ["sources", "token", "token", "done"])
+        self.assertEqual("".join(data["token"] for event, data in events if event == "token"), "Hello world")
+        self.assertEqual(events[0][1]["source_documents"][0]["score"], 0.9)
+        self.assertEqual(events[-1][1]["total_time"], 0.5)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from query_cache import QueryEmbeddingCache, normalize_query
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestQueryEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query("  What did Obama   say about Schools?  "),
+                         "what did obama say about schools")
+
+    def test_hit_after_put_for_near_identical_query(self):
+        cache = QueryEmbeddingCache(time_func=self.clock)
+        self.assertIsNone(cache.get("ada", "Schools?"))
+        cache.put("ada", "Schools?", [0.1, 0.2])
+        self.assertEqual(cache.get("ada", "schools"), [0.1, 0.2])
+        self.assertIsNone(cache.get("other-model", "schools"))
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 2)
+        self.assertAlmostEqual(stats["hit_rate"], 1 / 3, places=3)
+
+    def test_lru_eviction(self):
+        cache = QueryEmbeddingCache(max_size=2, time_func=self.clock)
+        cache.put("m", "a", [1.0])
+        cache.put("m", "b", [2.0])
+        cache.get("m", "a")
+        cache.put("m", "c", [3.0])
+        self.assertIsNone(cache.get("m", "b"))
+        self.assertEqual(cache.get("m", "a"), [1.0])
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_ttl_expiry(self):
+        cache = QueryEmbeddingCache(ttl_seconds=10, time_func=self.clock)
+        cache.put("m", "a", [1.0])
+        self.clock.now += 11
+        self.assertIsNone(cache.get("m", "a"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_disk_tier_shared_between_instances(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "queries.sqlite")
+            writer = QueryEmbeddingCache(disk_path=path, time_func=self.clock)
+            writer.put("m", "a", [0.5, 0.25])
+            reader = QueryEmbeddingCache(disk_path=path, time_func=self.clock)
+            self.assertEqual(reader.get("m", "a"), [0.5, 0.25])
+            self.assertEqual(reader.stats()["disk_hits"], 1)
+            self.clock.now += 7200
+            self.assertIsNone(QueryEmbeddingCache(disk_path=path, time_func=self.clock).get("m", "a"))
+
+    def test_async_disk_tier(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "queries.sqlite")
+            writer = QueryEmbeddingCache(disk_path=path, time_func=self.clock)
+            asyncio.run(writer.aput("m", "a", [0.5, 0.25]))
+            reader = QueryEmbeddingCache(disk_path=path, time_func=self.clock)
+            self.assertIsNone(asyncio.run(reader.aget("m", "b")))
+            self.assertEqual(asyncio.run(reader.aget("m", "a")), [0.5, 0.25])
+            # Now served from memory
+            self.assertEqual(reader.get("m", "a"), [0.5, 0.25])
+            self.assertEqual({key: reader.stats()[key] for key in ("hits", "disk_hits", "misses")},
+                             {"hits": 1, "disk_hits": 1, "misses": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
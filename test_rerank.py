@@ -0,0 +1,56 @@
+import asyncio
+import time
+import unittest
+
+from rerank import Reranker
+
+
+def word_overlap(pairs):
+    return [len(set(query.lower().split()) & set(text.lower().split())) for query, text in pairs]
+
+
+class CountingScorer:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, pairs):
+        self.calls.append(len(pairs))
+        time.sleep(self.delay)
+        return word_overlap(pairs)
+
+
+class TestReranker(unittest.TestCase):
+    texts = ["energy prices", "public schools and teachers", "schools", "health care"]
+
+    def test_orders_by_score_in_batches(self):
+        scorer = CountingScorer()
+        result = Reranker(scorer, batch_size=3).rerank("schools teachers", self.texts)
+        self.assertEqual(result.order, [1, 2, 0, 3])
+        self.assertEqual(scorer.calls, [3, 1])
+        self.assertFalse(result.fallback)
+
+    def test_score_cache(self):
+        scorer = CountingScorer()
+        reranker = Reranker(scorer, cache_size=3)
+        reranker.rerank("schools", self.texts)
+        result = reranker.rerank("schools", self.texts)
+        # Only three scores fit in the cache, the evicted one is scored again
+        self.assertEqual((result.cache_hits, result.scored), (3, 1))
+        self.assertEqual(reranker.stats()["cached_scores"], 3)
+
+    def test_latency_cap_falls_back_to_vector_order(self):
+        scorer = CountingScorer(delay=0.05)
+        reranker = Reranker(scorer, batch_size=1, max_latency=0.08)
+        result = reranker.rerank("schools teachers", self.texts)
+        self.assertTrue(result.fallback)
+        self.assertEqual(result.order, [0, 1, 2, 3])
+        self.assertLess(len(scorer.calls), 4)
+
+        result = asyncio.run(Reranker(CountingScorer(delay=0.5), max_latency=0.05).arerank("schools", self.texts))
+        self.assertTrue(result.fallback)
+        self.assertLess(result.seconds, 0.4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+from sparse_encoder import BM25Encoder, term_index, tokenize
+
+
+class TestBM25Encoder(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.encoder = BM25Encoder(os.path.join(self.tmp.name, "sparse.sqlite"))
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("The 2009 Recovery Act, and the jobs!"), ["2009", "recovery", "act", "jobs"])
+
+    def test_document_weights_saturate_with_term_frequency(self):
+        once, thrice = self.encoder.encode_documents("docs", ["jobs growth", "jobs jobs jobs growth"])
+        jobs = term_index("jobs")
+        weight = dict(zip(once.indices, once.values))[jobs]
+        repeated = dict(zip(thrice.indices, thrice.values))[jobs]
+        self.assertGreater(repeated, weight)
+        self.assertLess(repeated, 3 * weight)
+        self.assertEqual(once.indices, sorted(once.indices))
+
+    def test_rare_terms_get_higher_idf(self):
+        self.encoder.encode_documents("docs", ["jobs growth", "jobs schools", "jobs galesburg"])
+        query = self.encoder.encode_query("docs", "jobs in Galesburg unknownword")
+        weights = dict(zip(query.indices, query.values))
+        self.assertEqual(set(weights), {term_index("jobs"), term_index("galesburg")})
+        self.assertGreater(weights[term_index("galesburg")], weights[term_index("jobs")])
+
+    def test_statistics_are_incremental_per_collection(self):
+        self.encoder.encode_documents("docs", ["jobs growth"])
+        self.encoder.encode_documents("docs", ["schools"])
+        self.encoder.encode_documents("other", ["schools"])
+        self.assertEqual(self.encoder.stats("docs"), {"documents": 2, "tokens": 3, "terms": 3})
+        # Statistics survive a restart
+        self.assertEqual(BM25Encoder(self.encoder.path).stats("other")["documents"], 1)
+        self.encoder.reset("docs")
+        self.assertEqual(self.encoder.stats("docs")["documents"], 0)
+        self.assertEqual(self.encoder.encode_query("docs", "jobs").indices, [])
+
+    def test_replacing_points_keeps_statistics(self):
+        self.encoder.encode_documents("docs", ["jobs growth", "schools"], ids=[1, 2])
+        before = self.encoder.stats("docs")
+        idf = self.encoder.encode_query("docs", "jobs schools")
+        # Re-ingesting the same points, as a re-upload or a resumed ingest does, counts them once
+        self.encoder.encode_documents("docs", ["jobs growth", "schools"], ids=[1, 2])
+        self.assertEqual(self.encoder.stats("docs"), before)
+        self.assertEqual(self.encoder.encode_query("docs", "jobs schools"), idf)
+        # A changed point swaps its old terms for its new ones
+        self.encoder.encode_documents("docs", ["energy"], ids=["2"])
+        self.assertEqual(self.encoder.stats("docs"), {"documents": 2, "tokens": 3, "terms": 3})
+        self.assertEqual(self.encoder.encode_query("docs", "schools").indices, [])
+        self.encoder.remove("docs", [1, 99])
+        self.assertEqual(self.encoder.stats("docs"), {"documents": 1, "tokens": 1, "terms": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import threading
+import time
+import unittest
+
+from stage_metrics import ProfileLog, RequestTrace, StackSampler, StageMetrics, current_trace, record
+
+
+class TestStageMetrics(unittest.TestCase):
+    def test_prometheus_histogram(self):
+        metrics = StageMetrics(buckets=(0.01, 0.1))
+        for seconds in (0.005, 0.05, 0.5):
+            metrics.observe("embed", seconds)
+        text = metrics.render_prometheus()
+        self.assertIn("# TYPE rag_stage_seconds histogram", text)
+        self.assertIn('rag_stage_seconds_bucket{stage="embed",le="0.01"} 1', text)
+        self.assertIn('rag_stage_seconds_bucket{stage="embed",le="0.1"} 2', text)
+        self.assertIn('rag_stage_seconds_bucket{stage="embed",le="+Inf"} 3', text)
+        self.assertIn('rag_stage_seconds_count{stage="embed"} 3', text)
+
+    def test_request_trace_sums_repeated_stages(self):
+        trace = RequestTrace()
+        token = current_trace.set(trace)
+        try:
+            record("embed", 0.002)
+            record("embed", 0.003)
+            record("vector_search", 0.01)
+        finally:
+            current_trace.reset(token)
+        record("embed", 1.0)
+        self.assertAlmostEqual(trace.stages["embed"], 0.005)
+        self.assertEqual(trace.server_timing(), "embed;dur=5.00, vector_search;dur=10.00")
+
+    def test_stack_sampler_sees_busy_function(self):
+        def busy_wait():
+            end = time.perf_counter() + 0.1
+            while time.perf_counter() < end:
+                pass
+
+        sampler = StackSampler(threading.get_ident(), interval=0.002).start()
+        busy_wait()
+        sampler.stop()
+        report = sampler.report()
+        self.assertGreater(report["samples"], 0)
+        self.assertIn("test_stage_metrics.py:busy_wait", [entry["frame"] for entry in report["top"]])
+
+    def test_profile_log_is_bounded(self):
+        log = ProfileLog(max_entries=2)
+        ids = [log.add({"n": n}) for n in range(3)]
+        self.assertIsNone(log.get(ids[0]))
+        self.assertEqual(log.get(ids[2]), {"n": 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+from langchain.text_splitter import CharacterTextSplitter
+from langchain_community.document_loaders import TextLoader
+
+from text_chunking import iter_file_chunks, iter_text_splits
+
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sotu_address_obama.txt")
+
+
+class TestTextChunking(unittest.TestCase):
+    def reference_chunks(self, path, separator, chunk_size, chunk_overlap):
+        splitter = CharacterTextSplitter(separator=separator, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        return [doc.page_content for doc in splitter.split_documents(TextLoader(path, encoding='utf-8').load())]
+
+    def test_matches_character_text_splitter_across_read_boundaries(self):
+        for separator, chunk_size, chunk_overlap in [("\n", 600, 100), ("\n", 200, 50), (". ", 300, 0)]:
+            expected = self.reference_chunks(SAMPLE_FILE, separator, chunk_size, chunk_overlap)
+            for read_size in (7, 97, 4096):
+                with self.subTest(separator=separator, chunk_size=chunk_size, read_size=read_size):
+                    chunks = list(iter_file_chunks(SAMPLE_FILE, chunk_size, chunk_overlap, separator,
+                                                   read_size=read_size))
+                    self.assertEqual(chunks, expected)
+
+    def test_separator_split_across_blocks(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "doc.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("alpha<>beta<><>gamma<>")
+            self.assertEqual(list(iter_text_splits(path, "<>", read_size=3)), ["alpha", "beta", "gamma"])
+
+    def test_is_lazy(self):
+        chunks = iter_file_chunks(SAMPLE_FILE, read_size=1024)
+        self.assertEqual(next(chunks), self.reference_chunks(SAMPLE_FILE, "\n", 600, 100)[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
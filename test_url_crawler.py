@@ -0,0 +1,164 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from url_crawler import Crawler, ResponseCache, html_to_text
+
+ARTICLE = ("<html><head><title>Human services</title><style>p {color: red}</style></head><body>"
+           "<h1>Benefits</h1><p>" + "Apply for food assistance and housing support. " * 10 + "</p>"
+           "<script>track()</script></body></html>")
+APP_SHELL = "<html><head><title>App</title></head><body><div id='root'></div><script src='app.js'></script></body></html>"
+PAGES = {
+    "/etag": (ARTICLE, {"ETag": '"v1"'}),
+    "/modified": (ARTICLE, {"Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT"}),
+    "/plain": (ARTICLE, {}),
+    "/app": (APP_SHELL, {"ETag": '"app-v1"'}),
+}
+
+
+class ServerState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.responses = Counter()
+        self.active = 0
+        self.max_active = 0
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        # Requests still running from an earlier test keep counting against that test's state
+        state = self.server.state
+        path, query = urlsplit(self.path).path, parse_qs(urlsplit(self.path).query)
+        with state.lock:
+            state.active += 1
+            state.max_active = max(state.max_active, state.active)
+        try:
+            if path == "/slow":
+                time.sleep(float(query["delay"][0]))
+            if path not in PAGES and path != "/slow":
+                self.send_error(404)
+                return
+            body, validators = PAGES.get(path, (ARTICLE, {}))
+            etag = validators.get("ETag")
+            last_modified = validators.get("Last-Modified")
+            if (etag and self.headers.get("If-None-Match") == etag) or (
+                    last_modified and self.headers.get("If-Modified-Since") == last_modified):
+                state.responses[(path, 304)] += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+            state.responses[(path, 200)] += 1
+            payload = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in validators.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up waiting, as in the timeout test
+            pass
+        finally:
+            with state.lock:
+                state.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class TestCrawler(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+        cls.server.daemon_threads = True
+        cls.base = f"http://127.0.0.1:{cls.server.server_port}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.state = ServerState()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache = ResponseCache(os.path.join(self.tmp.name, "pages.sqlite"))
+
+    def test_revalidates_with_etag_and_last_modified(self):
+        urls = [f"{self.base}/etag", f"{self.base}/modified"]
+        first = Crawler(self.cache).crawl_sync(urls)
+        self.assertEqual([page.status for page in first], ["fetched", "fetched"])
+        self.assertEqual(first[0].title, "Human services")
+        self.cache.put_pages(first)
+
+        second = Crawler(self.cache).crawl_sync(urls)
+        self.assertEqual([page.status for page in second], ["not_modified", "not_modified"])
+        self.assertEqual([page.changed for page in second], [False, False])
+        self.assertEqual(second[0].text, first[0].text)
+        self.assertEqual(self.server.state.responses[("/etag", 200)], 1)
+        self.assertEqual(self.server.state.responses[("/modified", 304)], 1)
+
+    def test_unchanged_page_without_validators(self):
+        self.cache.put_pages(Crawler(self.cache).crawl_sync([f"{self.base}/plain"]))
+        page = Crawler(self.cache).crawl_sync([f"{self.base}/plain"])[0]
+        self.assertEqual((page.status, page.changed), ("fetched", False))
+
+    def test_renders_only_pages_that_need_javascript(self):
+        rendered = []
+
+        def renderer(url):
+            rendered.append(url)
+            return "Rendered application text"
+
+        crawler = Crawler(self.cache, renderer=renderer)
+        pages = crawler.crawl_sync([f"{self.base}/etag", f"{self.base}/app"])
+        self.assertEqual([page.status for page in pages], ["fetched", "rendered"])
+        self.assertEqual(pages[1].text, "Rendered application text")
+        self.cache.put_pages(pages)
+        # The rendered text is cached, so a 304 needs no browser
+        again = crawler.crawl_sync([f"{self.base}/app"])[0]
+        self.assertEqual((again.status, again.text), ("not_modified", "Rendered application text"))
+        self.assertEqual(rendered, [f"{self.base}/app"])
+
+    def test_pages_are_unchanged_only_once_saved(self):
+        url = f"{self.base}/etag"
+        # Indexing the first crawl failed, so its pages were never saved
+        Crawler(self.cache).crawl_sync([url])
+        retry = Crawler(self.cache).crawl_sync([url])[0]
+        self.assertEqual((retry.status, retry.changed), ("fetched", True))
+        self.cache.put_pages([retry])
+        self.assertFalse(Crawler(self.cache).crawl_sync([url])[0].changed)
+        self.assertEqual(self.server.state.responses[("/etag", 304)], 1)
+
+    def test_timeouts_and_errors_do_not_stop_the_crawl(self):
+        pages = Crawler(timeout=0.2).crawl_sync([f"{self.base}/slow?delay=1", f"{self.base}/missing",
+                                                 f"{self.base}/etag"])
+        self.assertEqual([page.status for page in pages], ["failed", "failed", "fetched"])
+        self.assertIn("Timeout", pages[0].error)
+
+    def test_per_host_limit(self):
+        urls = [f"{self.base}/slow?delay=0.1&page={i}" for i in range(8)]
+        start = time.perf_counter()
+        pages = Crawler(per_host=2).crawl_sync(urls)
+        self.assertTrue(all(page.status == "fetched" for page in pages))
+        self.assertEqual(self.server.state.max_active, 2)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.4)
+
+    def test_html_to_text(self):
+        title, text, scripts = html_to_text(ARTICLE)
+        self.assertEqual(title, "Human services")
+        self.assertTrue(text.startswith("Benefits\nApply for food assistance"))
+        self.assertNotIn("track()", text)
+        self.assertNotIn("color", text)
+        self.assertEqual(scripts, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+# text_chunking.py - Incremental text splitting for large files.
+# Reads a file block by block and yields the same chunks `CharacterTextSplitter.split_documents`
+# would produce for the whole file, without ever holding more than one block and one chunk in memory.
+
+from typing import Callable, Iterable, Iterator, List, Optional
+
+DEFAULT_READ_SIZE = 1 << 20
+
+
+def iter_text_splits(path: str, separator: str = "\n", encoding: str = "utf-8",
+                     read_size: int = DEFAULT_READ_SIZE) -> Iterator[str]:
+    """Yields the non-empty pieces of the file at `path` between occurrences of `separator`.
+
+    Pieces that straddle a read boundary are carried over and completed with the next block.
+    """
+    with open(path, encoding=encoding) as f:
+        carry = ""
+        while block := f.read(read_size):
+            if not separator:
+                yield from block
+                continue
+            pieces = (carry + block).split(separator)
+            carry = pieces.pop()
+            for piece in pieces:
+                if piece:
+                    yield piece
+        if carry:
+            yield carry
+
+
+def merge_splits(splits: Iterable[str], separator: str, chunk_size: int, chunk_overlap: int,
+                 length_function: Callable[[str], int] = len,
+                 strip_whitespace: bool = True) -> Iterator[str]:
+    """Generator version of LangChain's `TextSplitter._merge_splits`.
+
+    Combines small splits into chunks of at most `chunk_size`, carrying up to `chunk_overlap`
+    of trailing splits into the next chunk exactly as the LangChain splitters do.
+    """
+    separator_len = length_function(separator)
+
+    def join(docs: List[str]) -> Optional[str]:
+        text = separator.join(docs)
+        if strip_whitespace:
+            text = text.strip()
+        return text or None
+
+    current_doc: List[str] = []
+    total = 0
+    for d in splits:
+        _len = length_function(d)
+        if total + _len + (separator_len if current_doc else 0) > chunk_size:
+            if current_doc:
+                doc = join(current_doc)
+                if doc is not None:
+                    yield doc
+                # Pop from the front until the kept tail fits in the overlap and leaves room for `d`
+                while total > chunk_overlap or (
+                    total + _len + (separator_len if current_doc else 0) > chunk_size and total > 0
+                ):
+                    total -= length_function(current_doc[0]) + (separator_len if len(current_doc) > 1 else 0)
+                    current_doc = current_doc[1:]
+        current_doc.append(d)
+        total += _len + (separator_len if len(current_doc) > 1 else 0)
+    doc = join(current_doc)
+    if doc is not None:
+        yield doc
+
+
+def iter_file_chunks(path: str, chunk_size: int = 600, chunk_overlap: int = 100,
+                     separator: str = "\n", encoding: str = "utf-8",
+                     read_size: int = DEFAULT_READ_SIZE) -> Iterator[str]:
+    """Streams the chunks `CharacterTextSplitter(separator, chunk_size, chunk_overlap)` would
+    produce for the file at `path`."""
+    splits = iter_text_splits(path, separator=separator, encoding=encoding, read_size=read_size)
+    return merge_splits(splits, separator, chunk_size, chunk_overlap)
@@ -0,0 +1,246 @@
+# url_crawler.py - Concurrent page fetching for the scrape apps with a conditional-GET disk cache.
+# Pages are fetched with httpx under a global and a per-host concurrency limit. Responses are kept in
+# SQLite with their ETag / Last-Modified validators, so a re-crawl of an unchanged page costs one 304
+# and reports the page as unchanged. The caller saves pages to the cache only once it has indexed
+# them, so a page whose indexing failed is downloaded and reported as changed again on the next crawl.
+# A headless browser renders only pages whose HTML carries too little text to be usable without
+# JavaScript.
+
+import asyncio
+import hashlib
+import sqlite3
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from langchain_core.documents import Document
+
+FETCHED = "fetched"
+NOT_MODIFIED = "not_modified"
+RENDERED = "rendered"
+FAILED = "failed"
+
+# Tags whose content is never visible text
+_SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg", "head"}
+# Tags that end a line of text
+_BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article",
+               "header", "footer", "blockquote", "pre", "table", "ul", "ol", "title"}
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lines: List[str] = []
+        self.current: List[str] = []
+        self.title: List[str] = []
+        self.skipping = 0
+        self.in_title = False
+        self.scripts = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "script":
+            self.scripts += 1
+        if tag == "title":
+            self.in_title = True
+        elif tag in _SKIPPED_TAGS:
+            self.skipping += 1
+        if tag in _BLOCK_TAGS:
+            self._end_line()
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self.in_title = False
+        elif tag in _SKIPPED_TAGS and self.skipping:
+            self.skipping -= 1
+        if tag in _BLOCK_TAGS:
+            self._end_line()
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title.append(data)
+        elif not self.skipping:
+            self.current.append(data)
+
+    def _end_line(self):
+        line = " ".join("".join(self.current).split())
+        if line:
+            self.lines.append(line)
+        self.current = []
+
+
+def html_to_text(html: str) -> Tuple[str, str, int]:
+    """Title, visible text (one line per block element) and number of <script> tags of a page."""
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    parser._end_line()
+    return " ".join("".join(parser.title).split()), "\n".join(parser.lines), parser.scripts
+
+
+def selenium_renderer(url: str) -> str:
+    """Text of `url` after running its JavaScript in headless Chrome; needs selenium and unstructured."""
+    from langchain_community.document_loaders import SeleniumURLLoader
+    documents = SeleniumURLLoader(urls=[url]).load()
+    return documents[0].page_content if documents else ""
+
+
+class ResponseCache:
+    """SQLite store of the last indexed response per URL with its validators and extracted text.
+
+    Keep one cache per index: a page is only unchanged relative to the index its text went into.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, content_hash TEXT NOT NULL, "
+                "title TEXT NOT NULL, text TEXT NOT NULL, rendered INTEGER NOT NULL, fetched_at REAL NOT NULL)"
+            )
+
+    def get(self, url: str) -> Optional[Dict[str, object]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT etag, last_modified, content_hash, title, text, rendered FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"etag": row[0], "last_modified": row[1], "content_hash": row[2], "title": row[3], "text": row[4],
+                "rendered": bool(row[5])}
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], content_hash: str, title: str,
+            text: str, rendered: bool):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                         (url, etag, last_modified, content_hash, title, text, int(rendered), time.time()))
+
+    def put_pages(self, pages: Iterable["PageResult"]):
+        """Saves crawled pages with their validators; call it once their text has been indexed."""
+        rows = [(page.url, page.etag, page.last_modified, page.content_hash, page.title, page.text,
+                 int(page.rendered), time.time()) for page in pages if page.content_hash is not None]
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+@dataclass
+class PageResult:
+    url: str
+    status: str
+    title: str = ""
+    text: str = ""
+    # False when the page is the same as in the cache, so its chunks need not be embedded again
+    changed: bool = True
+    seconds: float = 0.0
+    error: Optional[str] = None
+    # What ResponseCache.put_pages saves; None for failed pages
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    rendered: bool = False
+
+    def to_document(self) -> Document:
+        return Document(page_content=self.text, metadata={"source": self.url, "title": self.title})
+
+
+class Crawler:
+    """Fetches pages concurrently, revalidating cached copies with conditional GETs.
+
+    Args:
+      cache: Where responses are kept between crawls; without one every page is downloaded.
+      max_connections: Requests in flight across all hosts.
+      per_host: Requests in flight to any one host.
+      timeout: Seconds allowed for connecting and for each read.
+      renderer: Returns the text of a URL after running its JavaScript, e.g. `selenium_renderer`.
+        Called in a worker thread, and only for pages whose HTML has scripts and under
+        `min_text_chars` characters of text.
+      transport: httpx transport override, for tests.
+
+    Crawling only reads the cache. Pass the pages to `cache.put_pages` after they have been indexed.
+    """
+
+    def __init__(self, cache: Optional[ResponseCache] = None, max_connections: int = 16, per_host: int = 4,
+                 timeout: float = 10.0, renderer: Optional[Callable[[str], str]] = None, min_text_chars: int = 200,
+                 headers: Optional[Dict[str, str]] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.cache = cache
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.timeout = timeout
+        self.renderer = renderer
+        self.min_text_chars = min_text_chars
+        self.headers = {"User-Agent": "rag-apps-crawler/0.1", **(headers or {})}
+        self.transport = transport
+
+    def needs_javascript(self, text: str, scripts: int) -> bool:
+        return scripts > 0 and len(text) < self.min_text_chars
+
+    async def crawl(self, urls: Iterable[str]) -> List[PageResult]:
+        """Fetches every URL and returns the results in input order; failures do not raise."""
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        # Semaphores belong to the running loop, so each crawl gets its own
+        hosts: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+        async with httpx.AsyncClient(timeout=self.timeout, limits=limits, headers=self.headers,
+                                     follow_redirects=True, transport=self.transport) as client:
+            return list(await asyncio.gather(*(self._fetch(client, hosts, url) for url in urls)))
+
+    def crawl_sync(self, urls: Iterable[str]) -> List[PageResult]:
+        # A private loop, so an event loop the caller has set (Streamlit apps do) is left in place
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self.crawl(urls))
+        finally:
+            loop.run_until_complete(loop.shutdown_default_executor())
+            loop.close()
+
+    async def _fetch(self, client: httpx.AsyncClient, hosts: Dict[str, asyncio.Semaphore], url: str) -> PageResult:
+        start = time.perf_counter()
+        cached = await asyncio.to_thread(self.cache.get, url) if self.cache is not None else None
+        headers = {}
+        if cached is not None:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+        try:
+            async with hosts[urlsplit(url).netloc]:
+                response = await client.get(url, headers=headers)
+            if response.status_code == 304 and cached is not None:
+                return PageResult(url, NOT_MODIFIED, cached["title"], cached["text"], changed=False,
+                                  seconds=time.perf_counter() - start, etag=cached["etag"],
+                                  last_modified=cached["last_modified"], content_hash=cached["content_hash"],
+                                  rendered=cached["rendered"])
+            response.raise_for_status()
+
+            content_hash = hashlib.sha256(response.content).hexdigest()
+            etag, last_modified = response.headers.get("etag"), response.headers.get("last-modified")
+            if cached is not None and cached["content_hash"] == content_hash:
+                # Same bytes from a server without validators: keep the text, rendered or not
+                title, text, rendered = cached["title"], cached["text"], cached["rendered"]
+                changed = False
+            else:
+                title, text, scripts = html_to_text(response.text)
+                rendered = self.renderer is not None and self.needs_javascript(text, scripts)
+                if rendered:
+                    text = await asyncio.to_thread(self.renderer, url)
+                changed = True
+            return PageResult(url, RENDERED if rendered and changed else FETCHED, title, text, changed=changed,
+                              seconds=time.perf_counter() - start, etag=etag, last_modified=last_modified,
+                              content_hash=content_hash, rendered=rendered)
+        except Exception as e:
+            return PageResult(url, FAILED, changed=False, seconds=time.perf_counter() - start,
+                              error=f"{type(e).__name__}: {e}")
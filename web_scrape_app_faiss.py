@@ -1,16 +1,37 @@
 import os
 import streamlit as st
-import pickle
-import time
 from langchain_google_genai import ChatGoogleGenerativeAI # type: ignore
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import UnstructuredURLLoader
-from langchain_community.embeddings import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
+from context_packing import context_token_budget, pack_context
+from embedding_providers import create_embeddings
+from embedding_store import CachedEmbeddings, EmbeddingStore
+from faiss_service import FaissService, IndexWriter, index_exists, indexed_sources, migrate_langchain_index
+from parallel_splitting import ParallelSplitter
+from url_crawler import FAILED, Crawler, ResponseCache
 from dotenv import load_dotenv
 load_dotenv()
 
+FAISS_INDEX_DIR='faiss_index'
+
+
+@st.cache_resource
+def get_faiss_service():
+    # Opened once per server process; the vectors and documents are memory-mapped, not unpickled
+    if not index_exists(FAISS_INDEX_DIR) and os.path.exists(os.path.join(FAISS_INDEX_DIR,'index.pkl')):
+        # One-off conversion of an index saved by an earlier version of this app
+        migrate_langchain_index(FAISS_INDEX_DIR)
+    return FaissService(FAISS_INDEX_DIR)
+
+
+@st.cache_resource
+def get_text_splitter():
+    # Worker pool shared by every run; batches of fewer pages than workers are split inline
+    # start_index lets the context packer recognise neighbouring chunks and drop their overlap
+    text_splitter = RecursiveCharacterTextSplitter(separators=['\n\n', '\n', '.', ','],chunk_size=10000,add_start_index=True)
+    return ParallelSplitter(text_splitter, inline_small_inputs=True)
+
+
 st.title("ZionCloudSolutionsBot: Humanservices Tool")
 st.sidebar.title("ZionCloudSolutions Human Services URLs")
 
@@ -22,7 +43,8 @@ for i in range(2):
 process_url_clicked = st.sidebar.button("Process URLs")
 main_placeholder = st.empty()
 if process_url_clicked:
-    embeddings=OpenAIEmbeddings()
+    # EMBEDDING_PROVIDER / EMBEDDING_MODEL pick the backend; use the same one for indexing and querying
+    embeddings=create_embeddings()
 
         # "https://www.understandingwar.org/backgrounder/russian-offensive-campaign-assessment-february-8-2023",
         # "https://www.understandingwar.org/backgrounder/russian-offensive-campaign-assessment-february-9-2023",
@@ -32,36 +54,61 @@ if process_url_clicked:
     # ]
     
     main_placeholder.text("Data Loading...Started...✅✅✅")
-    loader = UnstructuredURLLoader(urls=urls)
-    data = loader.load()
-    time.sleep(2)
-
-    text_splitter = RecursiveCharacterTextSplitter(separators=['\n\n', '\n', '.', ','],chunk_size=10000)
-    main_placeholder.text("Text Splitter...Started...✅✅✅")
-    docs = text_splitter.split_documents(data)
-    time.sleep(2)
-    # print(docs)
-    main_placeholder.text("Embedding Vector Started Building...✅✅✅")
-    db = FAISS.from_documents(docs, embeddings)
-    time.sleep(2)
-    db.save_local('faiss_index')
-
-    main_placeholder.text("Finished Indexing urls...✅✅✅")
-    time.sleep(2)
+    # Pages are fetched concurrently; unchanged ones are revalidated against the on-disk cache, not downloaded.
+    # The cache records what went into this index, so it is not shared with the Qdrant app
+    crawler = Crawler(ResponseCache(os.getenv("FAISS_URL_CACHE_PATH", "url_cache_faiss.sqlite")))
+    pages = crawler.crawl_sync([url for url in urls if url])
+    for page in pages:
+        if page.status == FAILED:
+            st.sidebar.warning(f"Could not load {page.url}: {page.error}")
+    # Only new or changed pages, and unchanged ones missing from the index (e.g. after it was
+    # rebuilt), are split, embedded and swapped in
+    present = indexed_sources(FAISS_INDEX_DIR)
+    indexed = [page for page in pages
+               if page.status != FAILED and (page.changed or page.url not in present)]
+    if not indexed:
+        # Every page answered 304 or came back byte-identical, so the saved index is current
+        main_placeholder.text("Pages unchanged, keeping the existing index...✅✅✅")
+    else:
+        data = [page.to_document() for page in indexed]
+        main_placeholder.text("Text Splitter...Started...✅✅✅")
+        # Chunks come back in page order with stable ids
+        chunks = list(get_text_splitter().iter_chunks(data))
+        docs = [chunk.document for chunk in chunks]
+        # print(docs)
+        main_placeholder.text("Embedding Vector Started Building...✅✅✅")
+        # Only chunks missing from the on-disk embedding store are sent to OpenAI
+        vectors = CachedEmbeddings(embeddings, EmbeddingStore('embedding_store.sqlite')).embed_documents(
+            [doc.page_content for doc in docs])
+        # FAISS_INDEX_TYPE (flat, hnsw, pq, ivf, ivfpq) is fixed when the index is created; delete
+        # faiss_index/ to switch types
+        writer = IndexWriter(FAISS_INDEX_DIR, index_type=os.getenv('FAISS_INDEX_TYPE'))
+        writer.remove_sources([page.url for page in indexed])
+        writer.add(docs, vectors, ids=[chunk.id for chunk in chunks])
+        # Writes a new generation; open services switch to it on their next refresh()
+        writer.commit()
+        # Saved only now, so pages whose indexing failed are fetched and indexed again on the next run
+        crawler.cache.put_pages(indexed)
+
+        main_placeholder.text("Finished Indexing urls...✅✅✅")
 
 query = main_placeholder.text_input("Question: ")
 enter=st.button('Enter')
 
 if query and enter:
-    embeddings=OpenAIEmbeddings()
-    db=FAISS.load_local('faiss_index',embeddings,allow_dangerous_deserialization=True)
+    embeddings=create_embeddings()
+    db=get_faiss_service()
+    db.refresh()
     # query='who are the executive commitee members'
-    results=db.similarity_search(query,k=10)
+    query_vector=embeddings.embed_query(query)
+    # Fetch extra candidates so MMR can trade a little relevance for diversity
+    # The candidates' vectors are read back from the index for MMR, so answering never embeds documents
+    results,vectors=db.similarity_search_with_vectors_by_vector(query_vector,k=40)
     # print((results[0].page_content))
-    context=''
-    for result in results:
-        context=context+result.page_content
-    print(context)
+    chunks=[{'text':result.page_content,'source':result.metadata.get('source'),'position':result.metadata.get('start_index',position)}
+            for position,result in enumerate(results)]
+    packed=pack_context(chunks,context_token_budget("gemini-2.0-flash"),query_vector=query_vector,vectors=vectors,limit=10)
+    context=packed.context
 
     prompt=''''
     Answer the following question based on the context and format the output for user friendly 
@@ -74,4 +121,5 @@ if query and enter:
     response=llm.invoke(prompt)
     print(response.content)
     main_placeholder = st.empty()
-    st.write(response.content)
\ No newline at end of file
+    st.write(response.content)
+    st.caption(f"Context: {packed.stats['context_tokens']} tokens, {packed.stats['tokens_saved']} saved by packing")
\ No newline at end of file
@@ -8,31 +8,59 @@ import streamlit as st
 import asyncio
 
 asyncio.set_event_loop(asyncio.new_event_loop())
-import time
 from langchain_google_genai import ChatGoogleGenerativeAI # type: ignore
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import SeleniumURLLoader
 from qdrant_client import models, QdrantClient
-from sentence_transformers import SentenceTransformer
+from embedding_providers import create_embeddings, embedding_dimension
+from feedback_log import DOWN, UP, FeedbackLog, apply_source_boosts
+from parallel_splitting import ParallelSplitter
+from url_crawler import FAILED, Crawler, ResponseCache, selenium_renderer
 from dotenv import load_dotenv
 load_dotenv()
 import os
-import pandas as pd
-import asyncio
 
-def write_to_csv(feedback):
-  """Writes feedback to a CSV file.
+# Streamlit reruns this script on every interaction; cache_resource keeps the embedding model, the
+# Qdrant client and the LLM client for the whole server process, created on the first run only
+@st.cache_resource
+def get_embeddings():
+    embeddings=create_embeddings("local","all-MiniLM-L6-v2")
+    # Load the weights and run one forward pass now, not during the first question
+    embeddings.embed_query("warm up")
+    return embeddings
+
+@st.cache_resource
+def get_vdb_client():
+    return QdrantClient(url="https://3bfb46b1-a7a7-4827-864a-7b1c8e9afe4b.us-east4-0.gcp.cloud.qdrant.io:6333",api_key=os.getenv('QDRANT_API_KEY'))
+
+@st.cache_resource
+def get_llm():
+    return ChatGoogleGenerativeAI(model="gemini-2.0-flash",temperature=0.5)
+
+@st.cache_resource
+def get_text_splitter():
+    # Worker pool shared by every run; batches of fewer pages than workers are split inline
+    text_splitter = RecursiveCharacterTextSplitter(separators=['\n\n', '\n', '.', ','],chunk_size=10000)
+    return ParallelSplitter(text_splitter, inline_small_inputs=True)
+
+@st.cache_resource
+def get_feedback_log():
+    # One background writer per server process, shared by every session
+    return FeedbackLog(os.getenv("FEEDBACK_DB_PATH","feedback.sqlite"))
 
-  Args:
-    feedback: The feedback to write.
-  """
-  print('in fucntion')
-  df = pd.DataFrame({'Feedback': [feedback]})
-  df.to_csv('./feedback.csv', mode='a', index=False, header=not os.path.exists('./feedback.csv'))
+@st.cache_data(ttl=60)
+def get_source_boosts():
+    # Votes are aggregated at most once a minute, not on every question
+    return get_feedback_log().source_boosts()
 
-vdb_client=QdrantClient(url="https://3bfb46b1-a7a7-4827-864a-7b1c8e9afe4b.us-east4-0.gcp.cloud.qdrant.io:6333",api_key=os.getenv('QDRANT_API_KEY'))
+def record_feedback(question,source,score,vote):
+    # Button callback: the event is only queued, the feedback thread writes it
+    get_feedback_log().record(question,source,score,vote)
+    st.toast("Thank you for your feedback!")
+
+vdb_client=get_vdb_client()
+embeddings=get_embeddings()
+llm=get_llm()
 st.sidebar.title("ZionCloudSolutions Human Services URLs")
-print(os.getenv('QDRANT_API_KEY'))
 print("connect success")
 
 urls = []
@@ -43,67 +71,90 @@ for i in range(1):
 process_url_clicked = st.sidebar.button("Process URLs")
 if process_url_clicked:
     main_placeholder = st.sidebar.empty()
-    embeddings=SentenceTransformer("all-MiniLM-L6-v2")
 
         # "https://www.understandingwar.org/backgrounder/russian-offensive-campaign-assessment-february-8-2023",
         # "https://www.understandingwar.org/backgrounder/russian-offensive-campaign-assessment-february-9-2023",
 
     
     main_placeholder.text("Data Loading...Started...✅✅✅")
-    #loader = UnstructuredURLLoader(urls=urls)
-    loader=SeleniumURLLoader(urls=urls)
-    data = loader.load()
-    time.sleep(2)
+    # Pages are fetched concurrently and revalidated against the on-disk cache; the browser only
+    # renders pages whose HTML has no usable text without JavaScript
+    crawler=Crawler(ResponseCache(os.getenv("QDRANT_URL_CACHE_PATH","url_cache_qdrant.sqlite")),renderer=selenium_renderer)
+    pages=crawler.crawl_sync([url for url in urls if url])
+    for page in pages:
+        if page.status==FAILED:
+            st.sidebar.warning(f"Could not load {page.url}: {page.error}")
+    # Unchanged pages are skipped only while their points are still in the collection, which may
+    # have been dropped or rebuilt since the pages were cached
+    collection_exists=vdb_client.collection_exists('vdb_index')
+    def source_filter(url):
+        return models.Filter(must=[models.FieldCondition(key='meta_data.source',match=models.MatchValue(value=url))])
+    def is_indexed(url):
+        return vdb_client.count('vdb_index',count_filter=source_filter(url),exact=True).count>0
+    indexed=[page for page in pages
+             if page.status!=FAILED and (page.changed or not collection_exists or not is_indexed(page.url))]
+    data=[page.to_document() for page in indexed]
 
-    text_splitter = RecursiveCharacterTextSplitter(separators=['\n\n', '\n', '.', ','],chunk_size=10000)
     main_placeholder.text("Text Splitter...Started...✅✅✅")
-    docs = text_splitter.split_documents(data)
-    time.sleep(2)
+    # Chunks come back in page order with stable ids
+    chunks = list(get_text_splitter().iter_chunks(data))
     
     doc_chunks=[]
-    for chunk in docs:
-        chunk={
-            "raw_text":chunk.page_content,
-            "meta_data":chunk.metadata,
+    for chunk in chunks:
+        doc_chunks.append((chunk.id,{
+            "raw_text":chunk.text,
+            "meta_data":chunk.document.metadata,
             "created_date":"2024-12-22"
-        }
-        doc_chunks.append(chunk)
+        }))
     # print(doc_chunks)
     
     main_placeholder.text("Embedding Vector Started Building...✅✅✅")
-    vdb_client.create_collection(
-        collection_name='vdb_index',
-        vectors_config=models.VectorParams(
-            size=embeddings.get_sentence_embedding_dimension(),
-            distance=models.Distance.COSINE
-        ),
-    )
+    # One call for all chunks; the model encodes them in batches spread over every core
+    vectors=embeddings.embed_documents([doc["raw_text"] for _,doc in doc_chunks])
+    if not collection_exists:
+        vdb_client.create_collection(
+            collection_name='vdb_index',
+            vectors_config=models.VectorParams(
+                size=embedding_dimension(embeddings),
+                distance=models.Distance.COSINE
+            ),
+        )
+    else:
+        # A re-indexed page may now have fewer chunks; drop all of its old points so none go stale
+        for page in indexed:
+            vdb_client.delete(
+                collection_name='vdb_index',
+                points_selector=models.FilterSelector(filter=source_filter(page.url)),
+                wait=True
+            )
     vdb_client.upload_points(
         collection_name="vdb_index",
         points=[
             models.PointStruct(
-                id=idx,vector=embeddings.encode(doc["raw_text"]).tolist(),payload=doc
+                id=chunk_id,vector=vector,payload=doc
             )
-            for idx,doc in enumerate(doc_chunks)
-        ]
+            for (chunk_id,doc),vector in zip(doc_chunks,vectors)
+        ],
+        # Waits until the points are stored, so the pages are only marked as indexed once they are
+        wait=True
     )
-    time.sleep(2)
+    crawler.cache.put_pages(indexed)
     main_placeholder.text("Finished Indexing urls...✅✅✅")
-    time.sleep(2)
 
 st.title("ZionCloudSolutionsBot: Humanservices Tool")
 question = st.text_input("Question: ")
 enter=st.button('Enter')
 
 if question and enter:
-    vdb_client=QdrantClient(url="https://3bfb46b1-a7a7-4827-864a-7b1c8e9afe4b.us-east4-0.gcp.cloud.qdrant.io:6333",api_key=os.getenv('QDRANT_API_KEY'))
-    vdb_client.get_collections()
-    embeddings=SentenceTransformer("all-MiniLM-L6-v2")
-    results=vdb_client.query_points(
+    # Extra candidates, so sources users voted up can move into the top 3 and ones voted down out
+    candidates=vdb_client.query_points(
         collection_name="vdb_index",
-        query=embeddings.encode(question).tolist(),
-        limit=3
+        query=embeddings.embed_query(question),
+        limit=10
     ).points
+    results=[point for point,_ in apply_source_boosts(candidates,get_source_boosts(),
+                                                      source=lambda point:point.payload['meta_data']['source'],
+                                                      score=lambda point:point.score)][:3]
     context=''
     sources=[]
     for result in results:
@@ -119,8 +170,6 @@ if question and enter:
     context:{context}
     '''.format(question=question,context=context)
 
-    llm =  ChatGoogleGenerativeAI(model="gemini-2.0-flash",temperature=0.5)
-
     response=llm.invoke(prompt)
     # print(response.content)
     st.write(response.content)   
@@ -138,16 +187,12 @@ if question and enter:
                 st.write("User Feedback:")
                 with st.expander("Provide Feedback"):
                     col1, col2, col3, col4 = st.columns(4)
+                    # Callbacks run on the rerun the click triggers, before this block would be skipped
                     with col1:
-                        if st.button("👍"):
-                            with st.spinner("Processing your feedback..."):
-                                asyncio.create_task(write_to_csv("Positive Feedback"))
-                            st.success("Thank you for your positive feedback!")
+                        st.button("👍",key=f"up-{src[0]}",on_click=record_feedback,args=(question,src[0],src[1],UP))
                     with col2:
-                        if st.button("👎"):
-                            asyncio.create_task(write_to_csv("Negative Feedback"))
-                            st.write("Thank you for your positive feedback!")
+                        st.button("👎",key=f"down-{src[0]}",on_click=record_feedback,args=(question,src[0],src[1],DOWN))
                     with col3:
-                        st.button("Share", type="primary")
+                        st.button("Share", type="primary",key=f"share-{src[0]}")
                     with col4:
-                        st.button("Refresh")
+                        st.button("Refresh",key=f"refresh-{src[0]}")